@@ -0,0 +1,59 @@
+# most rows sent in one request (PostgREST takes a JSON array and writes it in one statement)
+CHUNK_SIZE = 500
+
+def send_rows(supabase, table: str, rows: list, method: str = 'insert', chunk_size: int = CHUNK_SIZE, key: str = 'id') -> list:
+    """
+    Sends rows to a table as bulk requests of up to chunk_size rows, one request per chunk
+    A chunk that fails is sent again one row at a time, so a bad row doesn't hold back the rest of its chunk
+    and is reported on its own
+    supabase: Client --> supabase client
+    table: str --> table name
+    rows: list --> row dicts, all with the same keys
+    method: str --> 'insert' or 'upsert'
+    chunk_size: int --> most rows per request
+    key: str --> row field identifying the row in the failure report (e.g. id or event_id)
+    Returns the rows that couldn't be sent as (row key, error message) pairs
+    """
+    if method not in ('insert', 'upsert'):
+        raise ValueError(f'Unknown method {method}')
+    chunk_size = max(chunk_size, 1)
+
+    failed = []
+    requests = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        requests += 1
+        try:
+            getattr(supabase.table(table), method)(chunk).execute()
+            continue
+        except Exception as e:
+            print(f'{table}: {method} of {len(chunk)} rows failed ({e}), sending them one by one')
+
+        for row in chunk:
+            requests += 1
+            try:
+                getattr(supabase.table(table), method)(row).execute()
+            except Exception as e:
+                failed.append((row.get(key), str(e)))
+                print(f'{table}: {method} of {row.get(key)} failed: {e}')
+
+    print(f'{table}: sent {len(rows) - len(failed)} of {len(rows)} rows in {requests} requests')
+    return failed
+
+def send_events(supabase, event_rows: list, odds_rows: dict, chunk_size: int = CHUNK_SIZE) -> list:
+    """
+    Upserts the events, then inserts their book odds, skipping the odds of the events that couldn't be written
+    (they would only fail again)
+    supabase: Client --> supabase client
+    event_rows: list --> events table rows, one per id
+    odds_rows: dict --> odds table name --> its rows (keyed by event_id)
+    chunk_size: int --> most rows per request
+    Returns the rows that couldn't be sent as (row key, error message) pairs
+    """
+    failed = send_rows(supabase, 'events', event_rows, method='upsert', chunk_size=chunk_size, key='id')
+
+    failed_events = {event_id for event_id, _ in failed}
+    for table, rows in odds_rows.items():
+        rows = [odds for odds in rows if odds['event_id'] not in failed_events]
+        failed += send_rows(supabase, table, rows, method='insert', chunk_size=chunk_size, key='event_id')
+    return failed
@@ -0,0 +1,123 @@
+from pathlib import Path
+import pandas as pd
+
+# Parquet is optional: without pyarrow every table is read from and written to CSV only
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+TRUE_VALUES = {'1', '1.0', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', '0.0', 'false', 'f', 'no', 'n'}
+
+# explicit column types for the tables the NBA scripts pass around; columns not listed keep the type
+# pandas infers from the CSV (the stat columns are all plain numbers)
+SCHEMAS = {
+    'nba_games': {
+        'team': 'str',
+        'date': 'str',
+        'opponent': 'str',
+        'home': 'bool',
+        'win': 'float',
+    },
+    'moneyline_processed_data': {
+        'team': 'str',
+        'opponent': 'str',
+        'date': 'datetime',
+    },
+}
+SCHEMAS['moneyline_processed_data_upcoming'] = SCHEMAS['moneyline_processed_data']
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return pd.NA
+
+def apply_schema(data: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Casts the schema columns that are present to their declared types
+    str --> object strings (missing stays NaN), bool --> nullable boolean,
+    float --> float64 (unparseable values become NaN), datetime --> tz-aware UTC timestamps
+    """
+    data = data.copy()
+    for column, kind in schema.items():
+        if column not in data.columns:
+            continue
+        values = data[column]
+        if kind == 'str':
+            data[column] = values.where(values.isna(), values.astype(str))
+        elif kind == 'bool':
+            data[column] = values.map(_to_bool, na_action='ignore').astype('boolean')
+        elif kind == 'float':
+            data[column] = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif kind == 'datetime':
+            data[column] = pd.to_datetime(values, format='mixed', utc=True)
+        else:
+            raise ValueError(f'Unknown column type {kind} for {column}')
+    return data
+
+def _schema_for(csv_path: Path, schema):
+    if schema is None:
+        schema = SCHEMAS.get(csv_path.stem, {})
+    return schema
+
+def parquet_path(csv_path) -> Path:
+    return Path(csv_path).with_suffix('.parquet')
+
+def read_table(csv_path, schema: dict = None, prefer_parquet: bool = True) -> pd.DataFrame:
+    """
+    Reads a table, preferring the typed Parquet copy next to the CSV when it is at least as new as the CSV
+    csv_path: str or Path --> path of the CSV (the copy tracked in git)
+    schema: dict --> column types, defaults to SCHEMAS[<file name>]
+    prefer_parquet: bool --> set to False to always read the CSV
+    """
+    csv_path = Path(csv_path)
+    schema = _schema_for(csv_path, schema)
+    binary_path = parquet_path(csv_path)
+
+    if prefer_parquet and HAS_PARQUET and binary_path.exists() and (
+        not csv_path.exists() or binary_path.stat().st_mtime >= csv_path.stat().st_mtime
+    ):
+        return pd.read_parquet(binary_path)
+
+    return _read_csv(csv_path, schema)
+
+def _read_csv(csv_path: Path, schema: dict) -> pd.DataFrame:
+    # read the typed columns as text and cast them, so mixed-type columns don't need dtype hacks
+    data = pd.read_csv(csv_path, dtype={column: str for column in schema}, low_memory=False)
+    return apply_schema(data, schema)
+
+def write_table(data: pd.DataFrame, csv_path, schema: dict = None):
+    """
+    Writes the CSV (kept for git diffs) and, when pyarrow is installed, a typed Parquet copy next to it
+    data: pd.DataFrame --> table to write
+    csv_path: str or Path --> path of the CSV
+    schema: dict --> column types, defaults to SCHEMAS[<file name>]
+    """
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    data.to_csv(csv_path, index=False)
+
+    write_parquet_copy(csv_path, schema)
+
+def write_parquet_copy(csv_path, schema: dict = None):
+    """Builds the typed Parquet copy of a CSV (a no-op without pyarrow)"""
+    if not HAS_PARQUET:
+        return
+
+    csv_path = Path(csv_path)
+    schema = _schema_for(csv_path, schema)
+    # the copy is built from the CSV itself, so both files always load to the same frame
+    binary_path = parquet_path(csv_path)
+    try:
+        _read_csv(csv_path, schema).to_parquet(binary_path, index=False)
+    except Exception as e:
+        # a stale copy would shadow the CSV, so drop it and fall back to CSV reads
+        print(f'Error writing {binary_path.name}, reading {csv_path.name} from CSV instead: {e}')
+        binary_path.unlink(missing_ok=True)
@@ -0,0 +1,105 @@
+import pandas as pd
+from datetime import datetime, timezone
+from .nba_images import get_image_url, get_png_url, get_name_from_team
+from .data_store import SCHEMAS, read_table
+
+# the events are sent with the date exactly as the odds scraper wrote it (e.g. 2025-01-15T00:10:00.0000000Z,
+# or YYYY-MM-DD for games without odds), so it's read as text rather than parsed
+UPCOMING_SCHEMA = {**SCHEMAS['moneyline_processed_data_upcoming'], 'date': 'str'}
+
+def read_upcoming_games(csv_path) -> pd.DataFrame:
+    """
+    Reads the processed upcoming games with the date column left as text
+    (from the CSV, since the Parquet copy holds the parsed timestamps)
+    """
+    return read_table(csv_path, schema=UPCOMING_SCHEMA, prefer_parquet=False)
+
+def build_event_rows(events: pd.DataFrame, now: pd.Timestamp = None) -> tuple:
+    """
+    Builds the events table rows and the book odds rows of every game that hasn't started yet
+    events: pd.DataFrame --> one row per game and team (Team, Opp, Date, Book Odds 1/2, Spread ..., Total ..., Home)
+    now: pd.Timestamp --> games before it are skipped, defaults to the current time
+    Returns (event rows, {odds table name: rows}) for send_events
+    """
+    current_date = pd.Timestamp.now(tz='UTC') if now is None else now
+    event_rows = []
+    moneyline_rows = []
+    spread_rows = []
+    total_rows = []
+    for index, row in events.iterrows():
+        game_date = pd.Timestamp(row['Date']).tz_convert('UTC')
+        if game_date < current_date:
+            continue
+
+        team_img = get_image_url(row['Team'])
+        opp_img = get_image_url(row['Opp'])
+        team_png = get_png_url(row['Team'])
+        opp_png = get_png_url(row['Opp'])
+
+        # converting the f1 name f2 name and date to a string to be used as an id for the row
+        row_id = ''
+        if row['Team'] < row['Opp']:
+            row_id = row['Team'] + row['Opp'] + pd.to_datetime(row['Date']).strftime('%Y-%m-%d')
+        else:
+            row_id = row['Opp'] + row['Team'] + pd.to_datetime(row['Date']).strftime('%Y-%m-%d')
+
+        team_name_short = get_name_from_team(row['Team']).split(' ')[-1]
+        opp_name_short = get_name_from_team(row['Opp']).split(' ')[-1]
+
+        event_rows.append({
+            'id': row_id,
+            'updated_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'event_name': f"{team_name_short} vs {opp_name_short}",
+            'event_date': str(row['Date']),
+            'event_datetime': str(row['Date']),
+            'team1': row['Team'],
+            'team1_name': get_name_from_team(row['Team']),
+            'team2': row['Opp'],
+            'team2_name': get_name_from_team(row['Opp']),
+            'book_odds1': int(row['Book Odds 1']) if not pd.isna(row['Book Odds 1']) else 0,
+            'book_odds2': int(row['Book Odds 2']) if not pd.isna(row['Book Odds 2']) else 0,
+            'team1_pic_url': team_img,
+            'team2_pic_url': opp_img,
+            'team1_pic_png': team_png,
+            'team2_pic_png': opp_png,
+            'event_type': 'nba',
+            'tournament': game_date.strftime('%B %d, %Y'),
+            'home': row['Home']
+        })
+
+        # add the odds data to the moneyline_odds_data table if they exist
+        if not pd.isna(row['Book Odds 1']) and not pd.isna(row['Book Odds 2']):
+            moneyline_rows.append({
+                'event_id': row_id,
+                'odds1': int(row['Book Odds 1']) if not pd.isna(row['Book Odds 1']) else 0,
+                'odds2': int(row['Book Odds 2']) if not pd.isna(row['Book Odds 2']) else 0
+            })
+
+        # add the spread odds data to the spread_book_odds_data table if they exist
+        if not pd.isna(row['Spread Line 1']) and not pd.isna(row['Spread Line 2']) and not pd.isna(row['Spread Odds 1']) and not pd.isna(row['Spread Odds 2']):
+            spread_rows.append({
+                'event_id': row_id,
+                'team1_line': float(row['Spread Line 1']) if not pd.isna(row['Spread Line 1']) else 0,
+                'team2_line': float(row['Spread Line 2']) if not pd.isna(row['Spread Line 2']) else 0,
+                'odds1': int(row['Spread Odds 1']) if not pd.isna(row['Spread Odds 1']) else 0,
+                'odds2': int(row['Spread Odds 2']) if not pd.isna(row['Spread Odds 2']) else 0
+            })
+
+        # add the total odds data to the total_book_odds_data table if they exist
+        if not pd.isna(row['Total Line']) and not pd.isna(row['Total Odds 1']) and not pd.isna(row['Total Odds 2']):
+            total_rows.append({
+                'event_id': row_id,
+                'total_line': float(row['Total Line']) if not pd.isna(row['Total Line']) else 0,
+                'over_odds': int(row['Total Odds 1']) if not pd.isna(row['Total Odds 1']) else 0,
+                'under_odds': int(row['Total Odds 2']) if not pd.isna(row['Total Odds 2']) else 0
+            })
+
+    # a game shows up once per team; one upsert can't touch the same id twice, so keep the last row of each id
+    # (what the row-by-row upserts left in the table)
+    event_rows = list({event['id']: event for event in event_rows}.values())
+
+    return event_rows, {
+        'moneyline_book_odds_data': moneyline_rows,
+        'spread_book_odds_data': spread_rows,
+        'total_book_odds_data': total_rows,
+    }
@@ -0,0 +1,64 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+class PostgRESTStub:
+    """
+    Local PostgREST serving POST /rest/v1/<table> the way Supabase answers the supabase client's insert() and
+    upsert() (an upsert is a POST with Prefer: resolution=merge-duplicates), recording every request
+    Every request is recorded as (table, method, number of rows); a request fails with 409 when it holds a bad row
+    bad: set --> (table, row id or event_id) pairs the table rejects
+    """
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.requests = []
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _answer(self, path: str, prefer: str, body: bytes):
+        table = urlparse(path).path.rsplit('/', 1)[-1]
+        rows = json.loads(body)
+        rows = rows if isinstance(rows, list) else [rows]
+        method = 'upsert' if 'resolution=merge-duplicates' in prefer else 'insert'
+        with self.lock:
+            self.requests.append((table, method, len(rows)))
+            if any((table, row.get('id', row.get('event_id'))) in self.bad for row in rows):
+                return 409, {
+                    'code': '23505',
+                    'details': None,
+                    'hint': None,
+                    'message': f'duplicate key value violates unique constraint "{table}_pkey"',
+                }
+            self.tables.setdefault(table, []).extend(rows)
+        return 201, rows
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, answer = stub._answer(self.path, self.headers.get('Prefer', ''), body)
+                payload = json.dumps(answer).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,112 @@
+import pytest
+from supabase import create_client
+from functions.bulk_upload import send_events, send_rows
+from postgrest_stub import PostgRESTStub
+
+class FakeSupabase:
+    """
+    Stands in for the supabase client: supabase.table(name).upsert(rows) / .insert(rows) followed by .execute()
+    Every execute() is recorded as (table, method, number of rows); a request fails when it holds a bad row
+    bad: set --> (table, row id or event_id) pairs the table rejects
+    """
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.requests = []
+        self.tables = {}
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+class FakeTable:
+    def __init__(self, client: FakeSupabase, name: str):
+        self.client = client
+        self.name = name
+
+    def insert(self, rows):
+        return FakeQuery(self, 'insert', rows)
+
+    def upsert(self, rows):
+        return FakeQuery(self, 'upsert', rows)
+
+class FakeQuery:
+    def __init__(self, table: FakeTable, method: str, rows):
+        self.table = table
+        self.method = method
+        self.rows = rows if isinstance(rows, list) else [rows]
+
+    def execute(self):
+        client, name = self.table.client, self.table.name
+        client.requests.append((name, self.method, len(self.rows)))
+        if any((name, row.get('id', row.get('event_id'))) in client.bad for row in self.rows):
+            raise RuntimeError('duplicate key value violates unique constraint')
+        client.tables.setdefault(name, []).extend(self.rows)
+
+def events(count: int) -> list:
+    return [{'id': f'bosnyk2025-01-{day:02d}', 'event_name': 'Celtics vs Knicks'} for day in range(1, count + 1)]
+
+def odds(event_rows: list) -> list:
+    return [{'event_id': event['id'], 'odds1': -150, 'odds2': 130} for event in event_rows]
+
+def test_rows_are_sent_one_request_per_chunk():
+    supabase = FakeSupabase()
+
+    assert send_rows(supabase, 'events', events(7), method='upsert', chunk_size=3) == []
+    assert supabase.requests == [('events', 'upsert', 3), ('events', 'upsert', 3), ('events', 'upsert', 1)]
+    assert len(supabase.tables['events']) == 7
+
+def test_failed_chunk_is_sent_again_row_by_row():
+    rows = events(6)
+    supabase = FakeSupabase(bad={('events', rows[4]['id'])})
+
+    failed = send_rows(supabase, 'events', rows, method='upsert', chunk_size=3)
+
+    assert [key for key, _ in failed] == [rows[4]['id']]
+    # the first chunk goes through, the second fails and its three rows are resent one at a time
+    assert supabase.requests == [('events', 'upsert', 3), ('events', 'upsert', 3)] + [('events', 'upsert', 1)] * 3
+    assert [row['id'] for row in supabase.tables['events']] == [row['id'] for row in rows if row is not rows[4]]
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        send_rows(FakeSupabase(), 'events', events(1), method='delete')
+
+def test_odds_of_events_that_failed_are_not_sent():
+    event_rows = events(4)
+    supabase = FakeSupabase(bad={('events', event_rows[1]['id'])})
+
+    failed = send_events(supabase, event_rows, {
+        'moneyline_book_odds_data': odds(event_rows),
+        'spread_book_odds_data': odds(event_rows[2:]),
+    }, chunk_size=500)
+
+    assert [key for key, _ in failed] == [event_rows[1]['id']]
+    assert [row['event_id'] for row in supabase.tables['moneyline_book_odds_data']] == [
+        event_rows[0]['id'], event_rows[2]['id'], event_rows[3]['id'],
+    ]
+    assert len(supabase.tables['spread_book_odds_data']) == 2
+    # one events chunk, its four rows one by one, then one request per odds table
+    assert [request[0] for request in supabase.requests] == ['events'] * 5 + ['moneyline_book_odds_data', 'spread_book_odds_data']
+
+def test_failed_odds_rows_are_reported_by_event_id():
+    event_rows = events(2)
+    supabase = FakeSupabase(bad={('total_book_odds_data', event_rows[0]['id'])})
+
+    failed = send_events(supabase, event_rows, {'total_book_odds_data': odds(event_rows)})
+
+    assert [key for key, _ in failed] == [event_rows[0]['id']]
+    assert supabase.requests == [('events', 'upsert', 2), ('total_book_odds_data', 'insert', 2)] + [('total_book_odds_data', 'insert', 1)] * 2
+
+def test_events_reach_a_postgrest_server_through_the_supabase_client():
+    event_rows = events(5)
+
+    with PostgRESTStub(bad={('events', event_rows[3]['id'])}) as stub:
+        supabase = create_client(stub.base_url, 'stub-service-key')
+        failed = send_events(supabase, event_rows, {'moneyline_book_odds_data': odds(event_rows)}, chunk_size=2)
+
+    assert [key for key, _ in failed] == [event_rows[3]['id']]
+    # the chunk holding the rejected event is sent again row by row, then the odds of the other events go in one chunk each
+    assert stub.requests == [
+        ('events', 'upsert', 2), ('events', 'upsert', 2), ('events', 'upsert', 1), ('events', 'upsert', 1), ('events', 'upsert', 1),
+        ('moneyline_book_odds_data', 'insert', 2), ('moneyline_book_odds_data', 'insert', 2),
+    ]
+    assert [row['id'] for row in stub.tables['events']] == [row['id'] for row in event_rows if row is not event_rows[3]]
+    assert len(stub.tables['moneyline_book_odds_data']) == 4
@@ -0,0 +1,40 @@
+import pandas as pd
+from functions.data_store import write_table
+from functions.event_rows import build_event_rows, read_upcoming_games
+
+# as add_moneyline_odds writes it: the DraftKings start date of the market
+START_DATE = '2099-01-15T00:10:00.0000000Z'
+
+def upcoming_csv(path) -> str:
+    """Writes the upcoming games table (the CSV and its typed Parquet copy, which holds the date parsed)"""
+    write_table(pd.DataFrame([
+        {'team': 'bos', 'opponent': 'nyk', 'date': START_DATE, 'player_odds': -150, 'opponent_odds': 130, 'location': 1},
+        {'team': 'nyk', 'opponent': 'bos', 'date': START_DATE, 'player_odds': 130, 'opponent_odds': -150, 'location': 0},
+    ]), path)
+    return path
+
+def events(games: pd.DataFrame) -> pd.DataFrame:
+    """The events frame upload_events.py builds, without spread or total odds"""
+    return pd.DataFrame({
+        'Team': games['team'], 'Opp': games['opponent'], 'Date': games['date'],
+        'Book Odds 1': games['player_odds'], 'Book Odds 2': games['opponent_odds'],
+        'Spread Line 1': None, 'Spread Line 2': None, 'Spread Odds 1': None, 'Spread Odds 2': None,
+        'Total Line': None, 'Total Odds 1': None, 'Total Odds 2': None, 'Home': True,
+    })
+
+def test_events_are_sent_with_the_scraped_start_date(tmp_path):
+    games = read_upcoming_games(upcoming_csv(tmp_path / 'moneyline_processed_data_upcoming.csv'))
+    event_rows, odds_rows = build_event_rows(events(games), now=pd.Timestamp('2099-01-01', tz='UTC'))
+
+    assert len(event_rows) == 1
+    event = event_rows[0]
+    assert (event['id'], event['event_date'], event['event_datetime']) == ('bosnyk2099-01-15', START_DATE, START_DATE)
+    assert event['tournament'] == 'January 15, 2099'
+    # the last row of the game is kept, with the odds of its team first
+    assert odds_rows['moneyline_book_odds_data'][-1] == {'event_id': 'bosnyk2099-01-15', 'odds1': 130, 'odds2': -150}
+    assert odds_rows['spread_book_odds_data'] == [] and odds_rows['total_book_odds_data'] == []
+
+def test_games_that_started_are_skipped(tmp_path):
+    games = read_upcoming_games(upcoming_csv(tmp_path / 'moneyline_processed_data_upcoming.csv'))
+    event_rows, odds_rows = build_event_rows(events(games), now=pd.Timestamp('2099-01-15 01:00', tz='UTC'))
+    assert event_rows == [] and odds_rows['moneyline_book_odds_data'] == []
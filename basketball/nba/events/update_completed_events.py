@@ -1,6 +1,7 @@
 import pandas as pd
 from datetime import datetime, timezone, timedelta
 from functions.nba_images import *
+from functions.data_store import read_table
 import os
 from supabase import create_client
 from dotenv import load_dotenv
@@ -69,7 +70,7 @@ def update_completed_event(team: str, opp: str, date: str, winner: str):
 
 def read_recent_events():
   # open the moneyline_processed_data_training.csv file
-  data = pd.read_csv('../preprocessing/data/moneyline_processed_data.csv')
+  data = read_table('../preprocessing/data/moneyline_processed_data.csv')
 
   # Pre-compute date conversions (data is already in UTC)
   data['formatted_date'] = pd.to_datetime(data['date'], format='mixed', utc=True)
@@ -1,14 +1,20 @@
 import pandas as pd
-from datetime import datetime, timezone
+import argparse
 from functions.nba_images import *
 import os
 from supabase import create_client
 from dotenv import load_dotenv
 
 from functions.add_odds import add_spread_odds, add_total_odds
+from functions.event_rows import build_event_rows, read_upcoming_games
+from functions.bulk_upload import send_events, CHUNK_SIZE
 
 load_dotenv()
 
+parser = argparse.ArgumentParser(description='Upload the upcoming NBA events and their book odds to Supabase')
+parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='most rows sent to a table in one request')
+args = parser.parse_args()
+
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
 supabase = create_client(supabase_url, supabase_key)
@@ -18,7 +24,7 @@ supabase = create_client(supabase_url, supabase_key)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 # opening the processed upcoming event data
-testing_data = pd.read_csv('../preprocessing/data/moneyline_processed_data_upcoming.csv')
+testing_data = read_upcoming_games('../preprocessing/data/moneyline_processed_data_upcoming.csv')
 testing_data = add_spread_odds(testing_data)
 testing_data = add_total_odds(testing_data)
 
@@ -46,79 +52,10 @@ events = pd.DataFrame(events)
 # WRITING THE EVENTS TO THE DATABASE
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-# insert the new predictions into the database
-for index, row in events.iterrows():
-    current_date = pd.Timestamp.now(tz='UTC')
-    game_date = pd.Timestamp(row['Date']).tz_convert('UTC')
-    if game_date < current_date:
-        continue
-
-    # JSON serializable date
-    game_date_obj = game_date.strftime('%Y-%m-%d')
-
-    team_img = get_image_url(row['Team'])
-    opp_img = get_image_url(row['Opp'])
-    team_png = get_png_url(row['Team'])
-    opp_png = get_png_url(row['Opp'])
-    
-    # converting the f1 name f2 name and date to a string to be used as an id for the row
-    row_id = ''
-    if row['Team'] < row['Opp']:
-        row_id = row['Team'] + row['Opp'] + pd.to_datetime(row['Date']).strftime('%Y-%m-%d')
-    else:
-        row_id = row['Opp'] + row['Team'] + pd.to_datetime(row['Date']).strftime('%Y-%m-%d')
-
-    team_name_short = get_name_from_team(row['Team']).split(' ')[-1]
-    opp_name_short = get_name_from_team(row['Opp']).split(' ')[-1]
+# build every row first, so each table is written with one request per chunk instead of one per row
+event_rows, odds_rows = build_event_rows(events)
 
-    response = (
-        supabase.table('events')
-        .upsert({
-            'id': row_id,
-            'updated_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
-            'event_name': f"{team_name_short} vs {opp_name_short}",
-            'event_date': row['Date'],
-            'event_datetime': row['Date'],
-            'team1': row['Team'],
-            'team1_name': get_name_from_team(row['Team']),
-            'team2': row['Opp'],
-            'team2_name': get_name_from_team(row['Opp']),
-            'book_odds1': int(row['Book Odds 1']) if not pd.isna(row['Book Odds 1']) else 0,
-            'book_odds2': int(row['Book Odds 2']) if not pd.isna(row['Book Odds 2']) else 0,
-            'team1_pic_url': team_img,
-            'team2_pic_url': opp_img,
-            'team1_pic_png': team_png,
-            'team2_pic_png': opp_png,
-            'event_type': 'nba',
-            'tournament': game_date.strftime('%B %d, %Y'),
-            'home': row['Home']
-        })
-        .execute()
-    )
+failed = send_events(supabase, event_rows, odds_rows, chunk_size=args.chunk_size)
 
-    # add the odds data to the moneyline_odds_data table if they exist
-    if not pd.isna(row['Book Odds 1']) and not pd.isna(row['Book Odds 2']):
-        supabase.table('moneyline_book_odds_data').insert({
-            'event_id': row_id,
-            'odds1': int(row['Book Odds 1']) if not pd.isna(row['Book Odds 1']) else 0,
-            'odds2': int(row['Book Odds 2']) if not pd.isna(row['Book Odds 2']) else 0
-        }).execute()
-    
-    # add the spread odds data to the spread_book_odds_data table if they exist
-    if not pd.isna(row['Spread Line 1']) and not pd.isna(row['Spread Line 2']) and not pd.isna(row['Spread Odds 1']) and not pd.isna(row['Spread Odds 2']):
-        supabase.table('spread_book_odds_data').insert({
-            'event_id': row_id,
-            'team1_line': float(row['Spread Line 1']) if not pd.isna(row['Spread Line 1']) else 0,
-            'team2_line': float(row['Spread Line 2']) if not pd.isna(row['Spread Line 2']) else 0,
-            'odds1': int(row['Spread Odds 1']) if not pd.isna(row['Spread Odds 1']) else 0,
-            'odds2': int(row['Spread Odds 2']) if not pd.isna(row['Spread Odds 2']) else 0
-        }).execute()
-    
-    # add the total odds data to the total_book_odds_data table if they exist
-    if not pd.isna(row['Total Line']) and not pd.isna(row['Total Odds 1']) and not pd.isna(row['Total Odds 2']):
-        supabase.table('total_book_odds_data').insert({
-            'event_id': row_id,
-            'total_line': float(row['Total Line']) if not pd.isna(row['Total Line']) else 0,
-            'over_odds': int(row['Total Odds 1']) if not pd.isna(row['Total Odds 1']) else 0,
-            'under_odds': int(row['Total Odds 2']) if not pd.isna(row['Total Odds 2']) else 0
-        }).execute()
\ No newline at end of file
+if failed:
+    raise SystemExit(f'{len(failed)} rows could not be uploaded: {sorted(set(str(key) for key, _ in failed))}')
@@ -0,0 +1,318 @@
+import sys
+import time
+import resource
+import tracemalloc
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pathlib import Path
+import pandas as pd
+from processing import Processor, FEATURE_WINDOWS
+from functions.data_store import read_table, write_parquet_copy, parquet_path, HAS_PARQUET
+from functions.initial_state import read_initial_state, read_full_initial_state
+from functions.http_cache import HttpCache
+from functions.table_rows import read_rows
+from game_scraper import CACHE_DIR, GAME_LOG_STATS, is_game_log_row, is_schedule_row
+
+base_dir = Path(__file__).resolve().parent
+data_dir = base_dir / 'data'
+# saved DraftKings event pages (e.g. curl -o data/pages/<event>.html https://sportsbook.draftkings.com/event/<urlName>/<eventId>)
+pages_dir = data_dir / 'pages'
+
+def load_games():
+    """Loads nba_games.csv the same way processing.py does"""
+    return read_table(data_dir / 'nba_games.csv')
+
+def timed(label, func):
+    """Runs func once and prints how long it took"""
+    start_time = time.time()
+    result = func()
+    print(f'{label}: {time.time() - start_time:.2f} seconds')
+    return result
+
+def benchmark_rolling():
+    """
+    Compares the rolling-window engine against the row-by-row loop and checks
+    that both produce exactly the same processed data
+    """
+    preprocessor = Processor(load_games())
+
+    timed('loop engine', lambda: preprocessor.preprocess(engine='loop'))
+    loop_data = preprocessor.processed_data
+
+    timed('rolling engine', lambda: preprocessor.preprocess(engine='rolling'))
+    rolling_data = preprocessor.processed_data
+
+    pd.testing.assert_frame_equal(loop_data, rolling_data, check_exact=True)
+    print(f'parity ok: {len(rolling_data)} rows, {len(rolling_data.columns)} columns')
+
+def benchmark_game_number():
+    """
+    Compares the per-row getCurrentSeasonGameNumber apply against the vectorized
+    season rank and checks that both select the same games (game_number > 5)
+    """
+    preprocessor = Processor(load_games())
+    game_data = preprocessor.game_data
+
+    per_row = timed('per-row apply', lambda: game_data.apply(
+        lambda row: preprocessor.getCurrentSeasonGameNumber(row['team'], row['formatted_date']), axis=1
+    ))
+    vectorized = timed('vectorized season rank', preprocessor.getSeasonGameNumbers)
+
+    mismatches = (per_row != vectorized).sum()
+    assert mismatches == 0, f'{mismatches} game numbers differ'
+    assert ((per_row > 5) == (vectorized > 5)).all()
+    print(f'parity ok: {len(vectorized)} games, {(vectorized > 5).sum()} kept')
+
+def benchmark_balance():
+    """
+    Compares the per-group dict loop in balance() against the paired-array version on the
+    moneyline-joined data and checks that both keep exactly the same rows
+    """
+    preprocessor = Processor(load_games())
+    preprocessor.preprocess()
+    odds_data = preprocessor.add_moneyline_odds()
+
+    preprocessor.processed_data = odds_data.copy()
+    timed('loop balance', lambda: preprocessor.balance(engine='loop'))
+    loop_data = preprocessor.processed_data
+
+    preprocessor.processed_data = odds_data.copy()
+    timed('vectorized balance', lambda: preprocessor.balance(engine='vectorized'))
+    vectorized_data = preprocessor.processed_data
+
+    pd.testing.assert_frame_equal(loop_data, vectorized_data, check_exact=True)
+    print(f'parity ok: {len(vectorized_data)} rows kept out of {len(odds_data)}')
+
+def records_size(json_data):
+    """Approximate memory held by the list-of-dict team history (containers, keys are shared so values only)"""
+    total = sys.getsizeof(json_data)
+    for games in json_data.values():
+        total += sys.getsizeof(games)
+        for game in games:
+            total += sys.getsizeof(game) + sum(sys.getsizeof(value) for value in game.values())
+    return total
+
+def benchmark_history():
+    """
+    Compares the list-of-dict team history against the NumPy history store: build time, memory,
+    and the cost of a getLastXGameStats sweep, checking the store matches the records it replaces
+    """
+    preprocessor = Processor(load_games())
+
+    json_data = timed('to_dict records', preprocessor.convert_to_json)
+    history = timed('history store', preprocessor.build_history)
+    print(f'records: {records_size(json_data) / 1e6:.1f} MB, history store: {history.nbytes / 1e6:.1f} MB')
+
+    games = preprocessor.game_data[['team', 'formatted_date']].dropna()
+    timed('getLastXGameStats sweep', lambda: [
+        preprocessor.getLastXGameStats(team, date, 5, 'last_5_team_')
+        for team, date in zip(games['team'], games['formatted_date'])
+    ])
+
+    for team, records in json_data.items():
+        store = history.get(team)
+        dated = [game for game in records if pd.notna(game['formatted_date'])]
+        assert len(store) == len(dated), f'{team}: {len(store)} games in the store, {len(dated)} in the records'
+        assert (np.diff(store.dates) >= 0).all()
+    print(f'parity ok: {len(history.teams)} teams, {sum(len(team) for team in history.teams.values())} games')
+
+def benchmark_workers(workers=4):
+    """
+    Compares a single-process preprocess against one split across worker processes by season
+    and checks that the written CSVs are byte-identical
+    """
+    preprocessor = Processor(load_games())
+
+    for engine in ('rolling', 'loop'):
+        timed(f'{engine} engine, 1 process', lambda: preprocessor.preprocess(engine=engine))
+        single = preprocessor.processed_data
+
+        timed(f'{engine} engine, {workers} workers', lambda: preprocessor.preprocess(engine=engine, workers=workers))
+        parallel = preprocessor.processed_data
+
+        pd.testing.assert_frame_equal(single, parallel, check_exact=True)
+        assert single.to_csv(index=False) == parallel.to_csv(index=False)
+        print(f'parity ok: {len(parallel)} rows')
+
+def _load_in_child(csv_path, use_parquet):
+    """Loads one table in a fresh process and reports the load time and the process's peak RSS (MB)"""
+    start_time = time.time()
+    rows = len(read_table(csv_path, prefer_parquet=use_parquet))
+    elapsed = time.time() - start_time
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return rows, elapsed, peak_rss
+
+def benchmark_storage():
+    """
+    Compares loading nba_games.csv and moneyline_processed_data.csv from CSV against the typed Parquet copy:
+    load time and peak RSS, each measured in its own process, and checks both load the same frame
+    """
+    if not HAS_PARQUET:
+        print('pyarrow is not installed, nothing to compare')
+        return
+
+    for name in ('nba_games.csv', 'moneyline_processed_data.csv'):
+        csv_path = data_dir / name
+        if not csv_path.exists():
+            print(f'{name} not found, skipping')
+            continue
+        # rebuild the Parquet copy from the CSV so the comparison is current
+        write_parquet_copy(csv_path)
+        print(f'{name}: csv {csv_path.stat().st_size / 1e6:.1f} MB, parquet {parquet_path(csv_path).stat().st_size / 1e6:.1f} MB')
+
+        for label, use_parquet in (('csv', False), ('parquet', True)):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                rows, elapsed, peak_rss = executor.submit(_load_in_child, csv_path, use_parquet).result()
+            print(f'  {label}: {rows} rows in {elapsed:.3f} seconds, peak RSS {peak_rss:.0f} MB')
+
+        from_csv = read_table(csv_path, prefer_parquet=False)
+        from_parquet = read_table(csv_path)
+        pd.testing.assert_frame_equal(from_csv, from_parquet, check_exact=True)
+        print('  parity ok')
+
+EXTRA_WINDOWS = [
+    {'name': 'last_10', 'kind': 'games', 'size': 10},
+    {'name': 'last_30_days', 'kind': 'days', 'size': 30},
+    {'name': 'season', 'kind': 'season'},
+    {'name': 'ewm_10', 'kind': 'ewm', 'size': 10},
+]
+
+def benchmark_windows():
+    """
+    Times the rolling engine as windows are added to the config, and checks the date-ranged windows
+    (prefix sums) against averaging the same games straight from the history store
+    """
+    game_data = load_games()
+    for count in range(len(EXTRA_WINDOWS) + 1):
+        windows = FEATURE_WINDOWS + EXTRA_WINDOWS[:count]
+        preprocessor = Processor(game_data, windows=windows)
+        timed(f'{len(windows)} windows', preprocessor.preprocess)
+
+    data = preprocessor.processed_data
+    keys = list(preprocessor.base_stats.keys())
+    sample = data.sample(min(len(data), 200), random_state=0)
+    for _, row in sample.iterrows():
+        history = preprocessor.history.get(row['team'])
+        date = row['date']
+        season_start = pd.Timestamp(year=date.year - (date.month < 10), month=10, day=1, tz='UTC')
+        for name, start_date in (('last_30_days', date - pd.Timedelta(days=30)), ('season', season_start)):
+            start, stop = history.between(start_date, date)
+            expected = history.window_sums(start, stop) / max(stop - start, 1)
+            actual = row[[f'{name}_team_{k}' for k in keys]].to_numpy(dtype=float)
+            assert np.allclose(actual, expected, equal_nan=True), f"{name} differs for {row['team']} on {date}"
+    print(f'parity ok: {len(sample)} sampled rows, {len(data.columns)} columns')
+
+def traced(func):
+    """Runs func once and returns (result, seconds, peak MB allocated by Python while it ran)"""
+    tracemalloc.start()
+    start_time = time.time()
+    result = func()
+    elapsed = time.time() - start_time
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+EVENT_PATHS = [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')]
+
+def benchmark_initial_state():
+    """
+    Compares parsing the whole __INITIAL_STATE__ of the saved event pages against reading only the
+    markets and selections: parse time and peak memory, and checks both give the same markets and selections
+    """
+    pages = sorted(pages_dir.glob('*.html'))
+    if not pages:
+        print(f'no saved pages in {pages_dir}, nothing to compare')
+        return
+
+    for page in pages:
+        html = page.read_text()
+        full, full_seconds, full_peak = traced(lambda: read_full_initial_state(html))
+        pruned, pruned_seconds, pruned_peak = traced(lambda: read_initial_state(html, EVENT_PATHS))
+        print(f'{page.name}: {len(html) / 1e6:.1f} MB page')
+        print(f'  full state: {full_seconds:.3f} seconds, peak {full_peak:.1f} MB')
+        print(f'  markets/selections only: {pruned_seconds:.3f} seconds, peak {pruned_peak:.1f} MB')
+
+        for key in ('markets', 'selections'):
+            assert pruned['stadiumEventData'][key] == full['stadiumEventData'][key], f'{key} differ for {page.name}'
+        print('  parity ok')
+
+# the two page kinds game_scraper.py reads: the <tr> filter BeautifulSoup used, read_rows' filter and the stats read
+PAGE_KINDS = {
+    'game log': (
+        {'id': lambda x: x and x.startswith('team_game_log')}, is_game_log_row,
+        ['date', 'opp_name_abbr', 'game_location', 'team_game_result'] + [stat for _, stat in GAME_LOG_STATS],
+    ),
+    'schedule': ({'class': None}, is_schedule_row, ['date_game', 'game_location', 'opp_name']),
+}
+
+def soup_cells(html, soup_filter, stats):
+    """The old extraction: a BeautifulSoup html.parser tree, then one tr.find per stat of every row"""
+    from bs4 import BeautifulSoup
+
+    rows = []
+    for tr in BeautifulSoup(html, 'html.parser').find_all('tr', soup_filter):
+        cells = {}
+        for stat in stats:
+            td = tr.find('td', {'data-stat': stat})
+            cells[stat] = (td.text, td.get('csk')) if td else None
+        rows.append(cells)
+    return rows
+
+def benchmark_table_rows():
+    """
+    Compares the old BeautifulSoup extraction against read_rows with every parser installed, on the game log
+    and schedule pages in the page cache (data/http_cache): parse time per page, and checks they all read the same cells
+    """
+    pages = {kind: [] for kind in PAGE_KINDS}
+    for url, body in HttpCache(base_dir / CACHE_DIR).entries():
+        if '/gamelog/' in url:
+            pages['game log'].append(body)
+        elif url.endswith('_games.html'):
+            pages['schedule'].append(body)
+    if not any(pages.values()):
+        print(f'no cached game log or schedule pages in {base_dir / CACHE_DIR}, run game_scraper.py first')
+        return
+
+    parsers = ['html.parser'] + [name for name in ('lxml', 'selectolax') if importlib.util.find_spec(name)]
+    for kind, bodies in pages.items():
+        if not bodies:
+            continue
+        soup_filter, row_filter, stats = PAGE_KINDS[kind]
+        start_time = time.time()
+        expected = [soup_cells(body, soup_filter, stats) for body in bodies]
+        soup_seconds = (time.time() - start_time) / len(bodies)
+        print(f'{kind}: {len(bodies)} pages, {sum(len(rows) for rows in expected)} rows')
+        print(f'  BeautifulSoup + tr.find per stat: {soup_seconds * 1000:.1f} ms per page')
+
+        for parser in parsers:
+            start_time = time.time()
+            results = [read_rows(body, row_filter, parser=parser) for body in bodies]
+            seconds = (time.time() - start_time) / len(bodies)
+            print(f'  read_rows ({parser}): {seconds * 1000:.1f} ms per page ({soup_seconds / seconds:.1f}x)')
+
+            for rows, expected_rows in zip(results, expected):
+                read = [
+                    {stat: (cells[stat].text, cells[stat].attrs.get('csk')) if stat in cells else None for stat in stats}
+                    for cells in rows
+                ]
+                assert read == expected_rows, f'{parser} read different cells from a {kind} page'
+        print('  parity ok')
+
+BENCHMARKS = {
+    'rolling': benchmark_rolling,
+    'game_number': benchmark_game_number,
+    'balance': benchmark_balance,
+    'history': benchmark_history,
+    'workers': benchmark_workers,
+    'storage': benchmark_storage,
+    'windows': benchmark_windows,
+    'initial_state': benchmark_initial_state,
+    'table_rows': benchmark_table_rows,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f'>>> {name}')
+        BENCHMARKS[name]()
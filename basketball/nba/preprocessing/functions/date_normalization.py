@@ -0,0 +1,165 @@
+import time
+import numpy as np
+import pandas as pd
+import pytz
+
+et_tz = pytz.timezone('US/Eastern')
+
+# game dates after this are stored in ET and converted to UTC, earlier ones are already UTC
+ET_CUTOFF = pd.Timestamp('2025-08-01')
+FALLBACK_DATE = pd.Timestamp('1995-01-01')
+
+DATE_FORMAT = '%Y-%m-%d'
+CLOCK_FORMAT = '%Y-%m-%d %I:%M %p'
+
+def format_date(date, game_time):
+    """
+    Converts a single date/time pair to a pandas datetime object
+    date: str in the format 1995-09-03
+    game_time: str in the format 4:00PM ET
+    """
+    try:
+        # Handle date format from CSV (YYYY-MM-DD)
+        if '-' in date and len(date.split('-')) == 3:
+            # Extract time info
+            if game_time and game_time.strip():
+                time_part = game_time.split(' ')[0]
+                if len(time_part) > 2:
+                    clock_time = time_part[:-2]
+                    ampm = time_part[-2:]
+                    return pd.to_datetime(f'{date} {clock_time} {ampm}')
+                else:
+                    return pd.to_datetime(f'{date} 12:00 PM')
+            else:
+                return pd.to_datetime(date)
+    except Exception as e:
+        print(f"Error parsing date {date} {game_time}: {e}")
+        return FALLBACK_DATE
+
+_MISSING = object()
+
+def _cache_key(value):
+    # NaN never equals itself, so give it a stable stand-in for dict lookups
+    return _MISSING if isinstance(value, float) and np.isnan(value) else value
+
+class DateNormalizer:
+    """
+    Parses game date/time columns into UTC timestamps
+    Every distinct (date, time) pair is parsed once, with one vectorized to_datetime call per format;
+    pairs that don't fit a known format go through format_date. Parsed pairs are kept across calls,
+    the timing counters only until reset_timings
+    """
+    def __init__(self):
+        self.cache = {}
+        self.reset_timings()
+
+    def reset_timings(self):
+        """Zeroes the timing counters (the parsed pairs are kept)"""
+        self.timings = {
+            'rows': 0,
+            'distinct_pairs': 0,
+            'cached_pairs': 0,
+            'vectorized_pairs': 0,
+            'scalar_pairs': 0,
+            'parse_seconds': 0.0,
+            'localize_seconds': 0.0,
+        }
+
+    def parse(self, dates: pd.Series, times: pd.Series = None) -> pd.Series:
+        """
+        Returns the naive datetimes for every row (NaT where the date could not be read)
+        dates: pd.Series --> date strings in the format 1995-09-03
+        times: pd.Series --> optional time strings in the format 4:00PM ET
+        """
+        start_time = time.time()
+        if times is None:
+            times = pd.Series('', index=dates.index)
+
+        pairs = pd.DataFrame({'date': dates.to_numpy(dtype=object), 'time': times.to_numpy(dtype=object)})
+        codes = pairs.groupby(['date', 'time'], sort=False, dropna=False).ngroup().to_numpy()
+        first_rows = pd.Series(np.arange(len(pairs))).groupby(codes).min().to_numpy()
+        distinct = pairs.iloc[first_rows].reset_index(drop=True)
+
+        keys = [(_cache_key(d), _cache_key(t)) for d, t in zip(distinct['date'], distinct['time'])]
+        parsed = np.array([self.cache.get(key, np.datetime64('NaT')) for key in keys], dtype='datetime64[ns]')
+        missing = np.array([key not in self.cache for key in keys], dtype=bool)
+
+        self.timings['rows'] += len(pairs)
+        self.timings['distinct_pairs'] += len(distinct)
+        self.timings['cached_pairs'] += int((~missing).sum())
+
+        if missing.any():
+            new_pairs = distinct[missing]
+            new_values = self._parse_distinct(new_pairs['date'], new_pairs['time'])
+            parsed[missing] = new_values
+            for key, value in zip([k for k, m in zip(keys, missing) if m], new_values):
+                self.cache[key] = value
+
+        self.timings['parse_seconds'] += time.time() - start_time
+        return pd.Series(parsed[codes], index=dates.index)
+
+    def _parse_distinct(self, dates: pd.Series, times: pd.Series) -> np.ndarray:
+        """Parses distinct pairs: the common layouts in bulk, anything else one by one"""
+        dates = dates.reset_index(drop=True)
+        times = times.reset_index(drop=True)
+        parsed = np.full(len(dates), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        is_str_date = dates.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        is_str_time = times.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        date_text = dates.where(is_str_date, '')
+        time_text = times.where(is_str_time, '')
+
+        well_formed = is_str_date & (date_text.str.count('-') == 2).to_numpy()
+        # a NaN time is not blank: format_date falls back on it, so it is left to format_date below
+        blank_time = (is_str_time & (time_text.str.strip() == '').to_numpy()) | times.map(lambda v: v is None).to_numpy(dtype=bool)
+        clock_time = is_str_time & ~blank_time
+
+        # dates with no time: YYYY-MM-DD
+        date_only = well_formed & blank_time
+        if date_only.any():
+            parsed[date_only] = pd.to_datetime(date_text[date_only], format=DATE_FORMAT, errors='coerce').to_numpy()
+
+        # dates with a clock time: '7:30PM ET' -> 'YYYY-MM-DD 7:30 PM', short times default to noon
+        with_clock = well_formed & clock_time
+        if with_clock.any():
+            time_part = time_text[with_clock].str.split(' ').str[0]
+            clock_text = (time_part.str[:-2] + ' ' + time_part.str[-2:]).where(time_part.str.len() > 2, '12:00 PM')
+            parsed[with_clock] = pd.to_datetime(
+                date_text[with_clock] + ' ' + clock_text, format=CLOCK_FORMAT, errors='coerce'
+            ).to_numpy()
+
+        # everything else, and anything the strict formats rejected, goes through format_date
+        scalar = ~(date_only | with_clock) | np.isnat(parsed)
+        for i in np.flatnonzero(scalar):
+            value = format_date(dates[i], times[i])
+            parsed[i] = np.datetime64('NaT') if value is None else pd.Timestamp(value).to_datetime64()
+
+        self.timings['vectorized_pairs'] += int((~scalar).sum())
+        self.timings['scalar_pairs'] += int(scalar.sum())
+        return parsed
+
+    def localize(self, naive_dates: pd.Series) -> pd.Series:
+        """Localizes naive datetimes to UTC, treating dates after ET_CUTOFF as ET"""
+        start_time = time.time()
+        localized = naive_dates.dt.tz_localize('UTC')
+        et_mask = naive_dates > ET_CUTOFF
+        if et_mask.any():
+            localized = localized.mask(et_mask, naive_dates[et_mask].dt.tz_localize(et_tz).dt.tz_convert('UTC'))
+        self.timings['localize_seconds'] += time.time() - start_time
+        return localized
+
+    def normalize(self, dates: pd.Series, times: pd.Series = None) -> pd.Series:
+        """Parses and localizes a date (and optional time) column to timezone-aware UTC"""
+        return self.localize(self.parse(dates, times))
+
+    def report(self):
+        """Prints the timing counters"""
+        t = self.timings
+        print(
+            f"date normalization: {t['rows']} rows, {t['distinct_pairs']} distinct pairs "
+            f"({t['cached_pairs']} cached, {t['vectorized_pairs']} vectorized, {t['scalar_pairs']} one by one), "
+            f"parse {t['parse_seconds']:.3f}s, localize {t['localize_seconds']:.3f}s"
+        )
+
+# shared by every Processor in the process so repeated pairs are only parsed once
+date_normalizer = DateNormalizer()
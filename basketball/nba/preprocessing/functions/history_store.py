@@ -0,0 +1,91 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+def to_ns(date) -> int:
+    """Converts a timestamp to epoch nanoseconds (naive timestamps are read as UTC)"""
+    return pd.Timestamp(date).value
+
+class TeamHistory:
+    """
+    One team's games, oldest first
+    dates: np.ndarray --> int64 epoch nanoseconds, sorted ascending
+    values: np.ndarray --> float64 matrix (games x stats) in column order, so every stat is one contiguous array
+    keys: List[str] --> stat name of each column
+    """
+    __slots__ = ('dates', 'values', 'keys')
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, keys: List[str]):
+        self.dates = np.ascontiguousarray(dates, dtype=np.int64)
+        self.values = np.asfortranarray(values, dtype=np.float64)
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.dates)
+
+    def stat(self, key: str) -> np.ndarray:
+        return self.values[:, self.keys.index(key)]
+
+    def before(self, date) -> int:
+        """Number of games played strictly before date (the end of a "last N games" slice)"""
+        return int(np.searchsorted(self.dates, to_ns(date), side='left'))
+
+    def between(self, start, end):
+        """Slice bounds of the games played on or after start and strictly before end"""
+        return (
+            int(np.searchsorted(self.dates, to_ns(start), side='left')),
+            int(np.searchsorted(self.dates, to_ns(end), side='left')),
+        )
+
+    def window_sums(self, start: int, stop: int) -> np.ndarray:
+        """
+        Sums every stat over games[start:stop]
+        The slice is added up most recent game first, one game at a time, so the totals are
+        bit-for-bit what walking the games newest to oldest produced
+        """
+        if stop <= start:
+            return np.zeros(len(self.keys))
+        return self.values[start:stop][::-1].cumsum(axis=0)[-1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.values.nbytes
+
+class HistoryStore:
+    """Per-team game histories used by the last-N-games and last-N-years lookups"""
+    def __init__(self, teams: Dict[str, TeamHistory]):
+        self.teams = teams
+
+    @classmethod
+    def from_frame(cls, history: pd.DataFrame, keys: List[str]):
+        """
+        Builds the store from a frame sorted by team and date
+        history: pd.DataFrame --> 'team' and 'formatted_date' columns plus one float column per key
+        keys: List[str] --> stat columns to keep
+        """
+        teams = {}
+        if history.empty:
+            return cls(teams)
+
+        team_values = history['team'].to_numpy()
+        dates = history['formatted_date'].dt.tz_convert('UTC').dt.tz_localize(None).astype('int64').to_numpy()
+        values = history[keys].to_numpy(dtype=np.float64)
+
+        # the frame is sorted by team, so each team is one contiguous block
+        boundaries = np.flatnonzero(team_values[1:] != team_values[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(team_values)]])
+        for start, stop in zip(starts, stops):
+            teams[team_values[start]] = TeamHistory(dates[start:stop], values[start:stop], list(keys))
+
+        return cls(teams)
+
+    def __contains__(self, team) -> bool:
+        return team in self.teams
+
+    def get(self, team) -> TeamHistory:
+        return self.teams.get(team)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(team.nbytes for team in self.teams.values())
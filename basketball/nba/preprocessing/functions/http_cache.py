@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# a page cached with this TTL never goes stale (completed seasons, finished boxscores)
+IMMUTABLE = None
+
+class HttpCache:
+    """
+    Content-addressed on-disk cache of fetched pages
+    directory/<2 hex>/<sha256 of the url>.gz --> gzip of a one-line JSON header (url, fetched_at) and the body
+    Writes go through a temporary file and os.replace, so concurrent scraper threads never see half a page
+    directory: str --> where the pages are kept, None disables the cache (every get misses, put does nothing)
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory) if directory is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    def path_of(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.directory / key[:2] / f'{key}.gz'
+
+    def get(self, url: str, ttl=IMMUTABLE):
+        """
+        Cached body of url, or None when it isn't cached or is older than ttl
+        ttl: float --> seconds a cached page stays fresh, IMMUTABLE (None) keeps it forever
+        """
+        if self.directory is None:
+            return None
+        path = self.path_of(url)
+        try:
+            with gzip.open(path, 'rb') as file:
+                header = json.loads(file.readline())
+                if header['url'] != url or (ttl is not IMMUTABLE and time.time() - header['fetched_at'] > ttl):
+                    self.misses += 1
+                    return None
+                body = file.read()
+        except (OSError, EOFError, ValueError, KeyError):
+            # not cached, or a file that can't be read (treated as not cached, the next put replaces it)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def entries(self):
+        """Yields (url, body) for every cached page, fresh or not"""
+        if self.directory is None:
+            return
+        for path in sorted(self.directory.glob('*/*.gz')):
+            try:
+                with gzip.open(path, 'rb') as file:
+                    header = json.loads(file.readline())
+                    yield header['url'], file.read()
+            except (OSError, EOFError, ValueError, KeyError):
+                continue
+
+    def put(self, url: str, body):
+        """Caches body (bytes or str) as the page of url, fetched now"""
+        if self.directory is None:
+            return
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        path = self.path_of(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = json.dumps({'url': url, 'fetched_at': time.time()}).encode('utf-8')
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as file:
+                file.write(header + b'\n')
+                file.write(body)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,141 @@
+import json
+import re
+
+MARKER = 'window.__INITIAL_STATE__ = '
+# everything from the top-level helpPage key on is ignored, like the old split on '"helpPage":'
+STOP_KEY = 'helpPage'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# everything up to the next bracket outside a string: plain characters and whole strings (escaped quotes and
+# brackets inside them included)
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_BETWEEN_BRACKETS = re.compile(r'(?:[^"{}\[\]]+|' + _STRING + r')*')
+_STRING_VALUE = re.compile(_STRING)
+# a number, true, false or null
+_SCALAR = re.compile(r'[^,:}\]\s]+')
+_decoder = json.JSONDecoder()
+
+class _Done(Exception):
+    """Raised once every wanted path has been read, so the rest of the state is never scanned"""
+
+def read_full_initial_state(html: str) -> dict:
+    """Parses the whole window.__INITIAL_STATE__ object (up to helpPage), the way the scrapers always have"""
+    state = html.split(MARKER)[1].split(f'"{STOP_KEY}":')[0]
+    state += f'"{STOP_KEY}": {{"content": ""}}}}'
+    return json.loads(state)
+
+def read_initial_state(html: str, paths) -> dict:
+    """
+    Reads only the wanted subtrees of window.__INITIAL_STATE__
+    The state is walked one member at a time: members on a wanted path are descended into, the wanted values
+    are decoded, every other member is skipped over without being decoded, and the walk stops as soon as every
+    path has been read, so the full multi-megabyte state is never decoded or held in memory
+    html: str --> page text
+    paths: list --> key paths to read, e.g. [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')]
+    Returns the state pruned to those paths (missing paths are simply left out, so lookups raise KeyError as before)
+    """
+    start = html.find(MARKER)
+    if start == -1:
+        raise ValueError('window.__INITIAL_STATE__ not found')
+
+    spec = {}
+    for path in paths:
+        node = spec
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = None
+
+    state = {}
+    remaining = [len(paths)]
+    try:
+        _read_object(html, start + len(MARKER), spec, state, remaining, top_level=True)
+    except _Done:
+        pass
+    except ValueError:
+        # anything the walk can't read (e.g. non-JSON before helpPage) goes through the old full parse
+        return _prune(read_full_initial_state(html), spec)
+
+    return state
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+def _read_object(text: str, pos: int, spec: dict, out: dict, remaining: list, top_level: bool = False) -> int:
+    """Reads the wanted members of the object starting at text[pos] into out, returns the position after it"""
+    pos = _skip_whitespace(text, pos)
+    if text[pos:pos + 1] != '{':
+        raise ValueError(f'Expecting an object at {pos}')
+    pos = _skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == '}':
+        return pos + 1
+
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise ValueError(f'Expecting a key at {pos}')
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        if top_level and key == STOP_KEY:
+            raise _Done()
+        pos = _skip_whitespace(text, pos)
+        if text[pos:pos + 1] != ':':
+            raise ValueError(f'Expecting ":" at {pos}')
+        pos = _skip_whitespace(text, pos + 1)
+
+        if key in spec and spec[key] is not None:
+            out[key] = {}
+            pos = _read_object(text, pos, spec[key], out[key], remaining)
+        elif key in spec:
+            out[key], pos = _decoder.raw_decode(text, pos)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                raise _Done()
+        else:
+            pos = _skip_value(text, pos)
+
+        pos = _skip_whitespace(text, pos)
+        if text[pos:pos + 1] == ',':
+            pos = _skip_whitespace(text, pos + 1)
+        elif text[pos:pos + 1] == '}':
+            return pos + 1
+        else:
+            raise ValueError(f'Expecting "," or "}}" at {pos}')
+
+def _skip_value(text: str, pos: int) -> int:
+    """
+    Returns the position after the value starting at text[pos] without decoding it: strings are jumped over
+    whole (brackets and escaped quotes inside them don't count) and objects and arrays up to their matching bracket
+    """
+    char = text[pos:pos + 1]
+    if char == '"':
+        match = _STRING_VALUE.match(text, pos)
+        if match is None:
+            raise ValueError(f'Unterminated string at {pos}')
+        return match.end()
+    if char not in ('{', '['):
+        match = _SCALAR.match(text, pos)
+        if match is None:
+            raise ValueError(f'Expecting a value at {pos}')
+        return match.end()
+
+    depth = 0
+    while True:
+        char = text[pos:pos + 1]
+        if char in ('{', '['):
+            depth += 1
+        elif char in ('}', ']'):
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        else:
+            # the end of the text or a string that never closes
+            raise ValueError(f'Unterminated value at {pos}')
+        pos = _BETWEEN_BRACKETS.match(text, pos + 1).end()
+
+def _prune(state, spec: dict) -> dict:
+    pruned = {}
+    if not isinstance(state, dict):
+        return pruned
+    for key, child in spec.items():
+        if key not in state:
+            continue
+        pruned[key] = state[key] if child is None else _prune(state[key], child)
+    return pruned
@@ -0,0 +1,329 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from functions.odds_store import OddsStore
+
+SERIES_FILE = 'line_movement.npz'
+SERIES_VERSION = 2
+# scraped columns of the time series: odds1, odds2, points (of player1), points2 (of player2)
+LINE_SOURCES = {'odds1': 'player1_odds', 'odds2': 'player2_odds', 'points': 'player1_points', 'points2': 'player2_points'}
+# the line of the other side, to re-orient the snapshots that were scraped with the players the other way round
+OTHER_SIDE = {'odds1': 'odds2', 'odds2': 'odds1', 'points': 'points2', 'points2': 'points'}
+NAME_COLUMNS = ['player1_name', 'player2_name']
+# fixed-point scales tried for delta encoding (American odds are whole numbers, points are halves)
+SCALES = (1, 10, 100)
+
+def _to_seconds(values) -> np.ndarray:
+    """scraped_at / start_date values to UTC epoch seconds"""
+    dates = pd.to_datetime(pd.Series(values), format='mixed', utc=True, errors='coerce')
+    return (dates.dt.tz_localize(None).astype('int64') // 10**9).to_numpy()
+
+def _smallest_int(values: np.ndarray) -> np.ndarray:
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values.astype(np.int64)
+
+def _encode(prefix: str, values: np.ndarray, arrays: dict):
+    """
+    Delta encodes one float column: missing values are stored as a bit mask and carried forward, the rest as
+    fixed-point integers differenced from the previous snapshot (mostly zeros, since most scrapes repeat the line)
+    Columns that aren't fixed-point in any of SCALES are stored as raw floats
+    """
+    missing = np.isnan(values)
+    filled = pd.Series(values).ffill().fillna(0).to_numpy()
+    arrays[f'{prefix}_missing'] = np.packbits(missing)
+    for scale in SCALES:
+        fixed = np.round(filled * scale)
+        if np.array_equal(fixed / scale, filled):
+            arrays[f'{prefix}_delta'] = _smallest_int(np.diff(fixed.astype(np.int64), prepend=0))
+            arrays[f'{prefix}_scale'] = np.array(scale)
+            return
+    arrays[f'{prefix}_raw'] = values
+
+def _decode(prefix: str, arrays, length: int) -> np.ndarray:
+    if f'{prefix}_raw' in arrays:
+        return arrays[f'{prefix}_raw'].astype(np.float64)
+    values = np.cumsum(arrays[f'{prefix}_delta'].astype(np.int64)) / float(arrays[f'{prefix}_scale'])
+    missing = np.unpackbits(arrays[f'{prefix}_missing'], count=length).astype(bool)
+    values[missing] = np.nan
+    return values
+
+def _names(history: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in history:
+        return np.full(len(history), '', dtype=object)
+    return history[column].fillna('').astype(str).to_numpy(dtype=object)
+
+class LineMovement:
+    """
+    Every market's line over time: (market_id, scraped_at, odds1, odds2, points, points2) snapshots sorted by market,
+    then scraped_at, so each market is one contiguous block
+    market_ids: List[str] --> market of each block
+    offsets: np.ndarray --> block i is snapshots[offsets[i]:offsets[i + 1]]
+    times: np.ndarray --> scraped_at as UTC epoch seconds
+    odds1, odds2, points, points2: np.ndarray --> float64 lines (NaN when missing) of the market's player1 and player2
+    partitions: np.ndarray --> index into partition_names of the store partition each snapshot was read from
+    player1_names, player2_names: List[str] --> players of each market as its first snapshot named them
+    flipped: np.ndarray --> True for the snapshots scraped with the players the other way round; their lines are
+    stored swapped, so odds1 is always player1_names' odds whatever order a scrape listed the players in
+    """
+    def __init__(self, market_ids, offsets, times, odds1, odds2, points, points2, partitions=None, partition_names=None,
+                 stamps=None, player1_names=None, player2_names=None, flipped=None):
+        self.market_ids = list(market_ids)
+        self.positions = {market_id: i for i, market_id in enumerate(self.market_ids)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.odds1 = np.asarray(odds1, dtype=np.float64)
+        self.odds2 = np.asarray(odds2, dtype=np.float64)
+        self.points = np.asarray(points, dtype=np.float64)
+        self.points2 = np.asarray(points2, dtype=np.float64)
+        self.partitions = np.zeros(len(self.times), dtype=np.int32) if partitions is None else np.asarray(partitions, dtype=np.int32)
+        self.partition_names = list(partition_names or [])
+        # content hash of every partition file when it was read, to refresh only the partitions that changed
+        self.stamps = dict(stamps or {})
+        self.player1_names = list(player1_names) if player1_names is not None else [''] * len(self.market_ids)
+        self.player2_names = list(player2_names) if player2_names is not None else [''] * len(self.market_ids)
+        self.flipped = np.zeros(len(self.times), dtype=bool) if flipped is None else np.asarray(flipped, dtype=bool)
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_history(cls, history: pd.DataFrame, partition_names=None, stamps=None):
+        """
+        Builds the series from odds snapshots (the rows of OddsStore.history())
+        history: pd.DataFrame --> market_id, scraped_at, player1_name, player2_name, player1_odds, player2_odds,
+        player1_points, player2_points (and optionally partition, an index into partition_names)
+        """
+        if history.empty:
+            return cls([], [0], [], [], [], [], [], [], partition_names, stamps)
+
+        frame = pd.DataFrame({
+            'market_id': history['market_id'].astype(str),
+            'time': _to_seconds(history['scraped_at']),
+            'partition': history['partition'].to_numpy() if 'partition' in history else 0,
+            'player1_name': _names(history, 'player1_name'),
+            'player2_name': _names(history, 'player2_name'),
+        })
+        for name, source in LINE_SOURCES.items():
+            frame[name] = pd.to_numeric(history[source], errors='coerce').astype('float64') if source in history else np.nan
+        frame = frame[history['market_id'].notna().to_numpy() & (frame['time'] > 0)]
+        frame = frame.sort_values(['market_id', 'time'], kind='mergesort').reset_index(drop=True)
+
+        market_values = frame['market_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, market_values[1:] != market_values[:-1]]) if len(frame) else np.array([], dtype=np.int64)
+        offsets = np.r_[starts, len(frame)]
+
+        # the first snapshot of a market fixes its orientation; a later one listing its player2 first is flipped
+        player1_names = frame['player1_name'].to_numpy()[starts]
+        player2_names = frame['player2_name'].to_numpy()[starts]
+        lengths = np.diff(offsets)
+        first1, first2 = np.repeat(player1_names, lengths), np.repeat(player2_names, lengths)
+        names1 = frame['player1_name'].to_numpy()
+        flipped = (names1 == first2) & (names1 != first1)
+        lines = {
+            name: np.where(flipped, frame[OTHER_SIDE[name]].to_numpy(), frame[name].to_numpy()) for name in LINE_SOURCES
+        }
+        return cls(
+            market_values[starts], offsets, frame['time'], *lines.values(),
+            frame['partition'], partition_names, stamps, player1_names, player2_names, flipped,
+        )
+
+    @classmethod
+    def from_store(cls, store: OddsStore, previous=None):
+        """
+        Builds the series of an odds store, re-reading only the partitions that changed since previous was built
+        previous: LineMovement --> the cached series (None reads every partition)
+        """
+        names = store.partitions()
+        codes = {name: i for i, name in enumerate(names)}
+        # stamped from the file stats and the stamp the store recorded when it wrote the partition, so an
+        # unchanged store is loaded without reading or hashing any partition
+        stamps = {name: store.partition_stamp(name) for name in names}
+
+        frames = []
+        if previous is not None and len(previous):
+            unchanged = [i for i, name in enumerate(previous.partition_names) if stamps.get(name) == previous.stamps.get(name)]
+            keep = np.isin(previous.partitions, unchanged)
+            kept = previous.to_frame()[keep]
+            # partition codes of the cached snapshots in the current partition list
+            recode = np.array([codes.get(name, -1) for name in previous.partition_names], dtype=np.int32)
+            kept['partition'] = recode[previous.partitions[keep]]
+            frames.append(kept)
+            reread = [name for name in names if stamps[name] != previous.stamps.get(name)]
+        else:
+            reread = names
+
+        for name in reread:
+            rows = store.read_partition(name)
+            rows = rows[[column for column in ['market_id', 'scraped_at', *NAME_COLUMNS, *LINE_SOURCES.values()] if column in rows]]
+            frames.append(rows.assign(partition=codes[name]))
+
+        if not frames:
+            return cls.from_history(pd.DataFrame(), names, stamps)
+        return cls.from_history(pd.concat(frames, ignore_index=True), names, stamps)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The snapshots as market_id, scraped_at, player1_name, player2_name, the LINE_SOURCES columns and partition,
+        with every snapshot back in the orientation it was scraped in
+        """
+        lengths = np.diff(self.offsets)
+        first1 = np.repeat(np.array(self.player1_names, dtype=object), lengths)
+        first2 = np.repeat(np.array(self.player2_names, dtype=object), lengths)
+        frame = pd.DataFrame({
+            'market_id': np.repeat(np.array(self.market_ids, dtype=object), lengths),
+            'scraped_at': pd.to_datetime(self.times, unit='s', utc=True).strftime('%Y-%m-%d %H:%M:%S'),
+            'player1_name': np.where(self.flipped, first2, first1),
+            'player2_name': np.where(self.flipped, first1, first2),
+        })
+        for name, source in LINE_SOURCES.items():
+            frame[source] = np.where(self.flipped, getattr(self, OTHER_SIDE[name]), getattr(self, name))
+        frame['partition'] = self.partitions
+        return frame
+
+    def save(self, path):
+        """Writes the series delta encoded and compressed"""
+        arrays = {
+            'version': np.array(SERIES_VERSION),
+            'market_ids': np.array(self.market_ids, dtype=str),
+            'offsets': self.offsets,
+            'times_delta': np.diff(self.times, prepend=0),
+            'partitions': _smallest_int(self.partitions.astype(np.int64)),
+            'partition_names': np.array(self.partition_names, dtype=str),
+            'stamps': np.array([self.stamps.get(name, '') for name in self.partition_names], dtype=str),
+            'player1_names': np.array(self.player1_names, dtype=str),
+            'player2_names': np.array(self.player2_names, dtype=str),
+            'flipped': np.packbits(self.flipped),
+        }
+        for name in LINE_SOURCES:
+            _encode(name, getattr(self, name), arrays)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            if int(arrays['version']) != SERIES_VERSION:
+                raise ValueError(f'{path} was written by another version of the line movement series')
+            length = int(arrays['offsets'][-1])
+            partition_names = arrays['partition_names'].tolist()
+            return cls(
+                arrays['market_ids'].tolist(), arrays['offsets'], np.cumsum(arrays['times_delta']),
+                *(_decode(name, arrays, length) for name in LINE_SOURCES),
+                arrays['partitions'], partition_names, dict(zip(partition_names, arrays['stamps'].tolist())),
+                arrays['player1_names'].tolist(), arrays['player2_names'].tolist(),
+                np.unpackbits(arrays['flipped'], count=length).astype(bool),
+            )
+
+    def _block(self, market_id):
+        position = self.positions.get(str(market_id))
+        if position is None:
+            return None
+        return self.offsets[position], self.offsets[position + 1]
+
+    def _snapshot(self, i: int) -> dict:
+        snapshot = {'scraped_at': pd.Timestamp(self.times[i], unit='s', tz='UTC')}
+        for name in LINE_SOURCES:
+            snapshot[name] = getattr(self, name)[i]
+        return snapshot
+
+    def series(self, market_id) -> pd.DataFrame:
+        """Every snapshot of one market, oldest first"""
+        block = self._block(market_id)
+        if block is None:
+            return pd.DataFrame(columns=['scraped_at', *LINE_SOURCES])
+        start, stop = block
+        series = pd.DataFrame({'scraped_at': pd.to_datetime(self.times[start:stop], unit='s', utc=True)})
+        for name in LINE_SOURCES:
+            series[name] = getattr(self, name)[start:stop]
+        return series
+
+    def opening(self, market_id):
+        """First snapshot of the market (None if the market was never scraped)"""
+        block = self._block(market_id)
+        return None if block is None else self._snapshot(block[0])
+
+    def closing(self, market_id, before=None):
+        """
+        Last snapshot of the market scraped at or before `before` (the latest one when before is None),
+        found by binary search in the market's block; None if there isn't one
+        """
+        block = self._block(market_id)
+        if block is None:
+            return None
+        start, stop = block
+        if before is not None:
+            stop = start + int(np.searchsorted(self.times[start:stop], _to_seconds([before])[0], side='right'))
+        return None if stop <= start else self._snapshot(stop - 1)
+
+    def max_move(self, market_id):
+        """Largest distance of every line from the opening line (None if the market was never scraped)"""
+        block = self._block(market_id)
+        if block is None:
+            return None
+        start, stop = block
+        moves = {}
+        for name in LINE_SOURCES:
+            values = getattr(self, name)[start:stop]
+            distance = np.abs(values - values[0])
+            moves[name] = float(np.nanmax(distance)) if not np.isnan(distance).all() else np.nan
+        return moves
+
+    def closing_lines(self, market_ids, before, player1_names=None) -> pd.DataFrame:
+        """
+        closing() for many markets at once: one row per market id with the LINE_SOURCES lines and found
+        (False when the market has no snapshot at or before its cutoff)
+        market_ids: list-like --> markets to look up
+        before: list-like --> cutoff of each market (e.g. the event's start time)
+        player1_names: list-like --> who odds1 should belong to for each market (e.g. the player1_name of the
+        caller's own row); lines come in the market's first orientation when None
+        """
+        market_ids = pd.Series(market_ids).astype(str).to_numpy()
+        cutoffs = _to_seconds(before)
+        rows = np.full(len(market_ids), -1, dtype=np.int64)
+        for i, (market_id, cutoff) in enumerate(zip(market_ids, cutoffs)):
+            block = self._block(market_id)
+            if block is None:
+                continue
+            start, stop = block
+            stop = start + int(np.searchsorted(self.times[start:stop], cutoff, side='right'))
+            if stop > start:
+                rows[i] = stop - 1
+
+        found = rows >= 0
+        picked = np.where(found, rows, 0)
+        swap = np.zeros(len(market_ids), dtype=bool)
+        if player1_names is not None:
+            player2_of = {market_id: name for market_id, name in zip(self.market_ids, self.player2_names)}
+            names = pd.Series(player1_names).fillna('').astype(str).to_numpy()
+            swap = np.array([player2_of.get(m, '') == n != '' for m, n in zip(market_ids, names)], dtype=bool)
+        lines = {'found': found}
+        for name in LINE_SOURCES:
+            values = getattr(self, name)
+            other = getattr(self, OTHER_SIDE[name])
+            oriented = np.where(swap, other[picked], values[picked]) if len(values) else np.nan
+            lines[name] = np.where(found, oriented, np.nan)
+        return pd.DataFrame(lines)
+
+def load_line_movement(store_dir):
+    """
+    Line movement series of the odds store in store_dir (e.g. data/nba_odds), cached in store_dir/line_movement.npz
+    and refreshed from the partitions that changed since; None when the store has no snapshots yet
+    """
+    store = OddsStore(store_dir)
+    if store.is_empty():
+        return None
+
+    cache_path = Path(store_dir) / SERIES_FILE
+    previous = None
+    if cache_path.exists():
+        try:
+            previous = LineMovement.load(cache_path)
+        except Exception as e:
+            print(f'Rebuilding {cache_path.name}: {e}')
+
+    lines = LineMovement.from_store(store, previous)
+    if previous is None or lines.stamps != previous.stamps:
+        lines.save(cache_path)
+    return lines
@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+# bump this whenever the processed row layout or the feature code changes so stale caches are rebuilt
+STATE_VERSION = 3
+
+# number of games each feature looks back over (the widest window in the default FEATURE_WINDOWS)
+LOOKBACK_GAMES = 5
+
+KEY_COLUMNS = ['team', 'opponent', 'date_ns']
+
+def _frame_arrays(frame: pd.DataFrame, prefix: str, arrays: dict) -> list:
+    """
+    Stores the columns of a frame as plain arrays under prefix/<position>, returning (name, kind) of each column
+    kinds: a numpy dtype string for numbers and bools, 'str' for text columns (with a prefix/<position>_missing
+    mask), 'datetime' for tz-aware timestamps (as UTC epoch nanoseconds)
+    """
+    columns = []
+    for i, (name, values) in enumerate(frame.items()):
+        key = f'{prefix}/{i}'
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            arrays[key] = values.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().view(np.int64)
+            columns.append((name, 'datetime'))
+        elif values.dtype == object:
+            missing = values.isna().to_numpy()
+            if not values[~missing].map(lambda value: isinstance(value, str)).all():
+                raise TypeError(f'column {name} holds values other than strings')
+            arrays[key] = np.array(values.where(~missing, '').tolist(), dtype=str)
+            arrays[f'{key}_missing'] = missing
+            columns.append((name, 'str'))
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biuf':
+            arrays[key] = values.to_numpy()
+            columns.append((name, values.dtype.str))
+        else:
+            raise TypeError(f'column {name} has an unsupported type {values.dtype}')
+    return columns
+
+def _array_frame(arrays, prefix: str, columns: list) -> pd.DataFrame:
+    data = {}
+    for i, (name, kind) in enumerate(columns):
+        values = arrays[f'{prefix}/{i}']
+        if kind == 'datetime':
+            data[name] = pd.Series(values.view('datetime64[ns]')).dt.tz_localize('UTC')
+        elif kind == 'str':
+            data[name] = pd.Series(values.astype(object)).where(~arrays[f'{prefix}/{i}_missing'], np.nan)
+        else:
+            data[name] = pd.Series(values.astype(np.dtype(kind)))
+    return pd.DataFrame(data)
+
+class ProcessorState:
+    """
+    Persisted state for incremental preprocessing, stored as plain data: an npz of columns plus a JSON stamp
+    (version, feature windows and column layout) next to it, so no pickled object is ever loaded
+    fingerprints: pd.DataFrame --> one hash per nba_games.csv row, indexed by (team, opponent, date_ns)
+    team_dates: Dict[str, np.ndarray] --> each team's sorted game dates (epoch nanoseconds) from the last run
+    processed: pd.DataFrame --> processed feature rows from the last run, keyed by (team, opponent, date)
+    windows: List[Dict] --> feature window config the processed rows were built with
+    """
+    def __init__(self, fingerprints: pd.DataFrame = None, team_dates: Dict[str, np.ndarray] = None, processed: pd.DataFrame = None, windows: List[Dict] = None):
+        self.version = STATE_VERSION
+        self.fingerprints = fingerprints
+        self.team_dates = team_dates or {}
+        self.processed = processed
+        self.windows = windows
+
+    @property
+    def is_empty(self) -> bool:
+        return self.fingerprints is None or self.processed is None
+
+    @staticmethod
+    def stamp_path(path) -> Path:
+        return Path(path).with_suffix('.json')
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads the state from path (the npz) and its JSON stamp, returning an empty state if either is missing, is
+        from an older version or can't be read (a truncated or unfetched LFS object)
+        """
+        path = Path(path)
+        stamp_path = cls.stamp_path(path)
+        if not path.exists() or not stamp_path.exists():
+            print(f'No processor state found at {path}, running a full rebuild')
+            return cls()
+
+        try:
+            stamp = json.loads(stamp_path.read_text())
+            if stamp.get('version') != STATE_VERSION:
+                print(f'Processor state at {path} is out of date, running a full rebuild')
+                return cls()
+            with np.load(path, allow_pickle=False) as arrays:
+                fingerprints = _array_frame(arrays, 'fingerprints', stamp['fingerprints']).set_index(KEY_COLUMNS)
+                processed = _array_frame(arrays, 'processed', stamp['processed'])
+        except (OSError, EOFError, ValueError, KeyError, TypeError, zipfile.BadZipFile) as e:
+            print(f'Could not read the processor state at {path} ({type(e).__name__}: {e}), running a full rebuild')
+            return cls()
+
+        # the team dates are the fingerprinted game dates of each team, sorted
+        dates = pd.Series(fingerprints.index.get_level_values('date_ns'), index=fingerprints.index.get_level_values('team'))
+        team_dates = {team: np.sort(group.to_numpy()) for team, group in dates.groupby(level=0)}
+        return cls(fingerprints, team_dates, processed, stamp['windows'])
+
+    def save(self, path):
+        """Writes the npz and then its JSON stamp (each atomically, through a temporary file)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        stamp = {
+            'version': self.version,
+            'windows': self.windows,
+            'fingerprints': _frame_arrays(self.fingerprints.reset_index(), 'fingerprints', arrays),
+            'processed': _frame_arrays(self.processed, 'processed', arrays),
+        }
+        _replace(path, lambda file: np.savez_compressed(file, **arrays))
+        _replace(self.stamp_path(path), lambda file: file.write(json.dumps(stamp, indent=1).encode()))
+
+def _replace(path: Path, write):
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def date_ns(dates: pd.Series) -> np.ndarray:
+    """Converts a tz-aware datetime column to int64 epoch nanoseconds"""
+    return dates.dt.tz_convert('UTC').dt.tz_localize(None).astype('int64').to_numpy()
+
+def fingerprint_games(game_data: pd.DataFrame, value_columns) -> pd.DataFrame:
+    """Hashes every game row so changed rows can be found without comparing whole frames"""
+    fingerprints = pd.DataFrame({
+        'team': game_data['team'].to_numpy(),
+        'opponent': game_data['opponent'].to_numpy(),
+        'date_ns': date_ns(game_data['formatted_date']),
+        'hash': pd.util.hash_pandas_object(game_data[value_columns], index=False).to_numpy(),
+    })
+    return fingerprints.set_index(KEY_COLUMNS)
+
+def sorted_team_dates(game_data: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Builds each team's sorted array of game dates (epoch nanoseconds)"""
+    frame = pd.DataFrame({'team': game_data['team'].to_numpy(), 'date_ns': date_ns(game_data['formatted_date'])})
+    return {team: np.sort(group['date_ns'].to_numpy()) for team, group in frame.groupby('team')}
+
+def lookback_horizon(dates: np.ndarray, changed_date: int, lookback_games: int = LOOKBACK_GAMES) -> int:
+    """
+    Returns the last game date whose look-back window can include a game on changed_date:
+    the lookback_games-th game the team plays after it (or no limit if the team has not played that many since,
+    or if lookback_games is None because the windows are not bounded by a game count)
+    """
+    if lookback_games is None:
+        return np.iinfo(np.int64).max
+    first_after = np.searchsorted(dates, changed_date, side='right')
+    last_affected = first_after + lookback_games - 1
+    if last_affected >= len(dates):
+        return np.iinfo(np.int64).max
+    return int(dates[last_affected])
+
+def changed_games(old: pd.DataFrame, new: pd.DataFrame):
+    """Returns the keys of new or updated rows and of rows that disappeared since the last run"""
+    common = new.index.intersection(old.index)
+    updated = common[new.loc[common, 'hash'].to_numpy() != old.loc[common, 'hash'].to_numpy()]
+    added = new.index.difference(old.index)
+    removed = old.index.difference(new.index)
+    return added.append(updated), removed
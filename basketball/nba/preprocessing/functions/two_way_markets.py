@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# market columns taken from the first outcome, then the per-outcome columns as (output suffix, scraped column)
+MARKET_COLUMNS = ['tournament_name', 'event_name', 'start_date', 'market_name']
+OUTCOME_COLUMNS = [
+    ('name', 'label'),
+    ('odds', 'true_odds'),
+    ('points', 'points'),
+    ('outcome_type', 'outcome_type'),
+    ('label', 'label'),
+]
+
+def american_odds(decimal_odds) -> np.ndarray:
+    """
+    Converts decimal odds to American odds over a whole column, truncating like int()
+    odds >= 2 --> (odds - 1) * 100, otherwise -100 / (odds - 1); odds of 1 (or missing) have no American odds
+    The dtype is what pandas made of the old per-value ints and Nones: int64 when every value converts,
+    all None when none do, float64 with NaN otherwise
+    """
+    odds = np.asarray(decimal_odds, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        american = np.trunc(np.where(odds >= 2, (odds - 1) * 100, -100 / (odds - 1)))
+    valid = np.isfinite(american)
+    if valid.all():
+        return american.astype(np.int64)
+    if not valid.any():
+        return np.full(len(american), None, dtype=object)
+    american[~valid] = np.nan
+    return american
+
+def pivot_two_way_markets(data: pd.DataFrame, odds_format: str = 'decimal', american_columns: bool = False,
+                          scraped_at_first: bool = False) -> pd.DataFrame:
+    """
+    Pairs up the two outcomes of every market that has exactly two, one row per market ordered by market_id:
+    market_id, the market columns, then player1_<...> and player2_<...> from the first and second outcome as scraped
+    data: pd.DataFrame --> one row per selection (market_id, true_odds, label, ... as built by the scrapers)
+    odds_format: str --> 'decimal' keeps true_odds in player<N>_odds, 'american' converts it
+    american_columns: bool --> also add player<N>_american_odds after each player<N>_odds
+    scraped_at_first: bool --> put the scraped_at column first instead of last
+    Returns an empty frame (no columns) when there are no two-way markets
+    """
+    if odds_format not in ('decimal', 'american'):
+        raise ValueError(f'Unknown odds format {odds_format}')
+
+    counts = data['market_id'].map(data['market_id'].value_counts())
+    two_way = data[counts == 2].sort_values('market_id', kind='mergesort')
+    if two_way.empty:
+        return pd.DataFrame()
+
+    # rank of each outcome within its market (stable sort, so in scraped order), then one side per rank
+    position = two_way.groupby('market_id', sort=False).cumcount().to_numpy()
+    sides = [two_way[position == rank].reset_index(drop=True) for rank in (0, 1)]
+
+    columns = {'market_id': sides[0]['market_id']}
+    for column in MARKET_COLUMNS:
+        columns[column] = sides[0][column]
+    for player, side in enumerate(sides, start=1):
+        for suffix, source in OUTCOME_COLUMNS:
+            if suffix == 'odds':
+                columns[f'player{player}_odds'] = (
+                    american_odds(side[source]) if odds_format == 'american' else side[source]
+                )
+                if american_columns:
+                    columns[f'player{player}_american_odds'] = american_odds(side[source])
+            else:
+                columns[f'player{player}_{suffix}'] = side[source]
+
+    # the scraped_at timestamp, in UTC
+    scraped_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    processed = pd.DataFrame(columns)
+    if scraped_at_first:
+        processed.insert(0, 'scraped_at', scraped_at)
+    else:
+        processed['scraped_at'] = scraped_at
+    return processed
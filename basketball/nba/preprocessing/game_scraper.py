@@ -1,26 +1,110 @@
-import requests, time, random
+import requests, time, random, re
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from bs4 import BeautifulSoup
 import pandas as pd
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 from functions.general import get_team_from_name
+from functions.data_store import read_table, write_table
+from functions.rate_limit import TokenBucket
+from functions.http_cache import HttpCache, IMMUTABLE
+from functions.table_rows import read_rows
 from crawlbase import CrawlingAPI
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# pages fetched at the same time, and the most requests started per second across all of them
+# (the Crawlbase token's concurrency allowance; the old serial loop slept 3-4 seconds between requests)
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+# attempts per page, and the base of the jittered exponential backoff between them (seconds)
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 2.0
+# statuses worth retrying (rate limited or a proxy / server hiccup), any other status fails the page right away
+RETRY_STATUSES = {429, 500, 502, 503, 504, 520}
+# fetched pages are kept in the cache directory: game logs of completed seasons never change, the current season's
+# game logs and schedules go stale after CURRENT_SEASON_TTL / SCHEDULE_TTL seconds
+CACHE_DIR = 'data/http_cache'
+CURRENT_SEASON_TTL = 6 * 3600
+SCHEDULE_TTL = 3600
+
+# game log columns copied straight from the data-stat cell of the same row (after team, date, opponent, home and win)
+GAME_LOG_STATS = [
+    ("points", "team_game_score"),
+    ("opponent_points", "opp_team_game_score"),
+    ("field_goals", "fg"),
+    ("field_goals_attempted", "fga"),
+    ("field_goals_percentage", "fg_pct"),
+    ("three_point_field_goals", "fg3"),
+    ("three_point_field_goals_attempted", "fg3a"),
+    ("three_point_field_goals_percentage", "fg3_pct"),
+    ("free_throws", "ft"),
+    ("free_throws_attempted", "fta"),
+    ("free_throws_percentage", "ft_pct"),
+    ("offensive_rebounds", "orb"),
+    ("total_rebounds", "trb"),
+    ("assists", "ast"),
+    ("steals", "stl"),
+    ("blocks", "blk"),
+    ("turnovers", "tov"),
+    ("personal_fouls", "pf"),
+    ("opponent_field_goals", "opp_fg"),
+    ("opponent_field_goals_attempted", "opp_fga"),
+    ("opponent_field_goals_percentage", "opp_fg_pct"),
+    ("opponent_three_point_field_goals", "opp_fg3"),
+    ("opponent_three_point_field_goals_attempted", "opp_fg3a"),
+    ("opponent_three_point_field_goals_percentage", "opp_fg3_pct"),
+    ("opponent_free_throws", "opp_ft"),
+    ("opponent_free_throws_attempted", "opp_fta"),
+    ("opponent_free_throws_percentage", "opp_ft_pct"),
+    ("opponent_offensive_rebounds", "opp_orb"),
+    ("opponent_total_rebounds", "opp_trb"),
+    ("opponent_assists", "opp_ast"),
+    ("opponent_steals", "opp_stl"),
+    ("opponent_blocks", "opp_blk"),
+    ("opponent_turnovers", "opp_tov"),
+    ("opponent_personal_fouls", "opp_pf"),
+]
+
+def is_game_log_row(attrs):
+    return (attrs.get('id') or '').startswith('team_game_log')
+
+def is_schedule_row(attrs):
+    # the game rows of a schedule are the ones without a class (headers and separators have one)
+    return 'class' not in attrs
+
+def current_season():
+    """The season being played (or the last one, before September), by the year it ends"""
+    if datetime.now().month >= 9:
+        return datetime.now().year + 1
+    return datetime.now().year
+
 class Scraper:
-    def __init__(self, use_crawlbase=True):
-        # Initialize Crawlbase Smart AI Proxy
-        crawlbase_token = os.getenv('CRAWLBASE_TOKEN')
-        if not crawlbase_token:
-            raise ValueError("CRAWLBASE_TOKEN environment variable is required")
-        self.crawlbase_api = CrawlingAPI({'token': crawlbase_token})
+    def __init__(self, use_crawlbase=True, crawlbase_api=None, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND, cache_dir=CACHE_DIR):
+        """
+        use_crawlbase: bool --> fetch the pages through Crawlbase instead of the plain session
+        crawlbase_api: CrawlingAPI --> client to fetch through (anything with get(url) returning status_code, headers
+        and body), built from CRAWLBASE_TOKEN when not given
+        max_workers: int --> pages fetched at the same time (1 fetches them one by one)
+        requests_per_second: float --> most requests started per second, shared by all the workers (0 for no limit)
+        cache_dir: str --> where fetched pages are cached, None to always fetch
+        """
+        if crawlbase_api is None:
+            # Initialize Crawlbase Smart AI Proxy
+            crawlbase_token = os.getenv('CRAWLBASE_TOKEN')
+            if not crawlbase_token:
+                raise ValueError("CRAWLBASE_TOKEN environment variable is required")
+            crawlbase_api = CrawlingAPI({'token': crawlbase_token})
+        self.crawlbase_api = crawlbase_api
 
         self.use_crawlbase = use_crawlbase
+        self.max_workers = max(max_workers, 1)
+        self.limiter = TokenBucket(requests_per_second, capacity=self.max_workers)
         self.session = self.get_session()
+        self.cache = HttpCache(cache_dir)
         self.nbaTeams = [
             'bos', 'nyk', 'phi', 'brk', 'tor', 'cle', 'mil',
             'ind', 'det', 'chi', 'atl', 'orl', 'mia', 'cho',
@@ -35,7 +119,7 @@ class Scraper:
         # We still create a session for any non-Crawlbase requests if needed
         session = requests.Session()
         retry = Retry(total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=self.max_workers)
         session.mount('http://', adapter)
         session.mount('https://', adapter)
 
@@ -49,79 +133,95 @@ class Scraper:
         })
         return session
 
+    def cache_ttl(self, url):
+        """How long a cached copy of url stays fresh (IMMUTABLE for the game logs of completed seasons)"""
+        if url.endswith('_games.html'):
+            return SCHEDULE_TTL
+        season = re.search(r'/teams/\w+/(\d{4})/gamelog/', url)
+        if season and int(season.group(1)) < current_season():
+            return IMMUTABLE
+        return CURRENT_SEASON_TTL
+
+    def fetch_html(self, url, label):
+        """
+        Fetches a page through Crawlbase (or the plain session), retrying rate limits, server errors and network
+        errors with jittered exponential backoff. Every attempt takes a token from the shared limiter, pages with a
+        fresh copy in the cache are answered from it without any request
+        url: str --> page to fetch
+        label: str --> what is being scraped, for the error messages (e.g. 'bos 2025')
+        Returns the page html, or None when it couldn't be fetched
+        """
+        html_content = self.cache.get(url, self.cache_ttl(url))
+        if html_content is not None:
+            return html_content
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.acquire()
+            headers = {}
+            try:
+                if self.use_crawlbase:
+                    # Use Crawlbase Smart AI Proxy to bypass Cloudflare
+                    response = self.crawlbase_api.get(url)
+                    status = response['status_code']
+                    if status == 200:
+                        # Get the HTML content from Crawlbase response
+                        self.cache.put(url, response['body'])
+                        return response['body']
+                    headers = response.get('headers', {})
+                else:
+                    response = self.session.get(url, headers={'User-Agent': 'Mozilla/5.0'})
+                    status = response.status_code
+                    if status == 200:
+                        self.cache.put(url, response.content)
+                        return response.content
+                error = status
+                retry = status in RETRY_STATUSES
+            except Exception as e:
+                error = e
+                retry = True
+
+            if not retry or attempt == MAX_ATTEMPTS:
+                print(f"Error scraping {label}: {error}")
+                if headers:
+                    print(f"Response headers: {headers}")
+                return None
+
+            # full jitter, so workers that got throttled together don't all come back together
+            delay = random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1))
+            print(f"Retrying {label} in {delay:.1f}s (attempt {attempt} failed: {error})")
+            time.sleep(delay)
+
+    def map_concurrently(self, fetch, jobs):
+        """
+        Runs fetch(*job) for every job on max_workers threads (the limiter spaces out the requests)
+        Returns the results in the order of jobs, so the output is the same as the serial loop
+        """
+        if self.max_workers == 1:
+            return [fetch(*job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda job: fetch(*job), jobs))
+
     def get_game_data(self, team, year):
         print(f"Scraping {team} {year}")
         url = f"https://www.basketball-reference.com/teams/{team}/{year}/gamelog/"
-        
-        try:
-            response = None
-            html_content = None
-            if self.use_crawlbase:
-                # Use Crawlbase Smart AI Proxy to bypass Cloudflare
-                response = self.crawlbase_api.get(url)
-                if response['status_code'] != 200:
-                    print(f"Error scraping {team} {year}: {response['status_code']}")
-                    print(f"Response headers: {response.get('headers', {})}")
-                    return []
-                
-                # Get the HTML content from Crawlbase response
-                html_content = response['body']
-            else:
-                response = self.session.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-                response.raise_for_status()
-                
-                if response.status_code != 200:
-                    print(f"Error scraping {team} {year}: {response.status_code}")
-                    return []
-                
-                html_content = response.content
-            
-            soup = BeautifulSoup(html_content, "html.parser")
 
-            trs = soup.find_all("tr", {"id": lambda x: x and x.startswith("team_game_log")})
+        html_content = self.fetch_html(url, f"{team} {year}")
+        if html_content is None:
+            return []
+
+        try:
             games = []
-            for tr in trs:
-                games.append({
+            for cells in read_rows(html_content, is_game_log_row):
+                game = {
                     "team": team,
-                    "date": tr.find("td", {"data-stat": "date"}).text,
-                    "opponent": tr.find("td", {"data-stat": "opp_name_abbr"}).text.lower(),
-                    "home": tr.find("td", {"data-stat": "game_location"}).text == "@" or False,
-                    "win": 1 if tr.find("td", {"data-stat": "team_game_result"}).text == "W" else 0,
-                    "points": tr.find("td", {"data-stat": "team_game_score"}).text,
-                    "opponent_points": tr.find("td", {"data-stat": "opp_team_game_score"}).text,
-                    "field_goals": tr.find("td", {"data-stat": "fg"}).text,
-                    "field_goals_attempted": tr.find("td", {"data-stat": "fga"}).text,
-                    "field_goals_percentage": tr.find("td", {"data-stat": "fg_pct"}).text,
-                    "three_point_field_goals": tr.find("td", {"data-stat": "fg3"}).text,
-                    "three_point_field_goals_attempted": tr.find("td", {"data-stat": "fg3a"}).text,
-                    "three_point_field_goals_percentage": tr.find("td", {"data-stat": "fg3_pct"}).text,
-                    "free_throws": tr.find("td", {"data-stat": "ft"}).text,
-                    "free_throws_attempted": tr.find("td", {"data-stat": "fta"}).text,
-                    "free_throws_percentage": tr.find("td", {"data-stat": "ft_pct"}).text,
-                    "offensive_rebounds": tr.find("td", {"data-stat": "orb"}).text,
-                    "total_rebounds": tr.find("td", {"data-stat": "trb"}).text,
-                    "assists": tr.find("td", {"data-stat": "ast"}).text,
-                    "steals": tr.find("td", {"data-stat": "stl"}).text,
-                    "blocks": tr.find("td", {"data-stat": "blk"}).text,
-                    "turnovers": tr.find("td", {"data-stat": "tov"}).text,
-                    "personal_fouls": tr.find("td", {"data-stat": "pf"}).text,
-                    "opponent_field_goals": tr.find("td", {"data-stat": "opp_fg"}).text,
-                    "opponent_field_goals_attempted": tr.find("td", {"data-stat": "opp_fga"}).text,
-                    "opponent_field_goals_percentage": tr.find("td", {"data-stat": "opp_fg_pct"}).text,
-                    "opponent_three_point_field_goals": tr.find("td", {"data-stat": "opp_fg3"}).text,
-                    "opponent_three_point_field_goals_attempted": tr.find("td", {"data-stat": "opp_fg3a"}).text,
-                    "opponent_three_point_field_goals_percentage": tr.find("td", {"data-stat": "opp_fg3_pct"}).text,
-                    "opponent_free_throws": tr.find("td", {"data-stat": "opp_ft"}).text,
-                    "opponent_free_throws_attempted": tr.find("td", {"data-stat": "opp_fta"}).text,
-                    "opponent_free_throws_percentage": tr.find("td", {"data-stat": "opp_ft_pct"}).text,
-                    "opponent_offensive_rebounds": tr.find("td", {"data-stat": "opp_orb"}).text,
-                    "opponent_total_rebounds": tr.find("td", {"data-stat": "opp_trb"}).text,
-                    "opponent_assists": tr.find("td", {"data-stat": "opp_ast"}).text,
-                    "opponent_steals": tr.find("td", {"data-stat": "opp_stl"}).text,
-                    "opponent_blocks": tr.find("td", {"data-stat": "opp_blk"}).text,
-                    "opponent_turnovers": tr.find("td", {"data-stat": "opp_tov"}).text,
-                    "opponent_personal_fouls": tr.find("td", {"data-stat": "opp_pf"}).text,
-                })
+                    "date": cells["date"].text,
+                    "opponent": cells["opp_name_abbr"].text.lower(),
+                    "home": cells["game_location"].text == "@" or False,
+                    "win": 1 if cells["team_game_result"].text == "W" else 0,
+                }
+                for column, stat in GAME_LOG_STATS:
+                    game[column] = cells[stat].text
+                games.append(game)
             
             return games
         
@@ -129,13 +229,14 @@ class Scraper:
             print(f"Error scraping {team} {year}: {e}")
             return []
 
-    def scrape_nba_data(self, start_year, end_year):
-        all_games = []
+    def team_years(self, start_year, end_year):
+        """
+        The (team, year) game logs to scrape, in the order the serial loop scraped them,
+        with the franchises' old abbreviations for the years they used them
+        """
+        jobs = []
         for team in self.nbaTeams:
             for year in range(start_year, end_year + 1):
-                # Add a random delay between requests
-                time.sleep(random.uniform(3, 4))
-
                 # handling all the weird corner cases
                 if team == 'brk' or team == 'njn':
                     if year < 2013:
@@ -171,11 +272,13 @@ class Scraper:
                     else:
                         team = 'nop'
 
-                stats = self.get_game_data(team.lower(), year)
-                if not stats:
-                    continue
+                jobs.append((team.lower(), year))
+        return jobs
 
-                all_games.extend(stats)
+    def scrape_nba_data(self, start_year, end_year):
+        all_games = []
+        for stats in self.map_concurrently(self.get_game_data, self.team_years(start_year, end_year)):
+            all_games.extend(stats)
         
         print(f'Scraped {len(all_games)} games')
 
@@ -188,7 +291,7 @@ class Scraper:
 
         # read the old scraped data
         try:
-            old_games_df = pd.read_csv("data/nba_games.csv")
+            old_games_df = read_table("data/nba_games.csv")
         except FileNotFoundError:
             old_games_df = pd.DataFrame()
         print(f'Read {len(old_games_df)} games from data/nba_games.csv')
@@ -212,120 +315,113 @@ class Scraper:
         combined_games['year'] = combined_games['date'].dt.year
         combined_games = combined_games.sort_values(by=['year', 'team', 'date'], ascending=True)
         combined_games = combined_games.drop(columns=['year'])
-        combined_games.to_csv("data/nba_games.csv", index=False)
+        write_table(combined_games, "data/nba_games.csv")
 
         return combined_games
     
+    def get_next_games(self, team, current_year):
+        print(f'Scraping {team} {current_year}')
+
+        url = f'https://www.basketball-reference.com/teams/{team.upper()}/{current_year}_games.html'
+
+        html_content = self.fetch_html(url, f"{team} {current_year}")
+        if html_content is None:
+            return []
+
+        try:
+            rows = read_rows(html_content, is_schedule_row)
+        except Exception as e:
+            print(f"Error scraping {team} {current_year}: {e}")
+            return []
+        games = []
+
+        # get the first tr with no text in the td with the data-stat 'game_result'
+        for cells in rows:
+            date_elem = cells.get("date_game")
+            if not date_elem:
+                continue
+            date = date_elem.attrs['csk']
+
+            # if the date is tomorrow, add the game to the list
+            home = not cells["game_location"].text == "@"
+            opponent = cells["opp_name"].text.lower()
+            opponent_team = get_team_from_name(opponent)
+            games.append({
+                "date": date,
+                "team": team,
+                "opponent": opponent_team,
+                "home": home,
+                "win": None,
+                "points": None,
+                "opponent_points": None,
+                "field_goals": None,
+                "field_goals_attempted": None,
+                "field_goals_percentage": None,
+                "three_point_field_goals": None,
+                "three_point_field_goals_attempted": None,
+                "three_point_field_goals_percentage": None,
+                "free_throws": None,
+                "free_throws_attempted": None,
+                "free_throws_percentage": None,
+                "offensive_rebounds": None,
+                "total_rebounds": None,
+                "assists": None,
+                "steals": None,
+                "blocks": None,
+                "turnovers": None,
+                "personal_fouls": None,
+                "opponent_field_goals": None,
+                "opponent_field_goals_attempted": None,
+                "opponent_field_goals_percentage": None,
+                "opponent_three_point_field_goals": None,
+                "opponent_three_point_field_goals_attempted": None,
+                "opponent_three_point_field_goals_percentage": None,
+                "opponent_free_throws": None,
+                "opponent_free_throws_attempted": None,
+                "opponent_free_throws_percentage": None,
+                "opponent_offensive_rebounds": None,
+                "opponent_total_rebounds": None,
+                "opponent_assists": None,
+                "opponent_steals": None,
+                "opponent_blocks": None,
+                "opponent_turnovers": None,
+                "opponent_personal_fouls": None
+            })
+
+        return games
+
     def scrape_next_games(self, current_year):
         print('Scraping next games...')
 
         next_games = []
         # loop through all the teams
-        for team in self.nbaTeams:
-            print(f'Scraping {team} {current_year}')
-
-            url = f'https://www.basketball-reference.com/teams/{team.upper()}/{current_year}_games.html'
-            
-            try:
-                response = None
-                html_content = None
-                if self.use_crawlbase:
-                    # Use Crawlbase Smart AI Proxy to bypass Cloudflare
-                    response = self.crawlbase_api.get(url)
-                    if response['status_code'] != 200:
-                        print(f"Error scraping {team} {current_year}: {response['status_code']}")
-                        continue
-                    
-                    # Get the HTML content from Crawlbase response
-                    html_content = response['body']
-                else:
-                    response = self.session.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-                    response.raise_for_status()
-                    
-                    if response.status_code != 200:
-                        print(f"Error scraping {team} {current_year}: {response.status_code}")
-                        continue
-                    
-                    html_content = response.content
-                
-                soup = BeautifulSoup(html_content, "html.parser")
-            except Exception as e:
-                print(f"Error scraping {team} {current_year}: {e}")
-                continue
-            trs = soup.find_all("tr", {"class": None})
-
-            # get the first tr with no text in the td with the data-stat 'game_result'
-            for tr in trs:
-                date_elem = tr.find("td", {"data-stat": "date_game"})
-                if not date_elem:
-                    continue
-                date = date_elem['csk']
-
-                # if the date is tomorrow, add the game to the list
-                home = not tr.find("td", {"data-stat": "game_location"}).text == "@"
-                opponent = tr.find("td", {"data-stat": "opp_name"}).text.lower()
-                opponent_team = get_team_from_name(opponent)
-                next_games.append({
-                    "date": date,
-                    "team": team,
-                    "opponent": opponent_team,
-                    "home": home,
-                    "win": None,
-                    "points": None,
-                    "opponent_points": None,
-                    "field_goals": None,
-                    "field_goals_attempted": None,
-                    "field_goals_percentage": None,
-                    "three_point_field_goals": None,
-                    "three_point_field_goals_attempted": None,
-                    "three_point_field_goals_percentage": None,
-                    "free_throws": None,
-                    "free_throws_attempted": None,
-                    "free_throws_percentage": None,
-                    "offensive_rebounds": None,
-                    "total_rebounds": None,
-                    "assists": None,
-                    "steals": None,
-                    "blocks": None,
-                    "turnovers": None,
-                    "personal_fouls": None,
-                    "opponent_field_goals": None,
-                    "opponent_field_goals_attempted": None,
-                    "opponent_field_goals_percentage": None,
-                    "opponent_three_point_field_goals": None,
-                    "opponent_three_point_field_goals_attempted": None,
-                    "opponent_three_point_field_goals_percentage": None,
-                    "opponent_free_throws": None,
-                    "opponent_free_throws_attempted": None,
-                    "opponent_free_throws_percentage": None,
-                    "opponent_offensive_rebounds": None,
-                    "opponent_total_rebounds": None,
-                    "opponent_assists": None,
-                    "opponent_steals": None,
-                    "opponent_blocks": None,
-                    "opponent_turnovers": None,
-                    "opponent_personal_fouls": None
-                })
-
-            time.sleep(random.uniform(3, 4))
+        for games in self.map_concurrently(self.get_next_games, [(team, current_year) for team in self.nbaTeams]):
+            next_games.extend(games)
 
         print(f'Scraped {len(next_games)} next games')
+        print(f'Page cache: {self.cache.hits} hits, {self.cache.misses} misses')
 
         # return next_games
         return next_games
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scrape the NBA game logs and schedules from basketball-reference')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='pages fetched at the same time (1 fetches them one by one)')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help='most requests started per second across all the workers (0 for no limit)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='where fetched pages are cached')
+    parser.add_argument('--no-cache', action='store_true', help='fetch every page, without reading or writing the cache')
+    args = parser.parse_args()
+
     start_time = time.time()
 
     # get the current year
-    current_year = None
-    if datetime.now().month >= 9:
-        current_year = datetime.now().year + 1
-    else:
-        current_year = datetime.now().year
+    current_year = current_season()
     print(f'Current year: {current_year}')
 
-    scraper = Scraper(use_crawlbase=True)
+    scraper = Scraper(use_crawlbase=True, max_workers=args.workers, requests_per_second=args.rate,
+                      cache_dir=None if args.no_cache else args.cache_dir)
     scraper.scrape_nba_data(current_year, current_year)
 
     print("Data scraping completed and saved to nba_games.csv")
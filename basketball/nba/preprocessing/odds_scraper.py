@@ -3,12 +3,40 @@ import time
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import json
-from datetime import datetime, timezone
 import pandas as pd
 import os
-
-def create_session():
-    """Create a session with retry strategy and browser-like headers"""
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from functions.rate_limit import TokenBucket
+from functions.initial_state import read_initial_state, read_full_initial_state
+from functions.two_way_markets import pivot_two_way_markets
+from functions.odds_store import open_odds_store
+
+# hosts can be pointed at a local stub that serves recorded pages (e.g. DRAFTKINGS_BASE_URL=http://localhost:8000)
+BASE_URL = os.getenv('DRAFTKINGS_BASE_URL', 'https://sportsbook.draftkings.com').rstrip('/')
+NASH_BASE_URL = os.getenv('DRAFTKINGS_NASH_BASE_URL', 'https://sportsbook-nash.draftkings.com').rstrip('/')
+
+# eventSubcategory of the moneyline, spread, and total markets in the markets API
+SUBCATEGORY_ID = '4511'
+
+# default limits for fetching event pages: how many requests can be in flight and how many start per second
+MAX_IN_FLIGHT = 4
+REQUESTS_PER_SECOND = 2.0
+
+# spaces out fetch_with_retry calls (one request per second, like the old fixed sleep, but without
+# sleeping when the previous request was already long enough ago)
+default_limiter = TokenBucket(rate=1.0)
+
+# events.json is only a debugging dump (--dump-events), keep concurrent fetches from writing it at the same time
+events_dump_lock = threading.Lock()
+
+def create_session(pool_size: int = 10):
+    """
+    Create a session with retry strategy and browser-like headers
+    pool_size: int --> connections kept per host (at least the number of concurrent requests)
+    """
     session = requests.Session()
     
     # Configure retry strategy
@@ -18,7 +46,7 @@ def create_session():
         status_forcelist=[429, 500, 502, 503, 504]
     )
     
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=pool_size, pool_maxsize=pool_size)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     
@@ -42,11 +70,11 @@ def create_session():
     
     return session
 
-def fetch_with_retry(session, url, timeout=30):
+def fetch_with_retry(session, url, timeout=30, limiter: TokenBucket = None):
     """Fetch data from URL with retry logic and error handling"""
     try:
-        # Add a small delay before the request to avoid rate limiting
-        time.sleep(1)
+        # Wait for the rate limiter before the request to avoid rate limiting
+        (limiter or default_limiter).acquire()
         
         response = session.get(url, timeout=timeout)
         response.raise_for_status()
@@ -57,17 +85,15 @@ def fetch_with_retry(session, url, timeout=30):
             print(f"Response text: {e.response.text}")
         return None
 
-def fetch_tournament_links(session):
+def fetch_tournament_links(session, base_url: str = BASE_URL):
     """Fetch nba event tournament links"""
     print("Fetching nba event tournament links...")
     
     # Get the current event group ids for football
-    response = session.get('https://sportsbook.draftkings.com/leagues/basketball/nba', timeout=30)
+    response = session.get(f'{base_url}/leagues/basketball/nba', timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    tournaments = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    tournaments += '"helpPage": {"content": ""}}'
-    tournaments = json.loads(tournaments)
+    # Extract the sports list from the variable window.__INITIAL_STATE__
+    tournaments = read_initial_state(response.text, [('sports', 'data')])
     
     # Extract the tournament links
     tournament_links = []
@@ -82,11 +108,11 @@ def fetch_tournament_links(session):
     
     return tournament_links
 
-def fetch_event_links_alternate(session, event_group_id):
+def fetch_event_links_alternate(session, event_group_id, nash_base_url: str = NASH_BASE_URL):
     """Fetch nba event links alternate method"""
     print("Fetching nba event links alternate method...")
 
-    league_url = f'https://sportsbook-nash.draftkings.com/sites/US-NY-SB/api/sportscontent/controldata/home/primaryMarkets/v1/markets?eventsQuery=%24filter%3DleagueId%20eq%20%27{event_group_id}%27&marketsQuery=%24filter%3Dtags%2Fany(t%3A%20t%20eq%20%27PrimaryMarket%27)&top=50&include=Events&entity=events&isBatchable=true'
+    league_url = f'{nash_base_url}/sites/US-NY-SB/api/sportscontent/controldata/home/primaryMarkets/v1/markets?eventsQuery=%24filter%3DleagueId%20eq%20%27{event_group_id}%27&marketsQuery=%24filter%3Dtags%2Fany(t%3A%20t%20eq%20%27PrimaryMarket%27)&top=50&include=Events&entity=events&isBatchable=true'
     response = session.get(league_url, timeout=30)
 
     events = response.json()
@@ -110,18 +136,16 @@ def fetch_event_links_alternate(session, event_group_id):
     
     return event_links
 
-def fetch_event_links(session, tournament_link):
+def fetch_event_links(session, tournament_link, base_url: str = BASE_URL):
     """Fetch nba event links"""
 
-    tournament_url = f'https://sportsbook.draftkings.com/'
+    tournament_url = f'{base_url}/'
     
     # Get the current event group ids for football
     response = session.get(tournament_url, timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    events = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    events += '"helpPage": {"content": ""}}'
-    events = json.loads(events)
+    # Extract the tournament's events from the variable window.__INITIAL_STATE__
+    events = read_initial_state(response.text, [('eventGroups', str(tournament_link['eventGroupId']), 'events')])
 
     # Extract the event links
     event_links = []
@@ -142,79 +166,133 @@ def fetch_event_links(session, tournament_link):
     
     return event_links
 
-def fetch_event_data(session, event_link):
-    """Fetch nba event data"""
+def fetch_event_data_page(session, event_link, base_url: str = BASE_URL, dump_events: bool = False):
+    """
+    Fetch nba event data from the event page's window.__INITIAL_STATE__
+    dump_events: bool --> parse the whole state and write it to events.json for debugging
+    """
+    url = f"{base_url}/event/{event_link['urlName']}/{event_link['eventId']}"
+    response = session.get(url, timeout=30)
 
-    try:
-        # Get the current event group ids for tennis
-        url = f"https://sportsbook.draftkings.com/event/{event_link['urlName']}/{event_link['eventId']}"
-        response = session.get(url, timeout=30)
+    print('url: ', url)
 
-        print('url: ', url)
+    if dump_events:
+        events = read_full_initial_state(response.text)
+        with events_dump_lock, open('events.json', 'w') as f:
+            json.dump(events, f, indent=2)
+    else:
+        # Extract only the markets and selections from the variable window.__INITIAL_STATE__
+        events = read_initial_state(response.text, [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')])
 
-        # Extract the variable window.__INITIAL_STATE__
-        events = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-        events += '"helpPage": {"content": ""}}'
-        events = json.loads(events)
+    return extract_event_data(event_link, events['stadiumEventData']['markets'], events['stadiumEventData']['selections'])
 
-        # write the events to a file
-        with open('events.json', 'w') as f:
-            json.dump(events, f, indent=2)
-        
-        # Cross reference the marketIds from the markets data with the marketIds from the selections data
-        markets = events['stadiumEventData']['markets']
-        selections = events['stadiumEventData']['selections']
-
-        # Create a lookup for markets by ID
-        markets_by_id = {market['id']: market for market in markets}
-
-        extracted_data = []
-        for selection in selections:
-            market_id = selection.get('marketId')
-            market = markets_by_id.get(market_id)
-
-            participant_data = {}
-            if selection.get('participants'):
-                for i in range(len(selection.get('participants'))):
-                    try:
-                        participant_data[f'participants-name-{i}'] = selection.get('participants')[i]['name']
-                    except:
-                        print(f"No participant names found for market {market_id}")
-                    try:
-                        participant_data[f'participants-type-{i}'] = selection.get('participants')[i]['type']
-                    except:
-                        print(f"No participant types found for market {market_id}")
-                    try:
-                        participant_data[f'participants-venueRole-{i}'] = selection.get('participants')[i]['venueRole']
-                    except:
-                        print(f"No participant venue roles found for market {market_id}")
-
-            if market:
-                data_point = {
-                    'market_id': market.get('id'),
-                    'tournament_name': event_link.get('eventGroupName'),
-                    'event_name': event_link.get('name'),
-                    'start_date': event_link.get('startDate'),
-                    'event_year': event_link.get('startDate').split('-')[0],
-                    'market_name': market.get('name'),
-                    'true_odds': selection.get('trueOdds'),
-                    'label': selection.get('label'),
-                    'outcome_type': selection.get('outcomeType'),
-                    'points': selection.get('points'),
-                    **participant_data
-                }
-                extracted_data.append(data_point)
-        
-        return extracted_data
-    except Exception as e:
-        print(f"Error fetching event data for {event_link['name']}: {str(e)}")
-        return []
+def fetch_event_data_api(session, event_link, nash_base_url: str = NASH_BASE_URL):
+    """Fetch nba event data from the eventSubcategory markets API (moneyline, spread, and total markets only)"""
+    url = f"{nash_base_url}/sites/US-NY-SB/api/sportscontent/controldata/event/eventSubcategory/v1/markets?isBatchable=false&templateVars={event_link.get('eventId')}&marketsQuery=%24filter%3DeventId%20eq%20%27{event_link.get('eventId')}%27%20AND%20clientMetadata%2FsubCategoryId%20eq%20%27{SUBCATEGORY_ID}%27%20AND%20tags%2Fall%28t%3A%20t%20ne%20%27SportcastBetBuilder%27%29&include=MarketSplits&entity=markets"
+    response = session.get(url, timeout=30)
+    events = response.json()
 
-def convert_odds_to_american(odds):
-    if odds >= 2:
-        return int((odds - 1) * 100)
-    else:
-        return int(-100 / (odds - 1)) if odds != 1 else None
+    return extract_event_data(event_link, events['markets'], events['selections'])
+
+def extract_event_data(event_link, markets, selections):
+    """Builds one data point per selection, cross referencing the marketIds from the markets data with the marketIds from the selections data"""
+    # Create a lookup for markets by ID
+    markets_by_id = {market['id']: market for market in markets}
+
+    extracted_data = []
+    for selection in selections:
+        market_id = selection.get('marketId')
+        market = markets_by_id.get(market_id)
+
+        participant_data = {}
+        if selection.get('participants'):
+            for i in range(len(selection.get('participants'))):
+                try:
+                    participant_data[f'participants-name-{i}'] = selection.get('participants')[i]['name']
+                except:
+                    print(f"No participant names found for market {market_id}")
+                try:
+                    participant_data[f'participants-type-{i}'] = selection.get('participants')[i]['type']
+                except:
+                    print(f"No participant types found for market {market_id}")
+                try:
+                    participant_data[f'participants-venueRole-{i}'] = selection.get('participants')[i]['venueRole']
+                except:
+                    print(f"No participant venue roles found for market {market_id}")
+
+        if market:
+            data_point = {
+                'market_id': market.get('id'),
+                'tournament_name': event_link.get('eventGroupName'),
+                'event_name': event_link.get('name'),
+                'start_date': event_link.get('startDate'),
+                'event_year': event_link.get('startDate').split('-')[0],
+                'market_name': market.get('name'),
+                'true_odds': selection.get('trueOdds'),
+                'label': selection.get('label'),
+                'outcome_type': selection.get('outcomeType'),
+                'points': selection.get('points'),
+                **participant_data
+            }
+            extracted_data.append(data_point)
+
+    return extracted_data
+
+def event_data_strategies(base_url: str = BASE_URL, nash_base_url: str = NASH_BASE_URL, dump_events: bool = False):
+    """
+    Sources of event data in priority order, as (name, fetch(session, event_link)) pairs
+    The event page has every market, the markets API is only tried for the events the page failed on
+    """
+    return [
+        ('event page', partial(fetch_event_data_page, base_url=base_url, dump_events=dump_events)),
+        ('markets api', partial(fetch_event_data_api, nash_base_url=nash_base_url)),
+    ]
+
+def fetch_event_data(session, event_link, strategies=None, limiter: TokenBucket = None):
+    """
+    Fetch nba event data, trying each strategy in order until one returns data points
+    strategies: list --> (name, fetch) pairs, defaults to event_data_strategies()
+    limiter: TokenBucket --> taken before every request, fallbacks included
+    """
+    for name, fetch in strategies or event_data_strategies():
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            extracted_data = fetch(session, event_link)
+        except Exception as e:
+            print(f"Error fetching event data for {event_link['name']} from the {name}: {str(e)}")
+            continue
+        if extracted_data:
+            return extracted_data
+        print(f"No event data found for {event_link['name']} from the {name}")
+
+    return []
+
+def fetch_all_event_data(session, event_links, max_in_flight: int = MAX_IN_FLIGHT, requests_per_second: float = REQUESTS_PER_SECOND, strategies=None):
+    """
+    Fetches the event data for every event link with up to max_in_flight requests at once,
+    started no faster than requests_per_second (token bucket, bursts of up to max_in_flight).
+    Returns one list of data points per event link, in the same order as event_links
+    """
+    limiter = TokenBucket(rate=requests_per_second, capacity=max_in_flight)
+
+    def fetch(event_link):
+        print(f"Fetching event data for {event_link['name']}...")
+        return fetch_event_data(session, event_link, strategies, limiter)
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(max_in_flight, 1)) as executor:
+        futures = [executor.submit(fetch, event_link) for event_link in event_links]
+
+    all_event_data = []
+    for event_link, future in zip(event_links, futures):
+        try:
+            all_event_data.append(future.result())
+        except Exception as e:
+            print(f"Error fetching event data for {event_link['name']}: {str(e)}")
+    print(f"Fetched {len(event_links)} events in {time.time() - start_time:.2f} seconds")
+
+    return all_event_data
 
 def format_and_save_data(all_event_data):
     """Format and save the data to a CSV file"""
@@ -231,48 +309,17 @@ def format_and_save_data(all_event_data):
     # Create a DataFrame from the newly scraped data
     df_new = pd.DataFrame(flat_data)
     
-    # Identify markets with exactly two outcomes
-    market_counts = df_new['market_id'].value_counts()
-    two_outcome_markets = market_counts[market_counts == 2].index
-    two_way_df = df_new[df_new['market_id'].isin(two_outcome_markets)].copy()
-
-    processed_data = []
-    if not two_way_df.empty:
-        # Group by market_id and pivot the player data
-        for market_id, group in two_way_df.groupby('market_id'):
-            p1 = group.iloc[0]
-            p2 = group.iloc[1]
-            
-            processed_data.append({
-                'market_id': market_id,
-                'tournament_name': p1['tournament_name'],
-                'event_name': p1['event_name'],
-                'start_date': p1['start_date'],
-                'market_name': p1['market_name'],
-                'player1_name': p1['label'],
-                'player1_odds': convert_odds_to_american(p1['true_odds']),
-                'player1_points': p1['points'],
-                'player1_outcome_type': p1['outcome_type'],
-                'player1_label': p1['label'],
-                'player2_name': p2['label'],
-                'player2_odds': convert_odds_to_american(p2['true_odds']),
-                'player2_points': p2['points'],
-                'player2_outcome_type': p2['outcome_type'],
-                'player2_label': p2['label'],
-                # add the scraped_at timestamp to the data and ensure its in UTC
-                'scraped_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        df_new_processed = pd.DataFrame(processed_data)
-    else:
+    # Pair up the two outcomes of every market with exactly two outcomes
+    df_new_processed = pivot_two_way_markets(df_new, odds_format='american')
+    if df_new_processed.empty:
+        # the pivot has no columns then, and the upcoming odds and the odds history are left as they are
         print("No new two-way markets found to process.")
-        df_new_processed = pd.DataFrame()
+        return
 
-    # Define the path to the data directory and the CSV file
+    # Define the path to the data directory
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-    csv_path = os.path.join(data_dir, 'nba_odds.csv')
 
     # order the df_new_processed by start_date
     df_new_processed = df_new_processed.sort_values(by='start_date')
@@ -282,43 +329,28 @@ def format_and_save_data(all_event_data):
     # write the df_new_processed to the upcoming_nba_odds.csv file
     df_new_processed.to_csv('data/upcoming_nba_odds.csv', index=False)
 
-    # Load existing data
-    if os.path.exists(csv_path):
-        try:
-            df_existing = pd.read_csv(csv_path)
-        except pd.errors.EmptyDataError:
-            df_existing = pd.DataFrame()
-    else:
-        df_existing = pd.DataFrame()
-
-    # Merge new data with existing data
-    if not df_new_processed.empty:
-        df_combined = pd.concat([df_existing, df_new_processed], ignore_index=True)
-        df_combined.drop_duplicates(subset=['market_id'], keep='last', inplace=True)
-    else:
-        df_combined = df_existing
-
-    # Save the combined data
-    df_combined.to_csv(csv_path, index=False)
-    print(f"Successfully saved and merged data to {csv_path}")
+    # Append the new markets and the moved lines to the odds history (data/nba_odds/)
+    store = open_odds_store(data_dir, 'nba_odds')
+    appended = store.append(df_new_processed)
+    print(f"Successfully saved {appended} new or moved lines to {store.directory}")
 
-def main():
+def main(max_in_flight: int = MAX_IN_FLIGHT, requests_per_second: float = REQUESTS_PER_SECOND, base_url: str = BASE_URL, nash_base_url: str = NASH_BASE_URL, dump_events: bool = False):
     """Main function to run the script"""
     print("Starting NBA Odds Scraper")
     
-    # Create session
-    session = create_session()
+    # Create session (one pooled connection per concurrent request)
+    session = create_session(pool_size=max(max_in_flight, 10))
     
     try:
         # Step 1: Get tournament links
-        tournament_links = fetch_tournament_links(session)
+        tournament_links = fetch_tournament_links(session, base_url)
         print(f"Found {len(tournament_links)} tournament links")
 
         # Step 2: Get event links for each tournament
         event_links = []
         for tournament_link in tournament_links:
             print(f"Fetching event links for {tournament_link['urlName']}...")
-            event_links.extend(fetch_event_links(session, tournament_link))
+            event_links.extend(fetch_event_links(session, tournament_link, base_url))
         print(f"Found {len(event_links)} event links")
 
         if len(event_links) == 0:
@@ -327,23 +359,13 @@ def main():
             event_group_ids = set([event_link['eventGroupId'] for event_link in tournament_links])
             for event_group_id in event_group_ids:
                 print(f"Fetching event links for event group id {event_group_id}...")
-                event_links.extend(fetch_event_links_alternate(session, event_group_id))
+                event_links.extend(fetch_event_links_alternate(session, event_group_id, nash_base_url))
             print(f"Found {len(event_links)} event links")
 
-        # Step 3: Get event data for each event
-        all_event_data = []
-        for event_link in event_links:
-            print(f"Fetching event data for {event_link['name']}...")
-            try:
-                event_data = fetch_event_data(session, event_link)
-            except Exception as e:
-                print(f"Error fetching event data for {event_link['name']}: {str(e)}")
-                continue
-            try:
-                all_event_data.append(event_data)
-            except Exception as e:
-                print(f"Error appending event data for {event_link['name']}: {str(e)}")
-                continue
+        # Step 3: Get event data for each event (concurrently, results stay in event_links order),
+        # falling back to the markets API for the events whose page has no data
+        strategies = event_data_strategies(base_url, nash_base_url, dump_events)
+        all_event_data = fetch_all_event_data(session, event_links, max_in_flight, requests_per_second, strategies)
         print(f"Found {len(all_event_data)} event data")
 
         # Step 4: Convert to a DataFrame, format, and save as a CSV
@@ -355,4 +377,15 @@ def main():
         print(f"An unexpected error occurred: {str(e)}")
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Scrape the NBA odds from DraftKings')
+    parser.add_argument('--max-in-flight', type=int, default=MAX_IN_FLIGHT,
+                        help='most event pages fetched at the same time (1 fetches them one by one)')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help='most event page requests started per second (0 for no limit)')
+    parser.add_argument('--base-url', default=BASE_URL, help='sportsbook host, e.g. a local stub serving recorded pages')
+    parser.add_argument('--nash-base-url', default=NASH_BASE_URL, help='sportsbook API host used by the alternate event lookup and the markets API fallback')
+    parser.add_argument('--dump-events', action='store_true',
+                        help='write the full __INITIAL_STATE__ of the event pages to events.json for debugging')
+    args = parser.parse_args()
+
+    main(args.max_in_flight, args.rate, args.base_url.rstrip('/'), args.nash_base_url.rstrip('/'), args.dump_events)
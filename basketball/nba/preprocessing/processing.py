@@ -1,24 +1,75 @@
 import pandas as pd
+import numpy as np
 from datetime import timedelta
 from typing import Dict, List, Any
 from pathlib import Path
 from functions.general import *
+from functions.data_store import read_table, write_table
+from functions.date_normalization import date_normalizer, format_date
+from functions.history_store import HistoryStore
+from functions.state_store import ProcessorState, date_ns, fingerprint_games, sorted_team_dates, lookback_horizon, changed_games
+from functions.odds_store import read_latest_odds
+from functions.line_movement import load_line_movement
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import pytz
 import time
 et_tz = pytz.timezone('US/Eastern')
 utc_tz = pytz.UTC
 
+# feature windows built by preprocess: one block of columns per window for the team and one for the opponent
+# ('<name>_team_<stat>' / '<name>_opp_<stat>'), always from the games played strictly before the game's date
+# kind: 'games'  --> average of the last `size` games
+#       'days'   --> average of the games played in the last `size` days
+#       'season' --> average of the games played so far this season (seasons start October 1st)
+#       'ewm'    --> exponentially weighted average with a span of `size` games
+FEATURE_WINDOWS = [
+    {'name': 'last_5', 'kind': 'games', 'size': 5},
+    {'name': 'last_1', 'kind': 'games', 'size': 1},
+]
+WINDOW_KINDS = ('games', 'days', 'season', 'ewm')
+
+# each worker process keeps its own read-only copy of the processor (game data and team history store)
+_worker_processor = None
+
+def _init_worker(processor):
+    global _worker_processor
+    _worker_processor = processor
+
+def _build_partition(rows, engine):
+    return _worker_processor._build_processed_rows(rows, engine)
+
 class Processor:
-    def __init__(self, game_data):
+    def __init__(self, game_data, windows: List[Dict] = None):
         print('initializing preprocessor...')
         self.game_data = self.clean_data(game_data)
         self.processed_data = None
+        self.windows = self._check_windows(FEATURE_WINDOWS if windows is None else windows)
         # Process and convert dates to timezone-aware UTC format
         self._process_dates()
-        self.json_data = self.convert_to_json()
         # Pre-compute stat keys for faster lookups
         self._init_stat_keys()
+        self.history = self.build_history()
     
+    def _check_windows(self, windows: List[Dict]) -> List[Dict]:
+        """Validates the feature window config (see FEATURE_WINDOWS)"""
+        names = set()
+        for window in windows:
+            if window.get('kind') not in WINDOW_KINDS:
+                raise ValueError(f"Unknown window kind {window.get('kind')} for window {window.get('name')}")
+            if window['kind'] != 'season' and not window.get('size', 0) > 0:
+                raise ValueError(f"Window {window.get('name')} needs a positive size")
+            if window.get('name') in names:
+                raise ValueError(f"Duplicate window name {window.get('name')}")
+            names.add(window.get('name'))
+        return [dict(window) for window in windows]
+
+    def lookback_games(self):
+        """How many earlier games of a team the windows can reach, or None if it is not bounded by a game count"""
+        if all(window['kind'] == 'games' for window in self.windows):
+            return max((window['size'] for window in self.windows), default=0)
+        return None
+
     def clean_data(self, data):
         """Clean and prepare the data for processing"""
         data = data.copy()
@@ -61,36 +112,14 @@ class Processor:
         Dates after August 1, 2025 are converted from ET to UTC,
         while earlier dates are directly localized to UTC.
         """
-        # Pre-compute date conversions and convert ET to UTC
-        # NBA data doesn't have a time column, so we pass empty string
-        self.game_data['formatted_date'] = pd.to_datetime(self.game_data.apply(
-            lambda row: self.formatDate(row['date'], row.get('time', '')), axis=1
-        ))
-
-        # Convert from ET to UTC only for dates after August 1, 2025
-        cutoff_date = pd.Timestamp('2025-08-01')  # Keep timezone-naive for comparison
-
-        # Create a new Series to hold timezone-aware datetimes
-        timezone_aware_dates = pd.Series(index=self.game_data.index, dtype='datetime64[ns, UTC]')
-        
-        # First, identify dates that need ET->UTC conversion (after cutoff)
-        et_conversion_mask = self.game_data['formatted_date'] > cutoff_date
-        
-        # Convert dates after cutoff from ET to UTC
-        timezone_aware_dates.loc[et_conversion_mask] = (
-            self.game_data.loc[et_conversion_mask, 'formatted_date']
-            .dt.tz_localize(et_tz)
-            .dt.tz_convert(utc_tz)
-        )
-        
-        # Convert dates before/equal to cutoff directly to UTC
-        pre_cutoff_mask = ~et_conversion_mask
-        timezone_aware_dates.loc[pre_cutoff_mask] = (
-            self.game_data.loc[pre_cutoff_mask, 'formatted_date'].dt.tz_localize(utc_tz)
+        # Parse each distinct date once and convert ET to UTC after the cutoff
+        # NBA data doesn't have a time column, so dates are parsed on their own
+        # (the normalizer is shared, so its counters are reset to report this processor's rows only)
+        date_normalizer.reset_timings()
+        self.game_data['formatted_date'] = date_normalizer.normalize(
+            self.game_data['date'], self.game_data.get('time')
         )
-        
-        # Replace the original column with the timezone-aware version
-        self.game_data['formatted_date'] = timezone_aware_dates
+        date_normalizer.report()
 
     def _init_stat_keys(self):
         """Pre-compute stat keys used in processing"""
@@ -159,26 +188,18 @@ class Processor:
         date: str in the format 1995-09-03
         time: str in the format 4:00PM ET
         """
-        try:
-            # Handle date format from CSV (YYYY-MM-DD)
-            if '-' in date and len(date.split('-')) == 3:
-                # Extract time info
-                if time and time.strip():
-                    time_part = time.split(' ')[0]
-                    if len(time_part) > 2:
-                        clock_time = time_part[:-2]
-                        ampm = time_part[-2:]
-                        return pd.to_datetime(f'{date} {clock_time} {ampm}')
-                    else:
-                        return pd.to_datetime(f'{date} 12:00 PM')
-                else:
-                    return pd.to_datetime(date)
-        except Exception as e:
-            print(f"Error parsing date {date} {time}: {e}")
-            return pd.to_datetime('1995-01-01')  # Fallback date
+        return format_date(date, time)
+
+    def build_history(self) -> HistoryStore:
+        """Packs every team's games into date-sorted NumPy arrays for the last-x lookups"""
+        print('building team history...')
+        return HistoryStore.from_frame(self._history_stat_frame(), list(self.base_stats.keys()))
 
     def convert_to_json(self):
-        """Convert game data to JSON format for efficient lookups - NBA style"""
+        """
+        Convert game data to JSON format - NBA style
+        No longer used for lookups (see build_history), kept for comparing against the history store
+        """
         print('converting to json...')
         
         # Group by team and sort by date in one operation
@@ -203,30 +224,30 @@ class Processor:
         return stats
 
     def getGamesInLastXYears(self, team_name: str, date: pd.Timestamp, x: List[int]) -> Dict:
-        """Optimized version of getGamesInLastXYears"""
+        """
+        Optimized version of getGamesInLastXYears
+        Sums each team's games in the last x years before date (measured on formatted_date) as slices of the history store
+        """
         full_stats = {}
         for years in x:
             prefix = f'last_{years}_yr_'
             full_stats.update({f'{prefix}{k}': v for k, v in self.base_stats.items()})
 
-        if team_name not in self.json_data:
+        history = self.history.get(team_name)
+        if history is None:
             return full_stats
 
-        team_data = self.json_data[team_name]
         x_game_counts = [0] * len(x)
-        
-        for game in team_data:
-            game_date = pd.to_datetime(game['date'])
-            if game_date >= date:
-                continue
-                
-            for i, years in enumerate(x):
-                if game_date >= date - pd.DateOffset(years=years):
-                    prefix = f'last_{years}_yr_'
-                    self._process_game_stats(game, full_stats, prefix)
-                    x_game_counts[i] += 1
-                else:
-                    break
+        stop = history.before(date)
+        window_years = None
+        for i, years in enumerate(x):
+            # a game only counts towards a window if it also fell inside every window listed before it
+            window_years = years if window_years is None else min(window_years, years)
+            start, _ = history.between(date - pd.DateOffset(years=window_years), date)
+            prefix = f'last_{years}_yr_'
+            for key, total in zip(history.keys, history.window_sums(start, stop).tolist()):
+                full_stats[f'{prefix}{key}'] += total
+            x_game_counts[i] = stop - start
 
         # Average the percentage stats
         for i, years in enumerate(x):
@@ -250,22 +271,16 @@ class Processor:
         """
         full_stats = {f'{prefix}{k}': v for k, v in self.base_stats.items()}
 
-        if team not in self.json_data:
+        history = self.history.get(team)
+        if history is None:
             return full_stats
 
-        team_data = self.json_data[team]
-        counter = 0
-        
-        for game in team_data:
-            game_date = pd.to_datetime(game['formatted_date'])
-            if game_date >= date:
-                continue
-                
-            if counter >= x:
-                break
-                
-            self._process_game_stats(game, full_stats, prefix)
-            counter += 1
+        # the last x games strictly before the date
+        stop = history.before(date)
+        start = max(stop - x, 0)
+        counter = stop - start
+        for key, total in zip(history.keys, history.window_sums(start, stop).tolist()):
+            full_stats[f'{prefix}{key}'] += total
 
         # Average all stats by number of games found (similar to NFL version)
         divisor = counter if counter > 0 else 1
@@ -283,7 +298,8 @@ class Processor:
         team: str --> team name
         date: pd.Timestamp --> date of the game
         """
-        if team not in self.json_data:
+        history = self.history.get(team)
+        if history is None:
             return 1
             
         # Determine the season start date
@@ -302,34 +318,225 @@ class Processor:
             season_start = season_start.tz_localize(date.tz)
         
         # Count games played by this team since season start, before this game's date
-        team_data = self.json_data[team]
-        games_in_season = [
-            game for game in team_data 
-            if season_start <= pd.to_datetime(game['formatted_date']) < date
-        ]
-        
-        return len(games_in_season) + 1
+        start, stop = history.between(season_start, date)
+        return stop - start + 1
+
+    def getSeasonGameNumbers(self) -> pd.Series:
+        """
+        Vectorized getCurrentSeasonGameNumber for every game at once.
+        Adds a season key column (NBA seasons run October to September, keyed by the year they start in)
+        and ranks each team's games within the season, so ties on the same date share a number just like
+        counting the games strictly before the date does
+        """
+        dates = self.game_data['formatted_date']
+        self.game_data['season'] = dates.dt.year - (dates.dt.month < 10).astype(int)
+
+        return (
+            self.game_data.groupby(['team', 'season'])['formatted_date']
+            .rank(method='min')
+            .astype(int)
+        )
+
+    def _safe_float_column(self, values: pd.Series) -> pd.Series:
+        """Column-wise _safe_float: numeric columns are cast directly, anything else goes through _safe_float"""
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype(float)
+        return values.map(self._safe_float).astype(float)
+
+    def _history_stat_frame(self, teams=None) -> pd.DataFrame:
+        """
+        Builds the stat matrix used by the rolling engine: one float column per base_stats key
+        (using the same column mapping as _process_game_stats), sorted by team and date so
+        every team's history is contiguous
+        teams: iterable --> only build the history for these teams (defaults to every team)
+        """
+        history = self.game_data[self.game_data['formatted_date'].notna()]
+        if teams is not None:
+            history = history[history['team'].isin(teams)]
+        history = history.sort_values(['team', 'formatted_date'], kind='mergesort')
+
+        stats = {'team': history['team'].to_numpy(), 'formatted_date': history['formatted_date'].reset_index(drop=True)}
+        for key in self.base_stats.keys():
+            if key in ('wins', 'losses'):
+                result = history['win'] if 'win' in history.columns else pd.Series(np.nan, index=history.index)
+                stats[key] = (result == (1 if key == 'wins' else 0)).astype(float).to_numpy()
+            else:
+                game_key = self.stat_mapping.get(key, key.replace('team_', ''))
+                if game_key in history.columns:
+                    stats[key] = self._safe_float_column(history[game_key]).to_numpy()
+                else:
+                    stats[key] = np.zeros(len(history))
+
+        return pd.DataFrame(stats)
+
+    def _rolling_window_stats(self, history: pd.DataFrame, x: int) -> pd.DataFrame:
+        """
+        Returns, for every game in the sorted history, the averaged stats of the team's last x games
+        up to and including that game.
+        The window is summed lag by lag (most recent game first), which keeps the floating point
+        results identical to getLastXGameStats and lets a missing stat propagate as NaN like the loop does
+        """
+        keys = list(self.base_stats.keys())
+        values = history[keys].to_numpy()
+        position = history.groupby('team', sort=False).cumcount().to_numpy()
+
+        totals = np.zeros_like(values)
+        for lag in range(x):
+            lagged = np.zeros_like(values)
+            lagged[lag:] = values[:len(values) - lag]
+            # lags that reach back past the start of a team's history contribute nothing
+            lagged[position < lag] = 0.0
+            totals = totals + lagged
+
+        games = np.minimum(position + 1, x)
+        window = pd.DataFrame(totals / games[:, None], columns=keys)
+        window['team'] = history['team'].to_numpy()
+        window['formatted_date'] = history['formatted_date']
+        window['_matched'] = True
+        return window
+
+    def _attach_window_stats(self, rows: pd.DataFrame, team_column: str, window: pd.DataFrame, prefix: str) -> pd.DataFrame:
+        """
+        Looks up, for every row, the window ending at the last game the team played strictly before
+        the row's date (the as-of equivalent of a shift(1), so the game itself never leaks into its features).
+        Teams without any earlier game get zeros, matching getLastXGameStats
+        """
+        keys = list(self.base_stats.keys())
+        left = pd.DataFrame({
+            'team': rows[team_column].to_numpy(),
+            'formatted_date': rows['formatted_date'].reset_index(drop=True),
+            '_row': np.arange(len(rows)),
+        }).sort_values('formatted_date', kind='mergesort')
+        right = window.sort_values('formatted_date', kind='mergesort')
+
+        merged = pd.merge_asof(
+            left, right, on='formatted_date', by='team', allow_exact_matches=False, direction='backward'
+        ).sort_values('_row')
+
+        stats = merged[keys].to_numpy()
+        stats[merged['_matched'].isna().to_numpy()] = 0.0
+        return pd.DataFrame(stats, columns=[f'{prefix}{k}' for k in keys])
+
+    def _ewm_window_stats(self, history: pd.DataFrame, span: int) -> pd.DataFrame:
+        """
+        Returns, for every game in the sorted history, the exponentially weighted average of the team's
+        games up to and including that game (attached with _attach_window_stats like the last-x windows)
+        """
+        keys = list(self.base_stats.keys())
+        weighted = history.groupby('team', sort=False)[keys].ewm(span=span).mean()
+        window = weighted.reset_index(level=0, drop=True).sort_index()
+        window['team'] = history['team'].to_numpy()
+        window['formatted_date'] = history['formatted_date']
+        window['_matched'] = True
+        return window
+
+    def _window_start(self, dates: pd.Series, window: Dict) -> np.ndarray:
+        """First date (epoch nanoseconds) a date-ranged window covers for games on the given dates"""
+        if window['kind'] == 'days':
+            return date_ns(dates - pd.Timedelta(days=window['size']))
+        # season to date: seasons start October 1st of the year they are keyed by (see getSeasonGameNumbers)
+        season = dates.dt.year - (dates.dt.month < 10).astype(int)
+        season_start = pd.to_datetime(pd.DataFrame({'year': season, 'month': 10, 'day': 1})).dt.tz_localize('UTC')
+        return date_ns(season_start)
+
+    def _range_window_stats(self, rows: pd.DataFrame, team_column: str, history: pd.DataFrame, window: Dict, prefix: str) -> pd.DataFrame:
+        """
+        Averages each row's team games between the window start and the row's date (exclusive) from prefix sums
+        over the sorted history, so a window of any length costs two lookups per row.
+        Missing stats are counted separately, so a NaN only blanks the windows that actually contain that game
+        """
+        keys = list(self.base_stats.keys())
+        values = history[keys].to_numpy()
+        missing = np.isnan(values)
+        history_dates = date_ns(history['formatted_date'])
+        row_dates = date_ns(rows['formatted_date'])
+        window_start = self._window_start(rows['formatted_date'], window)
+        row_teams = rows[team_column].to_numpy()
+
+        # teams without any history keep an empty window and get zeros
+        sums = np.zeros((len(rows), len(keys)))
+        counts = np.zeros(len(rows), dtype=np.int64)
+        for team, positions in history.groupby('team', sort=False).indices.items():
+            mask = row_teams == team
+            if not mask.any():
+                continue
+            # prefix sums restart for every team, so a team's windows only depend on its own games
+            first, last = positions[0], positions[-1] + 1
+            totals = np.vstack([np.zeros((1, len(keys))), np.cumsum(np.where(missing[first:last], 0.0, values[first:last]), axis=0)])
+            missing_counts = np.vstack([np.zeros((1, len(keys)), dtype=np.int64), np.cumsum(missing[first:last], axis=0)])
+
+            dates = history_dates[first:last]
+            start = np.searchsorted(dates, window_start[mask], side='left')
+            stop = np.searchsorted(dates, row_dates[mask], side='left')
+            team_sums = totals[stop] - totals[start]
+            team_sums[(missing_counts[stop] - missing_counts[start]) > 0] = np.nan
+            sums[mask] = team_sums
+            counts[mask] = stop - start
+
+        stats = sums / np.maximum(counts, 1)[:, None]
+        return pd.DataFrame(stats, columns=[f'{prefix}{k}' for k in keys])
+
+    def _window_features(self, rows: pd.DataFrame, history: pd.DataFrame, window: Dict):
+        """Returns the team and opponent feature frames for one configured window"""
+        columns = ('team', 'opponent')
+        prefixes = (f"{window['name']}_team_", f"{window['name']}_opp_")
+
+        if window['kind'] in ('days', 'season'):
+            return [
+                self._range_window_stats(rows, column, history, window, prefix)
+                for column, prefix in zip(columns, prefixes)
+            ]
+
+        if window['kind'] == 'games':
+            stats = self._rolling_window_stats(history, window['size'])
+        else:
+            stats = self._ewm_window_stats(history, window['size'])
+        return [self._attach_window_stats(rows, column, stats, prefix) for column, prefix in zip(columns, prefixes)]
+
+    def _preprocess_rolling(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Builds the processed rows for all games at once from sorted per-team windows"""
+        if rows.empty:
+            return pd.DataFrame()
+
+        # windows only depend on each team's own history, so skip teams that are not involved
+        history = self._history_stat_frame(teams=set(rows['team']) | set(rows['opponent']))
+
+        points = self._safe_float_column(rows['points']) if 'points' in rows.columns else pd.Series(0.0, index=rows.index)
+        opponent_points = self._safe_float_column(rows['opponent_points']) if 'opponent_points' in rows.columns else pd.Series(0.0, index=rows.index)
+
+        data = pd.DataFrame({
+            'team': rows['team'].to_numpy(),
+            'opponent': rows['opponent'].to_numpy(),
+            'date': rows['formatted_date'].reset_index(drop=True),
+            'result': rows['win'].to_numpy() if 'win' in rows.columns else 0,
+            'location': rows['home'].to_numpy() if 'home' in rows.columns else 0,
+            # Sportsbook-style: team_spread = opponent_points - team_points
+            'team_spread': (opponent_points - points).to_numpy(),
+            'opp_spread': (points - opponent_points).to_numpy(),
+            'game_total': (points + opponent_points).to_numpy(),
+            'points': points.to_numpy(),
+            'opponent_points': opponent_points.to_numpy(),
+        })
+
+        frames = [data]
+        for window in self.windows:
+            frames.extend(self._window_features(rows, history, window))
+        return pd.concat(frames, axis=1)
+
+    def _preprocess_loop(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Builds the processed rows one game at a time by walking each team's history"""
+        games_windows = [window for window in self.windows if window['kind'] == 'games']
+        if len(games_windows) != len(self.windows):
+            raise ValueError("The loop engine only supports 'games' windows, use the rolling engine")
 
-    def preprocess(self):
-        print('started preprocessing...')
-        
         # Pre-allocate the DataFrame with expected size
         data = []
 
-        # create a column that is the game number of the season for the team
-        self.game_data['game_number'] = self.game_data.apply(
-            lambda row: self.getCurrentSeasonGameNumber(row['team'], row['formatted_date']), axis=1
-        )
-        
-        for idx, row in self.game_data.iterrows():
+        for idx, row in rows.iterrows():
             try:
                 # get the date of the game
                 formatted_date = row['formatted_date']
 
-                # skip the game if it is one of the first 5 games of the season
-                if row['game_number'] <= 5:
-                    continue
-                
                 # get the teams
                 team = row['team']
                 opponent = row['opponent']                
@@ -339,11 +546,11 @@ class Processor:
 
                 game_total = self._safe_float(row.get('points', 0)) + self._safe_float(row.get('opponent_points', 0))
 
-                # get the last x games stats
-                home_team_last_5_games = self.getLastXGameStats(team, formatted_date, 5, 'last_5_team_')
-                away_team_last_5_games = self.getLastXGameStats(opponent, formatted_date, 5, 'last_5_opp_')
-                home_team_last_game = self.getLastXGameStats(team, formatted_date, 1, 'last_1_team_')
-                away_team_last_game = self.getLastXGameStats(opponent, formatted_date, 1, 'last_1_opp_')
+                # get the last x games stats for every configured window
+                window_stats = {}
+                for window in games_windows:
+                    window_stats.update(self.getLastXGameStats(team, formatted_date, window['size'], f"{window['name']}_team_"))
+                    window_stats.update(self.getLastXGameStats(opponent, formatted_date, window['size'], f"{window['name']}_opp_"))
 
                 # create a dictionary of the data
                 data_row = {
@@ -357,10 +564,7 @@ class Processor:
                     'game_total': game_total,
                     'points': self._safe_float(row.get('points', 0)),
                     'opponent_points': self._safe_float(row.get('opponent_points', 0)),
-                    **home_team_last_5_games,
-                    **away_team_last_5_games,
-                    **home_team_last_game,
-                    **away_team_last_game,
+                    **window_stats,
                 }
 
                 # append the data to the data list
@@ -371,14 +575,128 @@ class Processor:
                 continue
 
         # convert the data to a DataFrame
-        data = pd.DataFrame(data)
-        
-        self.processed_data = data
+        return pd.DataFrame(data)
+
+    def _build_processed_rows(self, rows: pd.DataFrame, engine: str, workers: int = 1) -> pd.DataFrame:
+        """Dispatches the given game rows to the requested feature engine"""
+        if workers > 1:
+            return self._build_processed_rows_parallel(rows, engine, workers)
+        if engine == 'loop':
+            return self._preprocess_loop(rows)
+        if engine == 'rolling':
+            return self._preprocess_rolling(rows)
+        raise ValueError(f"Unknown preprocessing engine: {engine}")
+
+    def _build_processed_rows_parallel(self, rows: pd.DataFrame, engine: str, workers: int) -> pd.DataFrame:
+        """
+        Splits the rows by season and builds each season in a separate process.
+        Every row only reads the (complete) team histories, so the seasons are independent; the pieces are
+        put back in the original row order so the result is identical to a single-process run
+        """
+        if 'season' not in rows.columns:
+            raise ValueError('rows need a season column (see getSeasonGameNumbers) to be split across workers')
+
+        position = np.arange(len(rows))
+        seasons = rows['season'].to_numpy()
+        partitions = [(season, position[seasons == season]) for season in np.unique(seasons)]
+        print(f'building {len(rows)} rows across {len(partitions)} seasons with {workers} workers')
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            futures = [executor.submit(_build_partition, rows.iloc[positions], engine) for _, positions in partitions]
+            pieces = [future.result() for future in futures]
+
+        pieces = [(piece, positions) for piece, (_, positions) in zip(pieces, partitions) if not piece.empty]
+        if not pieces:
+            return pd.DataFrame()
+        merged = pd.concat([piece for piece, _ in pieces], ignore_index=True)
+        order = np.argsort(np.concatenate([positions for _, positions in pieces]), kind='stable')
+        return merged.iloc[order].reset_index(drop=True)
+
+    def preprocess(self, engine: str = 'rolling', workers: int = 1):
+        """
+        Builds one feature row per game (the configured window stats for both teams)
+        engine: str --> 'rolling' computes every window in one pass over the sorted team histories,
+                        'loop' walks each team's history row by row
+        workers: int --> number of processes to split the seasons across (1 runs in this process)
+        """
+        print('started preprocessing...')
+
+        # create a column that is the game number of the season for the team
+        self.game_data['game_number'] = self.getSeasonGameNumbers()
+
+        # skip the game if it is one of the first 5 games of the season
+        rows = self.game_data[self.game_data['game_number'] > 5]
+
+        self.processed_data = self._build_processed_rows(rows, engine, workers)
+
+    def preprocess_incremental(self, state: ProcessorState, engine: str = 'rolling', workers: int = 1) -> ProcessorState:
+        """
+        Rebuilds only the processed rows whose look-back window touched a new, updated or removed game
+        since the last run and merges them into the cached rows from that run.
+        Falls back to a full preprocess when there is no usable state.
+        Returns the updated state (the caller is responsible for saving it)
+        """
+        print('started incremental preprocessing...')
+        value_columns = [c for c in self.game_data.columns if c not in ('formatted_date', 'season', 'game_number')]
+        fingerprints = fingerprint_games(self.game_data, value_columns)
+        team_dates = sorted_team_dates(self.game_data)
+
+        if state.is_empty or state.windows != self.windows:
+            if not state.is_empty:
+                print('feature windows changed since the last run, running a full rebuild')
+            self.preprocess(engine=engine, workers=workers)
+            return ProcessorState(fingerprints, team_dates, self.processed_data, self.windows)
+
+        changed, removed = changed_games(state.fingerprints, fingerprints)
+        print(f'found {len(changed)} new or updated games and {len(removed)} removed games')
+
+        # a game changes its own row plus every row (for either team) whose look-back window can reach it
+        affected = fingerprints.index.isin(changed)
+        row_team = self.game_data['team'].to_numpy()
+        row_opponent = self.game_data['opponent'].to_numpy()
+        row_date = fingerprints.index.get_level_values('date_ns').to_numpy()
+        # new/updated games are located in the current history, removed games in the previous one
+        for keys, dates_by_team in ((changed, team_dates), (removed, state.team_dates)):
+            for team, _, changed_date in keys:
+                dates = dates_by_team.get(team, np.array([], dtype=np.int64))
+                horizon = lookback_horizon(dates, changed_date, self.lookback_games())
+                involved = (row_team == team) | (row_opponent == team)
+                affected |= involved & (row_date > changed_date) & (row_date <= horizon)
+
+        self.game_data['game_number'] = self.getSeasonGameNumbers()
+        rows = self.game_data[affected]
+        print(f'rebuilding {len(rows)} of {len(self.game_data)} rows')
+        # skip the game if it is one of the first 5 games of the season
+        rows = rows[rows['game_number'] > 5]
+        new_rows = self._build_processed_rows(rows, engine, workers) if not rows.empty else pd.DataFrame()
+
+        # drop cached rows that were rebuilt (or filtered out) or whose game no longer exists
+        cached = state.processed
+        cached_keys = pd.MultiIndex.from_arrays(
+            [cached['team'], cached['opponent'], date_ns(cached['date'])], names=fingerprints.index.names
+        )
+        stale = fingerprints.index[affected].append(removed)
+        frames = [cached[~cached_keys.isin(stale)]]
+        if not new_rows.empty:
+            frames.append(new_rows)
+        merged = pd.concat(frames, ignore_index=True)
+
+        # restore the nba_games.csv row order so the output matches a full rebuild
+        merged_keys = pd.MultiIndex.from_arrays(
+            [merged['team'], merged['opponent'], date_ns(merged['date'])], names=fingerprints.index.names
+        )
+        position = pd.Series(np.arange(len(fingerprints)), index=fingerprints.index)
+        order = position.reindex(merged_keys).to_numpy()
+        merged = merged.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+
+        self.processed_data = merged
+        return ProcessorState(fingerprints, team_dates, merged, self.windows)
     
-    def balance(self):
+    def balance(self, engine: str = 'vectorized'):
         """
         Balances the data by removing games until there is an equal number of wins and losses.
         Properly handles game pairs to prevent duplicates.
+        engine: str --> 'vectorized' (paired arrays) or 'loop' (row dicts per group), both pick the same rows
         """
         if self.processed_data is None:
             print("No processed data to balance")
@@ -387,6 +705,28 @@ class Processor:
         # Create a copy of the processed data
         grouped_data = self.processed_data.copy()
 
+        if engine == 'loop':
+            balanced_data, wins, losses = self._balance_loop(grouped_data)
+        elif engine == 'vectorized':
+            balanced_data, wins, losses = self._balance_vectorized(grouped_data)
+        else:
+            raise ValueError(f"Unknown balance engine: {engine}")
+
+        # Print the number of wins and losses in the balanced data
+        print(f"Balanced data - Wins: {wins}, Losses: {losses}")
+        print(balanced_data['result'].value_counts())
+
+        # Resort the data by date in descending order
+        balanced_data = balanced_data.sort_values(by='date', ascending=False)
+        
+        # Drop all rows where the last_1_team_points or the last_1_opp_points is nan
+        balanced_data = balanced_data[balanced_data['last_1_team_team_pts'].notna()]
+        balanced_data = balanced_data[balanced_data['last_1_opp_team_pts'].notna()]
+
+        self.processed_data = balanced_data
+    
+    def _balance_loop(self, grouped_data: pd.DataFrame):
+        """Greedy balancing over row dicts, one groupby group at a time"""
         # Create a team_pair column where team and opp are alphabetically sorted
         grouped_data['team_pair'] = grouped_data.apply(
             lambda row: '-'.join(sorted([row['team'], row['opponent']])), axis=1
@@ -478,25 +818,131 @@ class Processor:
         # Drop the temporary columns
         balanced_data = balanced_data.drop(columns=['team_pair', 'game_id'])
 
-        # Print the number of wins and losses in the balanced data
-        print(f"Balanced data - Wins: {wins}, Losses: {losses}")
-        print(balanced_data['result'].value_counts())
+        return balanced_data, wins, losses
 
-        # Resort the data by date in descending order
-        balanced_data = balanced_data.sort_values(by='date', ascending=False)
-        
-        # Drop all rows where the last_1_team_points or the last_1_opp_points is nan
-        balanced_data = balanced_data[balanced_data['last_1_team_team_pts'].notna()]
-        balanced_data = balanced_data[balanced_data['last_1_opp_team_pts'].notna()]
+    def _balance_vectorized(self, grouped_data: pd.DataFrame):
+        """
+        Same greedy selection as _balance_loop, but the two perspectives of each game are paired with a
+        self-merge and the win/loss alternation runs over plain arrays of results and row positions
+        """
+        # Create a team_pair column where team and opp are alphabetically sorted
+        grouped_data['team_pair'] = self._pair_key(grouped_data['team'], grouped_data['opponent'])
 
-        self.processed_data = balanced_data
-    
-    def add_moneyline_odds(self):
+        # order the rows the way groupby(['team_pair', 'date']) visits them, keeping the original
+        # row order inside each game so perspective 1 is the row that came first
+        keys = pd.DataFrame({
+            'team_pair': grouped_data['team_pair'].to_numpy(),
+            'date': grouped_data['date'].to_numpy(),
+            'position': np.arange(len(grouped_data)),
+            'result': grouped_data['result'].to_numpy(),
+        }).dropna(subset=['team_pair', 'date'])
+        keys = keys.sort_values(['team_pair', 'date', 'position'], kind='mergesort')
+        keys['perspective'] = keys.groupby(['team_pair', 'date'], sort=False).cumcount()
+        keys['game_size'] = keys.groupby(['team_pair', 'date'], sort=False)['position'].transform('size')
+
+        # pair perspective 1 with perspective 2 (only games with exactly two rows have both)
+        first = keys[keys['perspective'] == 0]
+        second = keys[(keys['perspective'] == 1) & (keys['game_size'] == 2)]
+        pairs = first.merge(
+            second[['team_pair', 'date', 'position', 'result']],
+            how='left', on=['team_pair', 'date'], suffixes=('_1', '_2'), sort=False
+        )
+
+        has_both = pairs['position_2'].notna().to_numpy()
+        position_1 = pairs['position_1'].to_numpy()
+        position_2 = pairs['position_2'].fillna(-1).astype(np.int64).to_numpy()
+        result_1 = (pairs['result_1'] == 1).to_numpy()
+        result_2 = (pairs['result_2'] == 1).to_numpy()
+        loss_1 = (pairs['result_1'] == 0).to_numpy()
+        loss_2 = (pairs['result_2'] == 0).to_numpy()
+
+        # Balance the data using the properly paired games
+        wins, losses = 0, 0
+        selected = np.empty(len(pairs), dtype=np.int64)
+        for i in range(len(pairs)):
+            if not has_both[i]:
+                # If only one perspective exists, add it and move on
+                selected[i] = position_1[i]
+                if result_1[i]:
+                    wins += 1
+                else:
+                    losses += 1
+            elif wins <= losses:
+                # We need more wins, prefer the winning perspective
+                if result_1[i]:
+                    selected[i] = position_1[i]
+                    wins += 1
+                elif result_2[i]:
+                    selected[i] = position_2[i]
+                    wins += 1
+                else:
+                    selected[i] = position_1[i]
+                    losses += 1
+            else:
+                # We need more losses, prefer the losing perspective
+                if loss_1[i]:
+                    selected[i] = position_1[i]
+                    losses += 1
+                elif loss_2[i]:
+                    selected[i] = position_2[i]
+                    losses += 1
+                else:
+                    selected[i] = position_1[i]
+                    wins += 1
+
+        balanced_data = grouped_data.take(selected).drop(columns=['team_pair']).reset_index(drop=True)
+        return balanced_data, wins, losses
+
+    def _pair_key(self, first: pd.Series, second: pd.Series, sep: str = '-') -> pd.Series:
+        """
+        Order-independent key for two name columns, e.g. 'bos-nyk' for both (bos, nyk) and (nyk, bos).
+        Rows where either name is missing get NaN
+        """
+        valid = first.notna() & second.notna()
+        first = first[valid].astype(str)
+        second = second[valid].astype(str)
+        in_order = first <= second
+
+        key = pd.Series(np.nan, index=valid.index, dtype=object)
+        key[valid] = first.where(in_order, second) + sep + second.where(in_order, first)
+        return key
+
+    def _dk_name(self, team: str):
+        """Converts a team abbreviation to its DraftKings name (None if either lookup fails)"""
+        try:
+            team_name = get_name_from_team(team)
+        except KeyError:
+            return None
+        if not team_name:
+            return None
+        return get_dk_name_from_team(team_name)
+
+    def add_moneyline_odds(self, closing_lines: bool = False):
+        """
+        Joins the moneyline odds of every game to the processed data
+        closing_lines: bool --> use each market's closing line (the last snapshot scraped before the game started)
+        instead of its latest scrape; off by default, since it changes the odds the model is trained on
+        """
         # adding the odds to the processed data
-        odds_data = pd.read_csv('data/nba_odds.csv')
+        odds_data = read_latest_odds('data', 'nba_odds')
 
         # remove any rows where the market_name is not Moneyline
-        odds_data = odds_data[odds_data['market_name'] == 'Moneyline']
+        odds_data = odds_data[odds_data['market_name'] == 'Moneyline'].copy()
+
+        # the latest scrape can be a live line, the closing line can't; markets without a snapshot before the
+        # start keep the latest one. The closing odds come oriented to the latest row's player1_name, which can
+        # differ from the order the closing snapshot was scraped in
+        lines = load_line_movement('data/nba_odds') if closing_lines else None
+        if lines is not None:
+            closing = lines.closing_lines(odds_data['market_id'], odds_data['start_date'], odds_data['player1_name'])
+            found = closing['found'].to_numpy()
+            for column, source in (('player1_odds', 'odds1'), ('player2_odds', 'odds2')):
+                values = pd.Series(np.where(found, closing[source], odds_data[column]), index=odds_data.index)
+                # the stored series is float, keep the scraped (American, integer) dtype when nothing is missing
+                if pd.api.types.is_integer_dtype(odds_data[column]) and values.notna().all():
+                    values = values.astype(odds_data[column].dtype)
+                odds_data[column] = values
+            print(f'Using closing lines for {found.sum()} of {len(odds_data)} moneyline markets')
 
         # convert the start_date to ISO date string (UTC)
         odds_data['datetime'] = odds_data['start_date']
@@ -516,99 +962,94 @@ class Processor:
             processed_moneyline_data['date'], format='mixed', utc=True
         ) + timedelta(days=1)).dt.strftime('%Y-%m-%d')
 
-        count = 0
-        for index, row in processed_moneyline_data.iterrows():
-            # Convert team abbreviations to full names, then to DK names
-            team_name = get_name_from_team(row['team'])
-            opp_name = get_name_from_team(row['opponent'])
-            
-            if not team_name or not opp_name:
-                continue
-            
-            team_dk_name = get_dk_name_from_team(team_name)
-            opp_dk_name = get_dk_name_from_team(opp_name)
-            
-            if not team_dk_name or not opp_dk_name:
-                continue
-            
-            # find the row in odds_data where the player and opponent are the same as the row in processed_data
-            player_match = (odds_data['player1_name'] == team_dk_name) & (odds_data['player2_name'] == opp_dk_name)
-            opponent_match = (odds_data['player1_name'] == opp_dk_name) & (odds_data['player2_name'] == team_dk_name)
-            odds_row = odds_data[player_match | opponent_match]
-
-            if odds_row.empty:
-                if (pd.to_datetime(row['fallback_date']) < pd.Timestamp.now() + timedelta(days=7)) and (pd.to_datetime(row['fallback_date']) > pd.Timestamp.now()):
-                    print(f'up here -- no odds found for {row["team"]} vs {row["opponent"]} on {row["date"]}')
-                continue
+        # Convert team abbreviations to full names, then to DK names (once per team rather than once per row)
+        teams = pd.unique(pd.concat([processed_moneyline_data['team'], processed_moneyline_data['opponent']]))
+        dk_names = {team: self._dk_name(team) for team in teams}
+        team_dk_name = processed_moneyline_data['team'].map(dk_names)
+        opp_dk_name = processed_moneyline_data['opponent'].map(dk_names)
 
-            # date values are already normalized to 'YYYY-MM-DD' strings above
-            date = row['date']
-            fallback_date = row['fallback_date']
+        # canonical (sorted DK team pair, date) key on both sides
+        processed_moneyline_data['pair'] = self._pair_key(team_dk_name, opp_dk_name, sep='|')
+        odds_data['pair'] = self._pair_key(odds_data['player1_name'], odds_data['player2_name'], sep='|')
 
-            # pre_date_odds_row = odds_row
+        # one odds row per key: the most recently scraped market (the store lists its markets partition by
+        # partition, so file order says nothing about which is newer); the stable sort keeps a tie in file order
+        if 'scraped_at' in odds_data.columns:
+            odds_data = odds_data.sort_values('scraped_at', kind='mergesort', na_position='first')
+        candidate_counts = odds_data.groupby(['pair', 'start_date']).size().rename('candidates')
+        odds_lookup = (
+            odds_data.drop_duplicates(subset=['pair', 'start_date'], keep='last')
+            [['pair', 'start_date', 'player1_name', 'player1_odds', 'player2_odds', 'datetime']]
+            .join(candidate_counts, on=['pair', 'start_date'])
+        )
+        odds_lookup['found'] = True
 
-            # filter for matching event date
-            odds_row_att_1 = odds_row[odds_row['start_date'] == date]
-            if odds_row_att_1.empty:
-                odds_row_att_2 = odds_row[odds_row['start_date'] == fallback_date]
-            
-            # assign the odds row to either the first or second odds row, whichever is not empty
-            if odds_row_att_1.empty:
-                odds_row = odds_row_att_2
-            else:
-                odds_row = odds_row_att_1
+        # match on the game date first, then fall back to the next day for rows that did not match
+        keys = processed_moneyline_data[['pair', 'date', 'fallback_date']].reset_index(drop=True)
+        exact = keys.merge(odds_lookup, how='left', left_on=['pair', 'date'], right_on=['pair', 'start_date'])
+        fallback = keys.merge(odds_lookup, how='left', left_on=['pair', 'fallback_date'], right_on=['pair', 'start_date'])
+        use_exact = exact['found'].notna().to_numpy()
+        odds_row = fallback.copy()
+        odds_row.loc[use_exact] = exact.loc[use_exact]
+        matched = odds_row['found'].notna().to_numpy()
 
-            if odds_row.empty:
-                # if (pd.to_datetime(row['fallback_date']) < pd.Timestamp.now() + timedelta(days=7)) and (pd.to_datetime(row['fallback_date']) > pd.Timestamp.now()):
-                #     for index, odd_row in pre_date_odds_row.iterrows():
-                #         print(f'    pre_date_odds_row: {odd_row["player1_name"]} vs {odd_row["player2_name"]} on {odd_row["start_date"]}')
-                #     print(f'down here -- no odds found for {row["team"]} vs {row["opponent"]} on {row["date"]} or {row["fallback_date"]}')
-                continue
+        # report games with no odds at all in the coming week, and ambiguous matches
+        now = pd.Timestamp.now()
+        fallback_dates = pd.to_datetime(processed_moneyline_data['fallback_date']).to_numpy()
+        missing = ~processed_moneyline_data['pair'].isin(odds_data['pair']).to_numpy() & processed_moneyline_data['pair'].notna().to_numpy()
+        upcoming = (fallback_dates < (now + timedelta(days=7)).to_datetime64()) & (fallback_dates > now.to_datetime64())
+        for team, opponent, date in processed_moneyline_data.loc[missing & upcoming, ['team', 'opponent', 'date']].itertuples(index=False):
+            print(f'up here -- no odds found for {team} vs {opponent} on {date}')
+        for team, opponent, date in processed_moneyline_data.loc[matched & (odds_row['candidates'].to_numpy() > 1), ['team', 'opponent', 'date']].itertuples(index=False):
+            print(f'Multiple odds rows found for {team} vs {opponent} on {date}')
 
-            if len(odds_row) > 1:
-                print(f'Multiple odds rows found for {row["team"]} vs {row["opponent"]} on {date}')
-                # take the last row (by date)
-                odds_row = odds_row.sort_values(by='start_date', ascending=False)
+        # orient the odds to the row's team (player1 vs player2)
+        team_is_player1 = (odds_row['player1_name'].to_numpy() == team_dk_name.to_numpy())
+        player_odds = np.where(team_is_player1, odds_row['player1_odds'], odds_row['player2_odds']).astype(float)
+        opponent_odds = np.where(team_is_player1, odds_row['player2_odds'], odds_row['player1_odds']).astype(float)
+        processed_moneyline_data['player_odds'] = np.where(matched, player_odds, np.nan)
+        processed_moneyline_data['opponent_odds'] = np.where(matched, opponent_odds, np.nan)
 
-            count += 1
-            # convert the odds and add them to the row in processed_data
-            if odds_row['player1_name'].values[0] == team_dk_name:
-                processed_moneyline_data.loc[index, 'player_odds'] = odds_row['player1_odds'].values[0]
-                processed_moneyline_data.loc[index, 'opponent_odds'] = odds_row['player2_odds'].values[0]
-            else:
-                processed_moneyline_data.loc[index, 'player_odds'] = odds_row['player2_odds'].values[0]
-                processed_moneyline_data.loc[index, 'opponent_odds'] = odds_row['player1_odds'].values[0]
-            
-            # update the date to the date in the odds_data
-            processed_moneyline_data.loc[index, 'date'] = odds_row['datetime'].values[0]
+        # update the date to the date in the odds_data
+        processed_moneyline_data['date'] = np.where(matched, odds_row['datetime'], processed_moneyline_data['date'])
 
-        print(f'Found moneyline odds: {count}')
+        print(f'Found moneyline odds: {matched.sum()}')
 
-        # drop the fallback_date column
-        processed_moneyline_data = processed_moneyline_data.drop(columns=['fallback_date'])
+        # drop the helper columns
+        processed_moneyline_data = processed_moneyline_data.drop(columns=['fallback_date', 'pair'])
 
         return processed_moneyline_data
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the NBA moneyline training and upcoming data')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only rebuild rows touched by new or updated games since the last run')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes to build the feature rows with (split by season)')
+    parser.add_argument('--closing-lines', action='store_true',
+                        help="use each market's closing line (from the line movement series) instead of its latest odds")
+    args = parser.parse_args()
+
     base_dir = Path(__file__).resolve().parent
     data_dir = base_dir / 'data'
     games_path = data_dir / 'nba_games.csv'
+    state_path = data_dir / 'processor_state.npz'
 
     processed_start_time = time.time()
 
-    # Load the data with proper dtypes to avoid mixed type warnings
-    dtype_dict = {
-        'win': 'float64',  # win column has mixed types (strings and floats)
-        'home': 'str',     # home column might have mixed types
-    }
-    game_data = pd.read_csv(games_path, dtype=dtype_dict, low_memory=False)
+    # Load the data (the storage layer types the mixed win/home columns)
+    game_data = read_table(games_path)
 
     # Preprocess the data (use spread-aware subclass to enable spread features later)
     preprocessor = Processor(game_data)
-    preprocessor.preprocess()
+    if args.incremental:
+        state = preprocessor.preprocess_incremental(ProcessorState.load(state_path), workers=args.workers)
+        state.save(state_path)
+    else:
+        preprocessor.preprocess(workers=args.workers)
     
     # Add moneyline odds and enhanced features BEFORE balancing so we have both sides for opponent features
-    moneyline_data = preprocessor.add_moneyline_odds()
+    moneyline_data = preprocessor.add_moneyline_odds(closing_lines=args.closing_lines)
     
     # Balance the moneyline data 
     preprocessor.processed_data = moneyline_data
@@ -634,8 +1075,6 @@ if __name__ == "__main__":
     minutes, seconds = divmod(remainder, 60)
     print(f'done processing, took {int(hours)} hours, {int(minutes)} minutes, and {seconds:.2f} seconds')
 
-    # writing the upcoming and training moneyline data to csv files
-    (data_dir / 'moneyline_processed_data_upcoming.csv').parent.mkdir(parents=True, exist_ok=True)
-    upcoming_data.to_csv(data_dir / 'moneyline_processed_data_upcoming.csv', index=False)
-    (data_dir / 'moneyline_processed_data_training.csv').parent.mkdir(parents=True, exist_ok=True)
-    training_data.to_csv(data_dir / 'moneyline_processed_data.csv', index=False)
\ No newline at end of file
+    # writing the upcoming and training moneyline data to csv (and parquet) files
+    write_table(upcoming_data, data_dir / 'moneyline_processed_data_upcoming.csv')
+    write_table(training_data, data_dir / 'moneyline_processed_data.csv')
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def event_page(markets: list, selections: list) -> str:
+    """An event page with the markets and selections in window.__INITIAL_STATE__, like DraftKings serves them"""
+    state = {'sports': {'data': []}, 'stadiumEventData': {'markets': markets, 'selections': selections}, 'helpPage': {}}
+    return f'<html><head><script>window.__INITIAL_STATE__ = {json.dumps(state)};</script></head><body></body></html>'
+
+class DraftKingsStub:
+    """
+    Local sportsbook serving event pages (/event/<urlName>/<eventId>) and markets API responses
+    (the eventSubcategory endpoint, by templateVars=<eventId>), recording when every request started
+    pages: dict --> eventId --> (status, page text)
+    api: dict --> eventId --> (status, JSON body)
+    delay: function --> seconds to wait before answering a path (to reorder or overlap responses)
+    """
+    def __init__(self, pages: dict = None, api: dict = None, delay=None):
+        self.pages = pages or {}
+        self.api = api or {}
+        self.delay = delay or (lambda path: 0)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def paths(self) -> list:
+        return [path for path, _ in self.requests]
+
+    def start_times(self) -> list:
+        return sorted(started for _, started in self.requests)
+
+    def _answer(self, path: str):
+        url = urlparse(path)
+        if url.path.startswith('/event/'):
+            return self.pages.get(url.path.rsplit('/', 1)[-1], (404, 'not found'))
+        if 'eventSubcategory' in url.path:
+            event_id = parse_qs(url.query).get('templateVars', [''])[0]
+            status, body = self.api.get(event_id, (404, {}))
+            return status, json.dumps(body)
+        return 404, 'not found'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append((self.path, time.monotonic()))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay(self.path))
+                    status, body = stub._answer(self.path)
+                finally:
+                    # before answering, so a client's next request never overlaps this one in the count
+                    with stub.lock:
+                        stub.in_flight -= 1
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
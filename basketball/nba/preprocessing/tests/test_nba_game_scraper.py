@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+import game_scraper
+from game_scraper import MAX_ATTEMPTS, RETRY_BACKOFF, Scraper
+
+# the fake's own delays, out of reach of the patched time.sleep
+wait = time.sleep
+URL = 'https://www.basketball-reference.com/teams/bos/2024/gamelog/'
+
+class FakeCrawlingAPI:
+    """
+    Stands in for crawlbase.CrawlingAPI: answers get(url) from a script of responses per url (bodies are bytes,
+    like Crawlbase's)
+    responses: dict --> url --> list of statuses (200 answers with a page) or exceptions to raise, one per attempt
+    delay: function --> seconds to wait before answering a url
+    """
+    def __init__(self, responses: dict, delay=None):
+        self.responses = {url: list(script) for url, script in responses.items()}
+        self.delay = delay or (lambda url: 0)
+        self.calls = []
+        self.answered = []
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            self.calls.append(url)
+            outcome = self.responses[url].pop(0)
+        wait(self.delay(url))
+        with self.lock:
+            self.answered.append(url)
+        if isinstance(outcome, Exception):
+            raise outcome
+        body = page(url) if outcome == 200 else b''
+        return {'status_code': outcome, 'headers': {'pc_status': str(outcome)}, 'body': body}
+
+def page(url: str) -> bytes:
+    return f'<html>{url}</html>'.encode()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """The backoff delays fetch_html slept, drawn as the top of each jitter range instead of at random"""
+    slept = []
+    monkeypatch.setattr(game_scraper.random, 'uniform', lambda low, high: high)
+    monkeypatch.setattr(game_scraper.time, 'sleep', slept.append)
+    return slept
+
+def scraper(api: FakeCrawlingAPI, **kwargs) -> Scraper:
+    return Scraper(crawlbase_api=api, requests_per_second=0, cache_dir=None, **kwargs)
+
+def test_rate_limits_and_server_errors_are_retried_with_growing_backoff(sleeps):
+    api = FakeCrawlingAPI({URL: [429, 503, 200]})
+
+    assert scraper(api).fetch_html(URL, 'bos 2024') == page(URL)
+    assert len(api.calls) == 3
+    assert sleeps == [RETRY_BACKOFF, RETRY_BACKOFF * 2]
+
+def test_jitter_is_drawn_from_zero_to_the_backoff(monkeypatch, sleeps):
+    ranges = []
+    monkeypatch.setattr(game_scraper.random, 'uniform', lambda low, high: ranges.append((low, high)) or 0.0)
+    api = FakeCrawlingAPI({URL: [520, 502, 200]})
+
+    scraper(api).fetch_html(URL, 'bos 2024')
+    assert ranges == [(0, RETRY_BACKOFF), (0, RETRY_BACKOFF * 2)]
+
+def test_network_errors_are_retried(sleeps):
+    api = FakeCrawlingAPI({URL: [ConnectionError('reset by peer'), 200]})
+
+    assert scraper(api).fetch_html(URL, 'bos 2024') is not None
+    assert len(api.calls) == 2
+
+def test_gives_up_after_max_attempts(sleeps, capsys):
+    api = FakeCrawlingAPI({URL: [503] * MAX_ATTEMPTS})
+
+    assert scraper(api).fetch_html(URL, 'bos 2024') is None
+    assert len(api.calls) == MAX_ATTEMPTS
+    assert len(sleeps) == MAX_ATTEMPTS - 1
+    assert 'Error scraping bos 2024: 503' in capsys.readouterr().out
+
+def test_other_statuses_fail_without_retrying(sleeps):
+    api = FakeCrawlingAPI({URL: [404]})
+
+    assert scraper(api).fetch_html(URL, 'bos 2024') is None
+    assert len(api.calls) == 1
+    assert sleeps == []
+
+def test_cached_pages_are_not_fetched_again(sleeps, tmp_path):
+    api = FakeCrawlingAPI({URL: [200]})
+    cached = Scraper(crawlbase_api=api, requests_per_second=0, cache_dir=str(tmp_path))
+
+    assert cached.fetch_html(URL, 'bos 2024') == cached.fetch_html(URL, 'bos 2024')
+    assert len(api.calls) == 1
+
+def test_map_concurrently_keeps_the_order_of_the_jobs():
+    urls = [f'https://www.basketball-reference.com/teams/{team}/2024/gamelog/' for team in ('bos', 'nyk', 'phi', 'mia', 'chi', 'det')]
+    # the first pages answer last, so the fetches finish out of order
+    api = FakeCrawlingAPI({url: [200] for url in urls}, delay=lambda url: 0.03 * (len(urls) - urls.index(url)))
+
+    concurrent = scraper(api, max_workers=4)
+    pages = concurrent.map_concurrently(concurrent.fetch_html, [(url, url) for url in urls])
+    assert pages == [page(url) for url in urls]
+    assert api.answered != urls
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+from functions.line_movement import LineMovement, load_line_movement
+from functions.odds_store import OddsStore
+
+def snapshot(market_id: str, scraped_at: str, names: tuple, odds: tuple, points: tuple = (None, None)) -> dict:
+    return {
+        'market_id': market_id,
+        'tournament_name': 'NBA',
+        'event_name': f'{names[0]} @ {names[1]}',
+        'start_date': '2025-01-15T00:10:00Z',
+        'market_name': 'Spread',
+        'player1_name': names[0],
+        'player1_odds': odds[0],
+        'player1_points': points[0],
+        'player2_name': names[1],
+        'player2_odds': odds[1],
+        'player2_points': points[1],
+        'scraped_at': scraped_at,
+    }
+
+BOS_NYK = ('BOS Celtics', 'NY Knicks')
+NYK_BOS = BOS_NYK[::-1]
+
+def store_with(tmp_path, *snapshots) -> OddsStore:
+    store = OddsStore(tmp_path / 'nba_odds')
+    for row in snapshots:
+        store.append(pd.DataFrame([row]))
+    return store
+
+def test_snapshots_scraped_the_other_way_round_are_stored_in_the_first_orientation(tmp_path):
+    store = store_with(
+        tmp_path,
+        snapshot('S-1', '2025-01-14 12:00:00', BOS_NYK, (-110, -110), (-4.5, 4.5)),
+        snapshot('S-1', '2025-01-14 18:00:00', NYK_BOS, (-105, -115), (5.5, -5.5)),
+    )
+    lines = LineMovement.from_store(store)
+
+    series = lines.series('S-1')
+    assert series['odds1'].tolist() == [-110, -115]
+    assert series['points'].tolist() == [-4.5, -5.5]
+    assert series['points2'].tolist() == [4.5, 5.5]
+    assert lines.flipped.tolist() == [False, True]
+    assert lines.max_move('S-1')['points'] == 1.0
+
+    # asked for from the Knicks' side, the closing line is swapped back
+    closing = lines.closing_lines(['S-1', 'S-1'], ['2025-01-15T00:10:00Z'] * 2, ['NY Knicks', 'BOS Celtics'])
+    assert closing['odds1'].tolist() == [-105, -115]
+    assert closing['points'].tolist() == [5.5, -5.5]
+
+def test_saved_series_keeps_the_orientation_of_every_snapshot(tmp_path):
+    store = store_with(
+        tmp_path,
+        snapshot('S-1', '2025-01-14 12:00:00', BOS_NYK, (-110, -110), (-4.5, 4.5)),
+        snapshot('S-1', '2025-01-14 18:00:00', NYK_BOS, (-105, -115), (5.5, -5.5)),
+    )
+    lines = LineMovement.from_store(store)
+    lines.save(tmp_path / 'series.npz')
+    loaded = LineMovement.load(tmp_path / 'series.npz')
+
+    pd.testing.assert_frame_equal(loaded.to_frame(), lines.to_frame())
+    frame = loaded.to_frame()
+    assert frame['player1_name'].tolist() == ['BOS Celtics', 'NY Knicks']
+    assert frame['player1_odds'].tolist() == [-110, -105]
+
+def test_partition_the_store_rewrites_with_the_same_size_and_mtime_is_read_again(tmp_path):
+    store = store_with(tmp_path, snapshot('S-1', '2025-01-14 12:00:00', BOS_NYK, (-150, 130)))
+    first = load_line_movement(store.directory)
+    assert first.closing('S-1')['odds1'] == -150
+
+    path = store.partition_path('2025-01-15')
+    stat = path.stat()
+    rewritten = path.read_text().replace('-150', '-160')
+    assert len(rewritten) == len(path.read_text())
+    store._write_partition('2025-01-15', rewritten, 'w')
+    store._write_stamps()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert load_line_movement(store.directory).closing('S-1')['odds1'] == -160
+    assert np.array_equal(LineMovement.load(store.directory / 'line_movement.npz').odds1, [-160])
+
+def test_partition_edited_outside_the_store_is_read_again(tmp_path):
+    store = store_with(tmp_path, snapshot('S-1', '2025-01-14 12:00:00', BOS_NYK, (-150, 130)))
+    load_line_movement(store.directory)
+
+    with open(store.partition_path('2025-01-15'), 'a', newline='') as file:
+        file.write(pd.DataFrame([snapshot('S-1', '2025-01-14 13:00:00', BOS_NYK, (-170, 150))]).to_csv(header=False, index=False))
+
+    assert load_line_movement(store.directory).closing('S-1')['odds1'] == -170
+
+def test_unchanged_store_is_loaded_without_reading_a_partition(tmp_path, monkeypatch):
+    store = store_with(tmp_path, snapshot('S-1', '2025-01-14 12:00:00', BOS_NYK, (-150, 130)),
+                       snapshot('S-2', '2025-01-14 12:00:00', NYK_BOS, (-110, -110)))
+    load_line_movement(store.directory)
+
+    def read_partition(self, partition):
+        raise AssertionError(f'{partition} was read')
+    monkeypatch.setattr(OddsStore, 'read_partition', read_partition)
+    assert load_line_movement(store.directory).closing('S-2')['odds1'] == -110
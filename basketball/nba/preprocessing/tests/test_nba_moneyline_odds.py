@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import pytest
+from processing import Processor
+from functions.general import get_dk_name_from_team, get_name_from_team
+from functions.odds_store import OddsStore, read_latest_odds
+from test_nba_processing import synthetic_games
+
+# (time scraped on the game day, odds of the team, odds of the opponent); tip-off is at 23:00
+PRE_GAME = ('18:00:00', -150, 130)
+LIVE = ('23:30:00', 400, -600)
+
+def dk_name(team: str) -> str:
+    return get_dk_name_from_team(get_name_from_team(team))
+
+def snapshot(game: pd.Series, scraped: tuple, flipped: bool = False) -> dict:
+    """One moneyline snapshot of a game, as format_and_save_data stores it (flipped puts the opponent first)"""
+    time, team_odds, opponent_odds = scraped
+    day = game['date'].strftime('%Y-%m-%d')
+    names, odds = (dk_name(game['team']), dk_name(game['opponent'])), (team_odds, opponent_odds)
+    if flipped:
+        names, odds = names[::-1], odds[::-1]
+    return {
+        'market_id': 'ML-1',
+        'tournament_name': 'NBA',
+        'event_name': f'{names[0]} @ {names[1]}',
+        'start_date': f'{day}T23:00:00Z',
+        'market_name': 'Moneyline',
+        'player1_name': names[0],
+        'player1_odds': odds[0],
+        'player1_points': None,
+        'player2_name': names[1],
+        'player2_odds': odds[1],
+        'player2_points': None,
+        'scraped_at': f'{day} {time}',
+    }
+
+@pytest.fixture
+def processor():
+    processor = Processor(synthetic_games())
+    processor.preprocess()
+    return processor
+
+def game_odds(processor, tmp_path, monkeypatch, snapshots: list, **kwargs) -> tuple:
+    """(player_odds, opponent_odds) add_moneyline_odds gives the first processed game, with the snapshots in the odds store"""
+    game = processor.processed_data.iloc[0]
+    monkeypatch.chdir(tmp_path)
+    store = OddsStore(tmp_path / 'data' / 'nba_odds')
+    for scraped, flipped in snapshots:
+        store.append(pd.DataFrame([snapshot(game, scraped, flipped)]))
+
+    data = processor.add_moneyline_odds(**kwargs)
+    row = data[(data['team'] == game['team']) & (data['opponent'] == game['opponent'])].iloc[0]
+    return row['player_odds'], row['opponent_odds']
+
+def test_latest_odds_are_used_by_default(processor, tmp_path, monkeypatch):
+    odds = game_odds(processor, tmp_path, monkeypatch, [(PRE_GAME, False), (LIVE, False)])
+
+    assert odds == (400, -600)
+    # the line movement series isn't even built
+    assert not (tmp_path / 'data' / 'nba_odds' / 'line_movement.npz').exists()
+
+def test_closing_lines_replace_the_latest_odds_when_asked(processor, tmp_path, monkeypatch):
+    odds = game_odds(processor, tmp_path, monkeypatch, [(PRE_GAME, False), (LIVE, False)], closing_lines=True)
+
+    assert odds == (-150, 130)
+
+def test_closing_lines_follow_the_team_when_the_scrapes_list_the_teams_in_different_orders(processor, tmp_path, monkeypatch):
+    # the closing snapshot lists the opponent first, the latest one the team
+    odds = game_odds(processor, tmp_path, monkeypatch, [(PRE_GAME, True), (LIVE, False)], closing_lines=True)
+    assert odds == (-150, 130)
+
+def test_closing_lines_follow_the_team_when_the_latest_scrape_is_flipped(processor, tmp_path, monkeypatch):
+    odds = game_odds(processor, tmp_path, monkeypatch, [(PRE_GAME, False), (LIVE, True)], closing_lines=True)
+    assert odds == (-150, 130)
+
+def per_row_lookup(processed_data: pd.DataFrame, odds_data: pd.DataFrame) -> pd.DataFrame:
+    """The per-row lookup add_moneyline_odds replaced: every processed row filters the odds for its team pair"""
+    odds_data = odds_data[odds_data['market_name'] == 'Moneyline'].copy()
+    odds_data['datetime'] = odds_data['start_date']
+    odds_data['start_date'] = pd.to_datetime(odds_data['start_date'], format='mixed', utc=True).dt.strftime('%Y-%m-%d')
+
+    data = processed_data.copy()
+    dates = pd.to_datetime(data['date'], format='mixed', utc=True)
+    data['date'] = dates.dt.strftime('%Y-%m-%d')
+    data['fallback_date'] = (dates + pd.Timedelta(days=1)).dt.strftime('%Y-%m-%d')
+    data['player_odds'] = np.nan
+    data['opponent_odds'] = np.nan
+
+    for index, row in data.iterrows():
+        team_dk_name, opp_dk_name = dk_name(row['team']), dk_name(row['opponent'])
+        player_match = (odds_data['player1_name'] == team_dk_name) & (odds_data['player2_name'] == opp_dk_name)
+        opponent_match = (odds_data['player1_name'] == opp_dk_name) & (odds_data['player2_name'] == team_dk_name)
+        odds_row = odds_data[player_match | opponent_match]
+
+        odds_row_on_date = odds_row[odds_row['start_date'] == row['date']]
+        if odds_row_on_date.empty:
+            odds_row_on_date = odds_row[odds_row['start_date'] == row['fallback_date']]
+        if odds_row_on_date.empty:
+            continue
+
+        odds_row = odds_row_on_date.iloc[0]
+        if odds_row['player1_name'] == team_dk_name:
+            data.loc[index, ['player_odds', 'opponent_odds']] = odds_row['player1_odds'], odds_row['player2_odds']
+        else:
+            data.loc[index, ['player_odds', 'opponent_odds']] = odds_row['player2_odds'], odds_row['player1_odds']
+        data.loc[index, 'date'] = odds_row['datetime']
+
+    return data.drop(columns=['fallback_date'])
+
+def market(market_id: str, names: tuple, odds: tuple, start_date: str, scraped_at: str) -> dict:
+    return {
+        'market_id': market_id,
+        'tournament_name': 'NBA',
+        'event_name': f'{names[0]} @ {names[1]}',
+        'start_date': start_date,
+        'market_name': 'Moneyline',
+        'player1_name': names[0],
+        'player1_odds': odds[0],
+        'player1_points': None,
+        'player2_name': names[1],
+        'player2_odds': odds[1],
+        'player2_points': None,
+        'scraped_at': scraped_at,
+    }
+
+def markets_of_every_game(processed_data: pd.DataFrame) -> list:
+    """
+    Moneyline markets for the processed games, one case per game in turn: listed on the game date, listed on the
+    next day (a late tip-off in UTC), listed opponent first, listed twice under two market ids (scraped an hour
+    apart), and only listed for a later date
+    """
+    seen, markets = set(), []
+    for number, game in enumerate(processed_data.itertuples(index=False)):
+        key = (game.date, frozenset((game.team, game.opponent)))
+        if key in seen:
+            continue
+        seen.add(key)
+        day = game.date.strftime('%Y-%m-%d')
+        names = (dk_name(game.team), dk_name(game.opponent))
+        odds = (-110 - number, 100 + number)
+        scraped_at = f'{day} 12:00:00'
+        case = len(seen) % 5
+        if case == 0:
+            markets.append(market(f'ML-{number}', names, odds, f'{day}T23:00:00Z', scraped_at))
+        elif case == 1:
+            next_day = (game.date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            markets.append(market(f'ML-{number}', names, odds, f'{next_day}T01:30:00Z', scraped_at))
+        elif case == 2:
+            markets.append(market(f'ML-{number}', names[::-1], odds[::-1], f'{day}T23:00:00Z', scraped_at))
+        elif case == 3:
+            # the market scraped last comes first in the file every other time
+            duplicates = [
+                market(f'ML-{number}-a', names, odds, f'{day}T23:00:00Z', scraped_at),
+                market(f'ML-{number}-b', names[::-1], (250, -300), f'{day}T23:00:00Z', f'{day} 13:00:00'),
+            ]
+            markets.extend(duplicates if len(seen) % 10 == 3 else duplicates[::-1])
+        else:
+            later_day = (game.date + pd.Timedelta(days=3)).strftime('%Y-%m-%d')
+            markets.append(market(f'ML-{number}', names, odds, f'{later_day}T23:00:00Z', scraped_at))
+    return markets
+
+def test_keyed_join_matches_the_per_row_lookup(processor, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    markets = markets_of_every_game(processor.processed_data)
+    OddsStore(tmp_path / 'data' / 'nba_odds').append(pd.DataFrame(markets))
+
+    joined = processor.add_moneyline_odds()
+    # of two markets for the same game the lookup takes the most recently scraped one
+    odds_data = read_latest_odds('data', 'nba_odds').sort_values('scraped_at', kind='mergesort').iloc[::-1]
+    expected = per_row_lookup(processor.processed_data, odds_data)
+
+    columns = ['team', 'opponent', 'date', 'player_odds', 'opponent_odds']
+    pd.testing.assert_frame_equal(joined[columns], expected[columns], check_dtype=False)
+    # every case came up: matched on the game date and on the next day, and left without odds
+    assert joined['date'].str.endswith('T23:00:00Z').any()
+    assert joined['date'].str.endswith('T01:30:00Z').any()
+    assert joined['player_odds'].isna().any()
+    assert joined['player_odds'].isin([250, -300]).sum() == 2 * sum(market['market_id'].endswith('-b') for market in markets)
+    assert 'Multiple odds rows found' in capsys.readouterr().out
@@ -0,0 +1,64 @@
+import time
+from draftkings_stub import DraftKingsStub, event_page
+from functions.rate_limit import TokenBucket
+from odds_scraper import create_session, event_data_strategies, fetch_all_event_data
+
+EVENT_IDS = [str(30000000 + i) for i in range(8)]
+
+def event_link(event_id: str) -> dict:
+    return {
+        'urlName': f'team-a-at-team-b-{event_id}',
+        'eventId': event_id,
+        'eventGroupName': 'NBA',
+        'name': f'Team A @ Team B {event_id}',
+        'startDate': '2025-01-15T00:10:00.0000000Z',
+    }
+
+def moneyline_page(event_id: str) -> str:
+    market = {'id': f'{event_id}-ml', 'name': 'Moneyline'}
+    selections = [
+        {'marketId': market['id'], 'label': 'Team A', 'trueOdds': 1.5, 'outcomeType': 'Away'},
+        {'marketId': market['id'], 'label': 'Team B', 'trueOdds': 2.75, 'outcomeType': 'Home'},
+    ]
+    return event_page([market], selections)
+
+def fetch_all(stub: DraftKingsStub, max_in_flight: int, requests_per_second: float):
+    links = [event_link(event_id) for event_id in EVENT_IDS]
+    strategies = event_data_strategies(stub.base_url, stub.base_url)
+    return fetch_all_event_data(create_session(), links, max_in_flight, requests_per_second, strategies)
+
+def test_concurrent_fetch_keeps_event_order_and_caps_requests_in_flight():
+    pages = {event_id: (200, moneyline_page(event_id)) for event_id in EVENT_IDS}
+    # the first events answer last, so the responses come back out of order
+    delay = lambda path: 0.05 * (len(EVENT_IDS) - EVENT_IDS.index(path.rsplit('/', 1)[-1]))
+
+    with DraftKingsStub(pages, delay=delay) as stub:
+        all_event_data = fetch_all(stub, max_in_flight=3, requests_per_second=0)
+
+    assert [data[0]['market_id'] for data in all_event_data] == [f'{event_id}-ml' for event_id in EVENT_IDS]
+    assert len(stub.requests) == len(EVENT_IDS)
+    assert 1 < stub.max_in_flight <= 3
+
+def test_requests_start_no_faster_than_the_token_bucket_allows():
+    pages = {event_id: (200, moneyline_page(event_id)) for event_id in EVENT_IDS}
+    with DraftKingsStub(pages) as stub:
+        fetch_all(stub, max_in_flight=2, requests_per_second=10)
+
+    # a full bucket lets the first max_in_flight requests go at once, then one starts every 1 / rate seconds
+    starts = stub.start_times()
+    assert len(starts) == len(EVENT_IDS)
+    assert starts[-1] - starts[0] >= (len(EVENT_IDS) - 2) / 10 - 0.02
+
+def test_token_bucket_spaces_out_acquires_after_a_burst():
+    limiter = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start >= (6 - 2) / 20 - 0.01
+
+def test_token_bucket_without_a_rate_never_blocks():
+    limiter = TokenBucket(rate=0)
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,107 @@
+import pandas as pd
+from functions.odds_store import UNKNOWN_PARTITION, OddsStore, open_odds_store, read_latest_odds
+
+NAME = 'nba_odds'
+
+def snapshot(market_id: str, day, odds: tuple, scraped_at: str) -> dict:
+    """One moneyline snapshot as format_and_save_data writes it (day None --> a market without a start date)"""
+    return {
+        'market_id': market_id,
+        'event_name': 'Boston Celtics @ New York Knicks',
+        'start_date': None if day is None else f'{day}T00:10:00.0000000Z',
+        'market_name': 'Moneyline',
+        'player1_name': 'BOS Celtics',
+        'player1_odds': odds[0],
+        'player2_name': 'NY Knicks',
+        'player2_odds': odds[1],
+        'scraped_at': scraped_at,
+    }
+
+def scrape(*snapshots) -> pd.DataFrame:
+    return pd.DataFrame(list(snapshots))
+
+def test_only_new_markets_and_moved_lines_are_appended(tmp_path):
+    store = OddsStore(tmp_path / NAME)
+    first = scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00'),
+                   snapshot('2', '2025-01-16', (200, -240), '2025-01-14 10:00:00'))
+
+    assert store.append(first) == 2
+    # the same lines again, with 150.0 read back as 150
+    assert store.append(first.assign(scraped_at='2025-01-14 11:00:00', player1_odds=[-150.0, 200.0])) == 0
+    assert store.append(scrape(snapshot('1', '2025-01-15', (-160, 140), '2025-01-14 12:00:00'))) == 1
+
+    assert store.partitions() == ['2025-01-15', '2025-01-16']
+    assert len(store.history()) == 3
+    latest = store.latest().set_index('market_id')
+    assert latest.loc['1', ['player1_odds', 'player2_odds']].tolist() == [-160, 140]
+    assert latest.loc['2', 'scraped_at'] == '2025-01-14 10:00:00'
+    # the index survives reopening the store
+    assert OddsStore(tmp_path / NAME).index.equals(store.index)
+
+def test_latest_since_skips_older_days_but_keeps_markets_without_a_start_date(tmp_path):
+    store = OddsStore(tmp_path / NAME)
+    store.append(scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00'),
+                        snapshot('2', '2025-01-16', (200, -240), '2025-01-14 10:00:00'),
+                        snapshot('3', None, (110, -130), '2025-01-14 10:00:00')))
+
+    assert UNKNOWN_PARTITION in store.partitions()
+    assert sorted(store.latest(since='2025-01-16')['market_id']) == ['2', '3']
+    assert sorted(store.history(since='2025-01-16')['market_id']) == ['2', '3']
+
+def test_market_moved_to_another_day_is_read_from_its_new_day(tmp_path):
+    store = OddsStore(tmp_path / NAME)
+    store.append(scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00')))
+    # postponed a day, same line
+    assert store.append(scrape(snapshot('1', '2025-01-16', (-150, 130), '2025-01-15 10:00:00'))) == 1
+
+    latest = store.latest()
+    assert len(latest) == 1
+    assert latest['start_date'].iloc[0].startswith('2025-01-16')
+    assert len(store.history()) == 2
+
+def test_compact_drops_repeated_lines_and_rebuilds_the_index(tmp_path):
+    store = OddsStore(tmp_path / NAME)
+    store.append(scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00')))
+    # an older scraper appended every scrape, repeated lines included
+    scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 11:00:00'),
+           snapshot('1', '2025-01-15', (-160, 140), '2025-01-14 12:00:00'),
+           snapshot('1', '2025-01-15', (-160, 140), '2025-01-14 13:00:00')).to_csv(
+        store.partition_path('2025-01-15'), mode='a', header=False, index=False)
+
+    store.compact()
+
+    assert store.read_partition('2025-01-15')['scraped_at'].tolist() == ['2025-01-14 10:00:00', '2025-01-14 12:00:00']
+    assert store.index[['market_id', 'scraped_at']].values.tolist() == [['1', '2025-01-14 12:00:00']]
+    assert store.latest()['player1_odds'].tolist() == [-160]
+
+def test_old_flat_csv_is_imported_once(tmp_path, capsys):
+    scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00'),
+           snapshot('2', '2025-01-16', (200, -240), '2025-01-14 10:00:00')).to_csv(tmp_path / f'{NAME}.csv', index=False)
+
+    store = open_odds_store(tmp_path, NAME)
+    assert sorted(store.latest()['market_id']) == ['1', '2']
+    assert f'Importing {NAME}.csv' in capsys.readouterr().out
+
+    # a store that already has markets is left alone
+    store.append(scrape(snapshot('3', '2025-01-17', (110, -130), '2025-01-15 10:00:00')))
+    assert len(open_odds_store(tmp_path, NAME).history()) == 3
+    assert 'Importing' not in capsys.readouterr().out
+
+def test_latest_odds_are_read_from_the_flat_csv_until_the_store_exists(tmp_path):
+    scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00')).to_csv(tmp_path / f'{NAME}.csv', index=False)
+    assert read_latest_odds(tmp_path, NAME)['player1_odds'].tolist() == [-150]
+
+    OddsStore(tmp_path / NAME).append(scrape(snapshot('1', '2025-01-15', (-160, 140), '2025-01-14 12:00:00')))
+    assert read_latest_odds(tmp_path, NAME)['player1_odds'].tolist() == [-160]
+
+def test_partition_stamp_moves_on_with_every_write_of_the_store(tmp_path):
+    store = OddsStore(tmp_path / NAME)
+    store.append(scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 10:00:00')))
+    stamp = store.partition_stamp('2025-01-15')
+    # reopening the store reads the stamps back without touching the partition
+    assert OddsStore(tmp_path / NAME).partition_stamp('2025-01-15') == stamp
+
+    store.append(scrape(snapshot('1', '2025-01-15', (-150, 130), '2025-01-14 11:00:00')))
+    assert store.partition_stamp('2025-01-15') == stamp
+    store.append(scrape(snapshot('1', '2025-01-15', (-160, 140), '2025-01-14 12:00:00')))
+    assert store.partition_stamp('2025-01-15') != stamp
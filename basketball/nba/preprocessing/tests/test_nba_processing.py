@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+import pytest
+from processing import Processor
+from functions.date_normalization import date_normalizer
+from functions.state_store import ProcessorState
+
+TEAMS = ['bos', 'nyk', 'phi', 'mia', 'chi', 'det']
+STATS = ['field_goals', 'field_goals_attempted', 'three_point_field_goals', 'total_rebounds', 'assists', 'turnovers']
+
+def synthetic_games(seed: int = 7) -> pd.DataFrame:
+    """A small nba_games.csv: every team plays every other one, both perspectives, over two seasons"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in (2022, 2023):
+        dates = pd.date_range(f'{season}-10-20', periods=15, freq='3D')
+        for date in dates:
+            order = rng.permutation(TEAMS)
+            for team, opponent in zip(order[::2], order[1::2]):
+                points, opponent_points = (int(value) for value in rng.integers(85, 130, 2))
+                stats = {stat: float(rng.integers(5, 50)) for stat in STATS}
+                opponent_stats = {stat: float(rng.integers(5, 50)) for stat in STATS}
+                # a missing stat has to come out of both engines the same way
+                if rng.random() < 0.05:
+                    stats['assists'] = np.nan
+                for row_team, row_opponent, home, pts, opp_pts, own, other in (
+                    (team, opponent, True, points, opponent_points, stats, opponent_stats),
+                    (opponent, team, False, opponent_points, points, opponent_stats, stats),
+                ):
+                    rows.append({
+                        'team': row_team,
+                        'date': date.strftime('%Y-%m-%d'),
+                        'opponent': row_opponent,
+                        'home': home,
+                        'win': float(pts > opp_pts),
+                        'points': pts,
+                        'opponent_points': opp_pts,
+                        **own,
+                        **{f'opponent_{stat}': value for stat, value in other.items()},
+                    })
+    return pd.DataFrame(rows)
+
+def processed(engine: str, windows=None) -> pd.DataFrame:
+    processor = Processor(synthetic_games(), windows=windows)
+    processor.preprocess(engine=engine)
+    return processor.processed_data
+
+def test_rolling_engine_matches_loop_engine():
+    loop_data = processed('loop')
+    rolling_data = processed('rolling')
+
+    assert len(rolling_data) > 0
+    pd.testing.assert_frame_equal(loop_data, rolling_data, check_exact=True)
+
+def test_rolling_engine_matches_loop_engine_for_other_game_windows():
+    windows = [{'name': 'last_3', 'kind': 'games', 'size': 3}, {'name': 'last_10', 'kind': 'games', 'size': 10}]
+    pd.testing.assert_frame_equal(processed('loop', windows), processed('rolling', windows), check_exact=True)
+
+def test_loop_engine_rejects_non_game_windows():
+    with pytest.raises(ValueError):
+        processed('loop', [{'name': 'season', 'kind': 'season'}])
+
+def test_date_normalization_counters_cover_one_processor():
+    games = synthetic_games()
+    Processor(games)
+    Processor(games)
+    assert date_normalizer.timings['rows'] == len(games)
+    assert date_normalizer.timings['cached_pairs'] == date_normalizer.timings['distinct_pairs']
+
+def teams_of_first_game(games: pd.DataFrame, date: str) -> tuple:
+    """The team and opponent of the first game played on date"""
+    game = games[games['date'] == date].iloc[0]
+    return game['team'], game['opponent']
+
+def changed_games(games: pd.DataFrame) -> pd.DataFrame:
+    """The games a few days later: one game's stats corrected, one game removed and a new date of games played"""
+    games = games.copy()
+    dates = sorted(games['date'].unique())
+
+    # a stat correction in the first season, on both rows of the game
+    corrected = games['date'].eq(dates[8]) & games['team'].isin(teams_of_first_game(games, dates[8]))
+    games.loc[corrected, ['assists', 'opponent_assists']] += 3
+
+    # a game of the second season that was called off
+    removed = games['date'].eq(dates[20]) & games['team'].isin(teams_of_first_game(games, dates[20]))
+    games = games[~removed]
+
+    # a new date of games at the end of the second season
+    new_games = synthetic_games(seed=11)
+    new_games = new_games[new_games['date'] == new_games['date'].max()].assign(date='2024-01-10')
+    return pd.concat([games, new_games], ignore_index=True)
+
+def test_incremental_preprocess_matches_a_full_rebuild(tmp_path, capsys):
+    path = tmp_path / 'processor_state.npz'
+    Processor(synthetic_games()).preprocess_incremental(ProcessorState()).save(path)
+
+    games = changed_games(synthetic_games())
+    incremental = Processor(games.copy())
+    incremental.preprocess_incremental(ProcessorState.load(path))
+    full = Processor(games.copy())
+    full.preprocess()
+
+    # 2 corrected rows and 6 new ones, 2 removed
+    assert 'found 8 new or updated games and 2 removed games' in capsys.readouterr().out
+    assert len(full.processed_data) > 0
+    pd.testing.assert_frame_equal(incremental.processed_data, full.processed_data, check_exact=True)
+
+def unevenly_paired(data: pd.DataFrame) -> pd.DataFrame:
+    """The processed rows with a game left with one perspective, a game with a third row and a few missing results"""
+    data = data.reset_index(drop=True)
+    first_game = data[(data['date'] == data['date'].iloc[0]) & data['opponent'].eq(data['team'].iloc[0])].index
+    data = data.drop(index=first_game)
+    # a repeated row, so its game has three
+    data = pd.concat([data, data.iloc[[10]]], ignore_index=True)
+    data.loc[data.index[::7], 'result'] = np.nan
+    return data
+
+def balanced(data: pd.DataFrame, engine: str) -> pd.DataFrame:
+    processor = Processor(synthetic_games())
+    processor.processed_data = data.copy()
+    processor.balance(engine=engine)
+    return processor.processed_data
+
+@pytest.mark.parametrize('uneven', [False, True])
+def test_vectorized_balance_matches_loop_balance(uneven):
+    data = processed('rolling')
+    if uneven:
+        data = unevenly_paired(data)
+
+    loop_data = balanced(data, 'loop')
+    assert len(loop_data) > 0
+    pd.testing.assert_frame_equal(balanced(data, 'vectorized'), loop_data, check_exact=True)
+
+def test_preprocess_across_workers_matches_one_process(capsys):
+    # the seasons interleave, so the workers' rows have to be put back in order
+    games = synthetic_games().sample(frac=1, random_state=3).reset_index(drop=True)
+    one_process = Processor(games.copy())
+    one_process.preprocess(workers=1)
+    two_workers = Processor(games.copy())
+    two_workers.preprocess(workers=2)
+
+    # the two seasons went to separate workers
+    assert 'across 2 seasons with 2 workers' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(two_workers.processed_data, one_process.processed_data, check_exact=True)
+
+# bos's points game by game against nyk, who score 100 every time; 2023-09-25 still belongs to the 2022 season
+BOS_POINTS = {
+    '2023-09-25': 80, '2023-10-02': 100, '2023-10-06': 104, '2023-10-10': 110,
+    '2023-10-14': 96, '2023-10-18': 90, '2023-10-22': 120, '2023-10-26': 100,
+}
+
+def bos_against_nyk() -> pd.DataFrame:
+    rows = []
+    for date, points in BOS_POINTS.items():
+        rows.append({'team': 'bos', 'date': date, 'opponent': 'nyk', 'home': True, 'win': float(points > 100),
+                     'points': points, 'opponent_points': 100})
+        rows.append({'team': 'nyk', 'date': date, 'opponent': 'bos', 'home': False, 'win': float(points < 100),
+                     'points': 100, 'opponent_points': points})
+    return pd.DataFrame(rows)
+
+def test_days_season_and_ewm_windows_average_the_earlier_games():
+    windows = [
+        {'name': 'last_10_days', 'kind': 'days', 'size': 10},
+        {'name': 'season', 'kind': 'season'},
+        {'name': 'ewm_3', 'kind': 'ewm', 'size': 3},
+    ]
+    processor = Processor(bos_against_nyk(), windows=windows)
+    processor.preprocess()
+    data = processor.processed_data
+    row = data[(data['team'] == 'bos') & (data['date'] == pd.Timestamp('2023-10-22', tz='UTC'))].iloc[0]
+
+    # 10-14 and 10-18 (10-12 up to the game day, which is left out)
+    assert row['last_10_days_team_team_pts'] == (96 + 90) / 2
+    # 10-02 to 10-18, not the 2022 season's game
+    assert row['season_team_team_pts'] == (100 + 104 + 110 + 96 + 90) / 5
+    # span 3 weighs each earlier game half as much as the next one, back to the 2022 game:
+    # (90 + 96/2 + 110/4 + 104/8 + 100/16 + 80/32) / (1 + 1/2 + 1/4 + 1/8 + 1/16 + 1/32)
+    assert row['ewm_3_team_team_pts'] == pytest.approx(5992 / 63)
+    assert row[['last_10_days_opp_team_pts', 'season_opp_team_pts', 'ewm_3_opp_team_pts']].tolist() == [100, 100, 100]
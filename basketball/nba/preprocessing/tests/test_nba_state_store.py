@@ -0,0 +1,51 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from processing import Processor
+from functions.state_store import STATE_VERSION, ProcessorState
+from test_nba_processing import synthetic_games
+
+def built_state() -> ProcessorState:
+    return Processor(synthetic_games()).preprocess_incremental(ProcessorState())
+
+def test_state_round_trips(tmp_path):
+    path = tmp_path / 'processor_state.npz'
+    state = built_state()
+    state.save(path)
+    loaded = ProcessorState.load(path)
+
+    assert loaded.windows == state.windows
+    pd.testing.assert_frame_equal(loaded.processed, state.processed, check_exact=True)
+    pd.testing.assert_frame_equal(loaded.fingerprints, state.fingerprints, check_exact=True)
+    assert loaded.team_dates.keys() == state.team_dates.keys()
+    assert all(np.array_equal(loaded.team_dates[team], dates) for team, dates in state.team_dates.items())
+    assert json.loads(ProcessorState.stamp_path(path).read_text())['version'] == STATE_VERSION
+
+@pytest.mark.parametrize('content', [
+    b'version https://git-lfs.github.com/spec/v1\noid sha256:0123\nsize 42\n',  # LFS pointer that wasn't pulled
+    b'PK\x03\x04\x14\x00\x00\x00',  # truncated
+    b'',
+])
+def test_unreadable_state_falls_back_to_a_full_rebuild(tmp_path, content):
+    path = tmp_path / 'processor_state.npz'
+    built_state().save(path)
+    path.write_bytes(content)
+    assert ProcessorState.load(path).is_empty
+
+def test_pickled_arrays_are_never_loaded(tmp_path):
+    path = tmp_path / 'processor_state.npz'
+    built_state().save(path)
+    np.savez(path, **{'fingerprints/0': np.array([{'team': 'bos'}], dtype=object)})
+    assert ProcessorState.load(path).is_empty
+
+def test_state_of_another_version_or_without_its_stamp_is_ignored(tmp_path):
+    path = tmp_path / 'processor_state.npz'
+    built_state().save(path)
+    stamp_path = ProcessorState.stamp_path(path)
+    stamp = json.loads(stamp_path.read_text())
+
+    stamp_path.write_text(json.dumps({**stamp, 'version': STATE_VERSION - 1}))
+    assert ProcessorState.load(path).is_empty
+    stamp_path.unlink()
+    assert ProcessorState.load(path).is_empty
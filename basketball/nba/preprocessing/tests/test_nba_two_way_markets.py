@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+import pandas as pd
+import pytest
+import odds_scraper
+from draftkings_stub import DraftKingsStub, event_page
+from functions.two_way_markets import pivot_two_way_markets
+from odds_scraper import create_session, event_data_strategies, extract_event_data, fetch_event_data
+
+# markets and selections of one event as the event page and the markets API return them
+RECORDED = json.loads((Path(__file__).parent / 'data' / 'nba_event_selections.json').read_text())
+EVENT_LINK = {
+    'urlName': 'bos-celtics-%40-ny-knicks',
+    'eventId': '31512345',
+    'eventGroupName': 'NBA',
+    'name': 'BOS Celtics @ NY Knicks',
+    'startDate': '2025-01-15T00:10:00.0000000Z',
+}
+
+def recorded_data_points() -> pd.DataFrame:
+    return pd.DataFrame(extract_event_data(EVENT_LINK, RECORDED['markets'], RECORDED['selections']))
+
+def test_pivot_pairs_the_two_outcomes_of_each_two_way_market():
+    processed = pivot_two_way_markets(recorded_data_points(), odds_format='american')
+
+    # the three-way market and the selection without a market are left out, markets come ordered by id
+    assert processed['market_name'].tolist() == ['Moneyline', 'Spread', 'Total']
+    assert processed['market_id'].tolist() == ['0QA210456789#1_2', '0QA210456789#2_2', '0QA210456789#3_2']
+    assert (processed['event_name'] == 'BOS Celtics @ NY Knicks').all()
+
+    # player1 is the first outcome as scraped, decimal odds are converted to American (truncated)
+    assert processed['player1_name'].tolist() == ['BOS Celtics', 'BOS Celtics', 'Over']
+    assert processed['player2_name'].tolist() == ['NY Knicks', 'NY Knicks', 'Under']
+    assert processed['player1_odds'].tolist() == [-200, -109, -114]
+    assert processed['player2_odds'].tolist() == [175, -109, -105]
+    assert processed['player1_points'].tolist()[1:] == [-4.5, 225.5]
+    assert processed['player2_points'].tolist()[1:] == [4.5, 225.5]
+    assert pd.isna(processed['player1_points'].iloc[0])
+    assert processed['player1_outcome_type'].tolist() == ['Away', 'Away', 'Over']
+    assert processed.columns[-1] == 'scraped_at'
+
+def test_pivot_keeps_decimal_odds_and_adds_american_columns():
+    processed = pivot_two_way_markets(recorded_data_points(), american_columns=True, scraped_at_first=True)
+
+    assert processed.columns[0] == 'scraped_at'
+    assert processed['player1_odds'].tolist() == [1.5, 1.91, 1.87]
+    assert processed['player1_american_odds'].tolist() == [-200, -109, -114]
+
+def test_pivot_without_two_way_markets_is_empty():
+    data_points = recorded_data_points()
+    assert pivot_two_way_markets(data_points[data_points['market_name'] == 'Winning Margin']).empty
+
+def test_format_and_save_data_stops_when_there_are_no_two_way_markets(tmp_path, monkeypatch):
+    three_way = [point for point in recorded_data_points().to_dict('records') if point['market_name'] == 'Winning Margin']
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(odds_scraper, 'open_odds_store', lambda *args: pytest.fail('the odds store was opened'))
+
+    odds_scraper.format_and_save_data([three_way])
+
+    assert not (tmp_path / 'data' / 'upcoming_nba_odds.csv').exists()
+
+def api_response() -> dict:
+    # the markets API only has the moneyline, spread and total markets
+    return {
+        'markets': RECORDED['markets'][:3],
+        'selections': [selection for selection in RECORDED['selections'] if selection['marketId'] in {m['id'] for m in RECORDED['markets'][:3]}],
+    }
+
+def fetch_recorded_event(pages: dict, api: dict):
+    with DraftKingsStub(pages, api) as stub:
+        strategies = event_data_strategies(stub.base_url, stub.base_url)
+        extracted = fetch_event_data(create_session(), EVENT_LINK, strategies)
+    kinds = ['page' if path.startswith('/event/') else 'api' for path in stub.paths()]
+    return extracted, kinds
+
+def test_event_page_is_used_when_it_has_data():
+    page = event_page(RECORDED['markets'], RECORDED['selections'])
+    extracted, kinds = fetch_recorded_event({EVENT_LINK['eventId']: (200, page)}, {EVENT_LINK['eventId']: (200, api_response())})
+
+    assert kinds == ['page']
+    # the page has every market, the three-way one included
+    assert {point['market_name'] for point in extracted} == {'Moneyline', 'Spread', 'Total', 'Winning Margin'}
+
+def test_markets_api_is_tried_after_a_failed_event_page():
+    extracted, kinds = fetch_recorded_event({}, {EVENT_LINK['eventId']: (200, api_response())})
+
+    assert kinds == ['page', 'api']
+    assert {point['market_name'] for point in extracted} == {'Moneyline', 'Spread', 'Total'}
+
+def test_markets_api_is_tried_after_an_event_page_without_selections():
+    empty_page = event_page([], [])
+    extracted, kinds = fetch_recorded_event({EVENT_LINK['eventId']: (200, empty_page)}, {EVENT_LINK['eventId']: (200, api_response())})
+
+    assert kinds == ['page', 'api']
+    assert len(extracted) == 6
+
+def test_no_data_when_every_strategy_fails():
+    extracted, kinds = fetch_recorded_event({}, {})
+
+    assert kinds == ['page', 'api']
+    assert extracted == []
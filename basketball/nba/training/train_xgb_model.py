@@ -2,6 +2,7 @@ import pandas as pd
 import xgboost as xgb
 from functions.general import *
 from functions.odds_functions import convert_american_to_probability
+from functions.data_store import read_table
 from datetime import datetime, timezone
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -28,7 +29,7 @@ def get_odds(win_prob):
 
 
 # opening the processed upcoming event data
-testing_data = pd.read_csv('../preprocessing/data/moneyline_processed_data_upcoming.csv')
+testing_data = read_table('../preprocessing/data/moneyline_processed_data_upcoming.csv')
 predictions_list = []
 for index, row in testing_data.iterrows():
     result = row['result']
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+import pytest
+
+# every sport's scripts (and the NBA events scripts) run from their own directory and import their helpers as
+# functions.<module>, and scripts like processing.py or game_scraper.py exist once per sport, so the tests of one
+# script directory can only import its modules while no other directory's ones are in sys.modules
+ROOT = Path(__file__).resolve().parent
+# script directory --> {module name: module} of its scripts, helpers and test helpers, recorded as its tests are collected
+SCRIPT_MODULES = {}
+
+def script_dir_of(path):
+    """The script directory a file or directory belongs to: the nearest one holding a functions directory (None outside one)"""
+    path = Path(path).resolve()
+    for parent in (path, *path.parents):
+        if (parent / 'functions').is_dir():
+            return parent
+        if parent == ROOT:
+            return None
+    return None
+
+def owner(name: str, module):
+    """Script directory of a module imported by a plain name (functions.<module>, a script or a test helper)"""
+    if '.' in name and not name.startswith('functions.'):
+        return None
+    path = getattr(module, '__file__', None)
+    if path is not None:
+        return script_dir_of(path)
+    # functions has no __init__.py, so it's a namespace package: only its __path__ tells where it was found
+    return next(filter(None, map(script_dir_of, getattr(module, '__path__', []))), None)
+
+def use_script_dir(script_dir: Path, tests_dir: Path):
+    """Puts script_dir and tests_dir first on sys.path and forgets the modules of every other script directory"""
+    for name, module in list(sys.modules.items()):
+        if owner(name, module) not in (None, script_dir):
+            del sys.modules[name]
+    sys.modules.update(SCRIPT_MODULES.get(script_dir, {}))
+    sys.path[:] = [entry for entry in sys.path if script_dir_of(entry or '.') is None]
+    sys.path[:0] = [str(script_dir), str(tests_dir)]
+
+def pytest_pycollect_makemodule(module_path, parent):
+    script_dir = script_dir_of(module_path)
+    if script_dir is not None:
+        use_script_dir(script_dir, module_path.parent)
+
+def pytest_itemcollected(item):
+    script_dir = script_dir_of(item.path)
+    if script_dir is not None:
+        modules = SCRIPT_MODULES.setdefault(script_dir, {})
+        modules.update({name: module for name, module in list(sys.modules.items()) if owner(name, module) == script_dir})
+
+@pytest.fixture(autouse=True)
+def own_script_modules(request, monkeypatch):
+    """
+    Imports made while a test runs (pickle, worker processes) find its own directory's modules, even after the
+    test directories collected later swapped theirs in
+    """
+    script_dir = script_dir_of(request.node.path)
+    if script_dir is None:
+        return
+    for name, module in list(sys.modules.items()):
+        if owner(name, module) not in (None, script_dir):
+            monkeypatch.delitem(sys.modules, name)
+    for name, module in SCRIPT_MODULES.get(script_dir, {}).items():
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.syspath_prepend(str(request.node.path.parent))
+    monkeypatch.syspath_prepend(str(script_dir))
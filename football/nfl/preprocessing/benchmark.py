@@ -0,0 +1,112 @@
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+import pandas as pd
+from functions.extract_game_data import extract_game_data
+from functions.http_cache import HttpCache
+from game_scraper import CACHE_DIR
+from processing import Preprocessor
+
+base_dir = Path(__file__).resolve().parent
+data_dir = base_dir / 'data'
+# saved boxscore pages (e.g. curl -o data/boxscores/202409080buf.htm https://www.pro-football-reference.com/boxscores/202409080buf.htm)
+boxscores_dir = data_dir / 'boxscores'
+
+def load_games():
+    """Loads nfl_games.csv the same way processing.py does"""
+    return pd.read_csv(data_dir / 'nfl_games.csv', dtype={'win': 'float64', 'home': 'str'}, low_memory=False)
+
+def timed(label, func):
+    """Runs func once and prints how long it took"""
+    start_time = time.time()
+    result = func()
+    print(f'{label}: {time.time() - start_time:.2f} seconds')
+    return result
+
+def traced(func):
+    """Runs func once and returns (result, seconds, peak MB allocated by Python while it ran)"""
+    tracemalloc.start()
+    start_time = time.time()
+    result = func()
+    elapsed = time.time() - start_time
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def load_boxscores():
+    """The saved boxscore pages and the boxscores in the page cache (data/http_cache), as (name, html)"""
+    pages = [(path.name, path.read_bytes()) for path in sorted(boxscores_dir.glob('*.htm*'))]
+    pages += [
+        (url.rsplit('/', 1)[-1], body) for url, body in HttpCache(base_dir / CACHE_DIR).entries() if '/boxscores/' in url
+    ]
+    return pages
+
+def teams_of(html):
+    """The two team codes of a boxscore page, from its first links to team season pages"""
+    text = html.decode('utf-8', errors='replace') if isinstance(html, bytes) else html
+    teams = []
+    for team in re.findall(r'/teams/(\w{3})/\d{4}\.htm', text):
+        if team not in teams:
+            teams.append(team)
+    return [team.upper() for team in (teams + ['TM1', 'TM2'])[:2]]
+
+def benchmark_pbp():
+    """
+    Compares the original extract_game_data path (BeautifulSoup over the whole page, then over the PBP comment)
+    against slicing the PBP comment out and tokenizing only its rows: parse time and peak memory per boxscore,
+    and checks both give the same features
+    """
+    pages = load_boxscores()
+    if not pages:
+        print(f'no saved boxscores in {boxscores_dir} or the page cache, nothing to compare')
+        return
+
+    totals = {'soup': [0.0, 0.0], 'sliced': [0.0, 0.0]}
+    for name, html in pages:
+        team, opp = teams_of(html)
+        print(f'{name}: {len(html) / 1e6:.2f} MB page ({team} vs {opp})')
+        results = {}
+        for engine in ('soup', 'sliced'):
+            results[engine], seconds, peak = traced(lambda: extract_game_data(html, team, opp, engine=engine))
+            totals[engine][0] += seconds
+            totals[engine][1] = max(totals[engine][1], peak)
+            print(f'  {engine}: {seconds:.3f} seconds, peak {peak:.1f} MB')
+        assert results['sliced'] == results['soup'], f'features differ for {name}'
+        print('  parity ok')
+
+    for engine, (seconds, peak) in totals.items():
+        print(f'{engine}: {seconds / len(pages):.3f} seconds per boxscore, peak {peak:.1f} MB')
+    print(f'speedup: {totals["soup"][0] / totals["sliced"][0]:.1f}x over {len(pages)} boxscores')
+
+def benchmark_balance():
+    """
+    Compares the concat-per-group loop in balance() against the group-position version on the
+    preprocessed games and checks that both keep exactly the same rows
+    """
+    preprocessor = Preprocessor(load_games())
+    preprocessor.preprocess()
+    processed_data = preprocessor.processed_data
+
+    preprocessor.processed_data = processed_data.copy()
+    timed('loop balance', lambda: preprocessor.balance(engine='loop'))
+    loop_data = preprocessor.processed_data
+
+    preprocessor.processed_data = processed_data.copy()
+    timed('vectorized balance', lambda: preprocessor.balance(engine='vectorized'))
+    vectorized_data = preprocessor.processed_data
+
+    pd.testing.assert_frame_equal(loop_data, vectorized_data, check_exact=True)
+    print(f'parity ok: {len(vectorized_data)} rows kept out of {len(processed_data)}')
+
+BENCHMARKS = {
+    'pbp': benchmark_pbp,
+    'balance': benchmark_balance,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f'>>> {name}')
+        BENCHMARKS[name]()
@@ -1,10 +1,15 @@
 # ./functions/extract_game_data.py
 import re
 import statistics
+import time
 from bs4 import BeautifulSoup, Comment
 from functions.general import get_team_from_name
+from functions.pbp_rows import find_pbp_comment, read_pbp_rows
 
-def extract_game_data(res_or_html, team, opp):
+# bump whenever a change here changes the features returned, so the cached ones (PbpFeatureCache) are recomputed
+PARSER_VERSION = 1
+
+def extract_game_data(res_or_html, team, opp, engine='sliced'):
     """
     Extract detailed game-level stats for both teams from a Pro-Football-Reference
     play-by-play page. Possession tracking is based on coin toss + divider/newhalf/overtime
@@ -14,6 +19,8 @@ def extract_game_data(res_or_html, team, opp):
         res_or_html: requests.Response or raw HTML string
         team (str): e.g., 'BUF'
         opp (str): e.g., 'CRD'
+        engine (str): 'sliced' cuts the PBP comment out of the page with a substring search and
+            tokenizes only its rows, 'soup' parses the whole page with BeautifulSoup (the original path)
 
     Returns:
         dict: {team: {feature: value, ...}, opp: {feature: value, ...}}
@@ -24,19 +31,29 @@ def extract_game_data(res_or_html, team, opp):
     else:
         html = res_or_html
 
-    soup = BeautifulSoup(html, "html.parser")
+    if engine == 'sliced':
+        # Extract the commented PBP table
+        pbp_html = find_pbp_comment(html)
+        if pbp_html is None:
+            return {team: {}, opp: {}}
+        data_rows = read_pbp_rows(pbp_html)
+    elif engine == 'soup':
+        soup = BeautifulSoup(html, "html.parser")
+
+        # Extract the commented PBP table
+        comments = soup.find_all(string=lambda text: isinstance(text, Comment))
+        pbp_soup = None
+        for c in comments:
+            if 'id="pbp"' in c or 'id="div_pbp"' in c:
+                pbp_soup = BeautifulSoup(c, "html.parser")
+                break
+        if pbp_soup is None:
+            return {team: {}, opp: {}}
 
-    # Extract the commented PBP table
-    comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-    pbp_soup = None
-    for c in comments:
-        if 'id="pbp"' in c or 'id="div_pbp"' in c:
-            pbp_soup = BeautifulSoup(c, "html.parser")
-            break
-    if pbp_soup is None:
-        return {team: {}, opp: {}}
+        data_rows = pbp_soup.find_all("tr")
+    else:
+        raise ValueError(f"Unknown engine {engine}")
 
-    data_rows = pbp_soup.find_all("tr")
     team_w_ball = team
     starting_team = []
     possessions = []  # (team_code, play_dict)
@@ -701,3 +718,12 @@ def extract_game_data(res_or_html, team, opp):
         del stats[t]["field_position_starts"]
 
     return stats
+
+def timed_extract_game_data(html, team, opp):
+    """
+    extract_game_data for a parser worker process: takes the raw page (a Response can't be sent to another process)
+    and returns (features, seconds spent parsing)
+    """
+    start_time = time.time()
+    features = extract_game_data(html, team, opp)
+    return features, time.time() - start_time
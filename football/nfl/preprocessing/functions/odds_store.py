@@ -0,0 +1,226 @@
+import hashlib
+import json
+import sys
+from pathlib import Path
+import pandas as pd
+
+# a snapshot is only appended when one of these changed since the market's latest snapshot (the line moved)
+LINE_COLUMNS = ['player1_odds', 'player2_odds', 'player1_points', 'player2_points']
+INDEX_FILE = 'index.csv'
+INDEX_COLUMNS = ['market_id', 'partition', 'scraped_at', 'fingerprint']
+# content stamp of every partition, chained over everything the store wrote to it (not a .csv, so it's no partition)
+STAMPS_FILE = 'stamps.json'
+# partition of the markets without a start date
+UNKNOWN_PARTITION = 'unknown'
+
+def partition_of(start_dates: pd.Series) -> pd.Series:
+    """Partition of each snapshot: the day its event starts (YYYY-MM-DD)"""
+    return start_dates.astype(str).str[:10].where(start_dates.notna(), UNKNOWN_PARTITION)
+
+def fingerprint_of(data: pd.DataFrame) -> pd.Series:
+    """The line of each snapshot as one string, with the numbers as floats so 150 and 150.0 compare equal"""
+    columns = [column for column in LINE_COLUMNS if column in data.columns]
+    if not columns:
+        return pd.Series('', index=data.index)
+    parts = [pd.to_numeric(data[column], errors='coerce').astype('float64').astype(str) for column in columns]
+    fingerprint = parts[0]
+    for part in parts[1:]:
+        fingerprint = fingerprint + '|' + part
+    return fingerprint
+
+class OddsStore:
+    """
+    Append-only odds history of one sport, with a market_id index of every market's latest snapshot
+    directory/<YYYY-MM-DD>.csv --> the snapshots of the markets whose event starts that day, oldest first
+    directory/index.csv --> market_id, partition, scraped_at and line fingerprint of each market's latest snapshot
+    directory/stamps.json --> content stamp of each partition, so caches built from them don't have to hash the files
+    A scrape only appends the markets that are new or whose line moved, so the history keeps every line movement
+    while the partition files are never rewritten (until compact())
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.index_path = self.directory / INDEX_FILE
+        self.stamps_path = self.directory / STAMPS_FILE
+        self.index = self._read_index()
+        self.stamps = self._read_stamps()
+
+    def _read_index(self) -> pd.DataFrame:
+        if not self.index_path.exists():
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+        return pd.read_csv(self.index_path, dtype=str, keep_default_na=False)
+
+    def _write_index(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index.to_csv(self.index_path, index=False)
+
+    def _read_stamps(self) -> dict:
+        if not self.stamps_path.exists():
+            return {}
+        try:
+            return json.loads(self.stamps_path.read_text())
+        except ValueError:
+            return {}
+
+    def _write_stamps(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.stamps_path.write_text(json.dumps(self.stamps, sort_keys=True))
+
+    def _write_partition(self, partition: str, text: str, mode: str):
+        """Writes CSV text to a partition ('a' appends, 'w' rewrites) and moves its content stamp on"""
+        with open(self.partition_path(partition), mode, newline='') as file:
+            file.write(text)
+        previous = self.stamps.get(partition, '') if mode == 'a' else ''
+        self.stamps[partition] = hashlib.sha256((previous + text).encode()).hexdigest()
+
+    def partition_stamp(self, partition: str) -> str:
+        """
+        Size, mtime and content stamp of a partition file: changes whenever the store writes to it (even if the
+        size and mtime come out the same) or the file is edited outside the store, without reading the file
+        """
+        stat = self.partition_path(partition).stat()
+        return f'{stat.st_size}:{stat.st_mtime_ns}:{self.stamps.get(partition, "")}'
+
+    def partition_path(self, partition: str) -> Path:
+        return self.directory / f'{partition}.csv'
+
+    def partitions(self) -> list:
+        return sorted(path.stem for path in self.directory.glob('*.csv') if path.name != INDEX_FILE)
+
+    def is_empty(self) -> bool:
+        return self.index.empty
+
+    def read_partition(self, partition: str) -> pd.DataFrame:
+        return pd.read_csv(self.partition_path(partition), dtype={'market_id': str})
+
+    def append(self, snapshots: pd.DataFrame) -> int:
+        """
+        Appends the snapshots of markets that are new, whose line moved, or whose event moved to another day
+        snapshots: pd.DataFrame --> one row per market as written by format_and_save_data (market_id, start_date, scraped_at, ...)
+        Returns the number of snapshots appended
+        """
+        if snapshots.empty:
+            return 0
+
+        snapshots = snapshots.drop_duplicates(subset=['market_id'], keep='last').reset_index(drop=True)
+        market_ids = snapshots['market_id'].astype(str)
+        partitions = partition_of(snapshots['start_date'])
+        fingerprints = fingerprint_of(snapshots)
+
+        latest = self.index.set_index('market_id')
+        changed = (
+            (market_ids.map(latest['fingerprint']) != fingerprints)
+            | (market_ids.map(latest['partition']) != partitions)
+        ).to_numpy()
+        if not changed.any():
+            return 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        new = snapshots[changed]
+        for partition, rows in new.groupby(partitions[changed], sort=True):
+            path = self.partition_path(partition)
+            if path.exists():
+                # keep the partition's columns (a column the file doesn't have can't be appended to it)
+                header = pd.read_csv(path, nrows=0).columns
+                rows = rows.reindex(columns=header)
+            self._write_partition(partition, rows.to_csv(header=not path.exists(), index=False), 'a')
+        self._write_stamps()
+
+        entries = pd.DataFrame({
+            'market_id': market_ids[changed].to_numpy(),
+            'partition': partitions[changed].to_numpy(),
+            'scraped_at': new['scraped_at'].astype(str).to_numpy() if 'scraped_at' in new else '',
+            'fingerprint': fingerprints[changed].to_numpy(),
+        })
+        self.index = pd.concat(
+            [self.index[~self.index['market_id'].isin(entries['market_id'])], entries], ignore_index=True
+        )
+        self._write_index()
+        return int(changed.sum())
+
+    def latest(self, since: str = None) -> pd.DataFrame:
+        """
+        Latest snapshot of every market, read only from the partitions the index points at
+        since: str --> only markets whose event starts on or after this day (YYYY-MM-DD), so the older partitions
+        aren't read at all (markets without a start date are always included)
+        """
+        index = self.index
+        if since is not None:
+            index = index[(index['partition'] >= since) | (index['partition'] == UNKNOWN_PARTITION)]
+
+        frames = []
+        for partition, entries in index.groupby('partition', sort=True):
+            rows = self.read_partition(partition).drop_duplicates(subset=['market_id'], keep='last')
+            frames.append(rows[rows['market_id'].isin(entries['market_id'])])
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def history(self, since: str = None) -> pd.DataFrame:
+        """Every snapshot, oldest first within each partition (since: str --> only partitions on or after this day)"""
+        partitions = [p for p in self.partitions() if since is None or p >= since or p == UNKNOWN_PARTITION]
+        frames = [self.read_partition(partition) for partition in partitions]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def compact(self):
+        """
+        Rewrites every partition without the snapshots that repeat the previous line of their market,
+        and rebuilds the index from the partitions (latest scraped_at per market)
+        """
+        entries = []
+        for partition in self.partitions():
+            rows = self.read_partition(partition)
+            fingerprints = fingerprint_of(rows)
+            repeated = fingerprints.eq(fingerprints.groupby(rows['market_id']).shift())
+            if repeated.any():
+                rows = rows[~repeated].reset_index(drop=True)
+                fingerprints = fingerprints[~repeated].reset_index(drop=True)
+                self._write_partition(partition, rows.to_csv(index=False), 'w')
+            entries.append(pd.DataFrame({
+                'market_id': rows['market_id'].astype(str),
+                'partition': partition,
+                'scraped_at': rows['scraped_at'].astype(str) if 'scraped_at' in rows else '',
+                'fingerprint': fingerprints,
+            }))
+
+        if entries:
+            index = pd.concat(entries, ignore_index=True)
+            # stable sort, so a tie keeps the later partition / later row
+            index = index.sort_values('scraped_at', kind='mergesort').drop_duplicates(subset=['market_id'], keep='last')
+            self.index = index.sort_values(['partition', 'market_id']).reset_index(drop=True)
+        else:
+            self.index = pd.DataFrame(columns=INDEX_COLUMNS)
+        self._write_stamps()
+        self._write_index()
+
+def open_odds_store(data_dir, name: str) -> OddsStore:
+    """
+    Opens data_dir/<name> (e.g. data/nba_odds), importing the old flat data_dir/<name>.csv into it on first use
+    """
+    data_dir = Path(data_dir)
+    store = OddsStore(data_dir / name)
+    legacy_path = data_dir / f'{name}.csv'
+    if store.is_empty() and legacy_path.exists():
+        try:
+            legacy = pd.read_csv(legacy_path, dtype={'market_id': str})
+        except pd.errors.EmptyDataError:
+            legacy = pd.DataFrame()
+        if not legacy.empty:
+            print(f'Importing {legacy_path.name} into {store.directory.name}/')
+            store.append(legacy)
+    return store
+
+def read_latest_odds(data_dir, name: str, since: str = None) -> pd.DataFrame:
+    """Latest snapshot of every market (the old <name>.csv view), falling back to <name>.csv before the store exists"""
+    data_dir = Path(data_dir)
+    store = OddsStore(data_dir / name)
+    if store.is_empty():
+        return pd.read_csv(data_dir / f'{name}.csv')
+    return store.latest(since)
+
+if __name__ == '__main__':
+    # python3 functions/odds_store.py data/nba_odds --> compacts the store
+    for directory in sys.argv[1:]:
+        OddsStore(directory).compact()
+        print(f'Compacted {directory}')
@@ -0,0 +1,149 @@
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# kind of every stored value, so ints come back as ints, Nones as None and a feature an entry doesn't have stays absent
+MISSING, FLOAT, INT, NONE = 0, 1, 2, 3
+
+def boxscore_id(boxscore_link: str) -> str:
+    """'/boxscores/202409080buf.htm' --> '202409080buf'"""
+    return boxscore_link.rstrip('/').rsplit('/', 1)[-1].split('.', 1)[0]
+
+def _plain(value):
+    """A feature value as the int, float or None it's stored as (numpy numbers and bools included), TypeError otherwise"""
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_, int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} value')
+
+class PbpFeatureCache:
+    """
+    PBP features of finished games (a pure function of the boxscore and the side it's parsed for), keyed by boxscore id:
+    boxscore_id --> {team: {feature: value}}, as extract_game_data returned them
+    Every entry is stamped with the parser version that extracted it and the team it was extracted for (the team
+    argument of extract_game_data, whose score tracking depends on it); only an entry of the current version and
+    the same side is a hit, so bumping the version recomputes the entries as their games come up again while the
+    others are kept
+    Stored as one compressed npz of columns: one row per (boxscore, team), one column per feature name
+    path: str --> the npz file, None disables the cache (every get misses, save does nothing)
+    parser_version: int --> version of the features being extracted now
+    """
+    def __init__(self, path, parser_version: int):
+        self.path = Path(path) if path is not None else None
+        self.parser_version = parser_version
+        # boxscore_id --> (version, side, features) of the stored entries, plus the ones put since
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.changed = False
+        if self.path is not None and self.path.exists():
+            self.entries = self._read(self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, boxscore, side: str):
+        """
+        Features of a boxscore id extracted for side (a team code), or None when they aren't cached for the current
+        parser version and that side
+        """
+        version, cached_side, features = self.entries.get(boxscore, (None, None, None))
+        if version != self.parser_version or cached_side != side:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {team: dict(values) for team, values in features.items()}
+
+    def put(self, boxscore, side: str, features: dict) -> bool:
+        """
+        Caches the features of a boxscore id extracted for side (a team code) for the current parser version
+        Numpy numbers and bools are stored as ints and floats, None as a value of its own
+        Returns False (and caches nothing) when the cache is disabled or a value is anything else
+        """
+        if self.path is None:
+            return False
+        try:
+            plain = {team: {name: _plain(value) for name, value in values.items()} for team, values in features.items()}
+        except TypeError as e:
+            print(f'Not caching the PBP features of {boxscore}: {e}')
+            return False
+        self.entries[boxscore] = (self.parser_version, side, plain)
+        self.changed = True
+        return True
+
+    def save(self):
+        """Writes the cache when entries were put since it was read (atomically, through a temporary file)"""
+        if self.path is None or not self.changed:
+            return
+        ids, versions, sides, teams, rows = [], [], [], [], []
+        for boxscore, (version, side, features) in self.entries.items():
+            for team, values in features.items():
+                ids.append(boxscore)
+                versions.append(version)
+                sides.append(side)
+                teams.append(team)
+                rows.append(values)
+
+        names = list(dict.fromkeys(name for values in rows for name in values))
+        columns = {name: i for i, name in enumerate(names)}
+        values = np.zeros((len(rows), len(names)), dtype=np.float64)
+        kinds = np.full((len(rows), len(names)), MISSING, dtype=np.int8)
+        for i, row in enumerate(rows):
+            for name, value in row.items():
+                if value is None:
+                    kinds[i, columns[name]] = NONE
+                    continue
+                values[i, columns[name]] = value
+                kinds[i, columns[name]] = INT if type(value) is int else FLOAT
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez_compressed(
+                    file,
+                    boxscore_ids=np.array(ids, dtype=str),
+                    versions=np.array(versions, dtype=np.int32),
+                    sides=np.array(sides, dtype=str),
+                    teams=np.array(teams, dtype=str),
+                    features=np.array(names, dtype=str),
+                    values=values,
+                    kinds=kinds,
+                )
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.changed = False
+        print(f'Saved PBP features of {len(self.entries)} boxscores to {self.path}')
+
+    @staticmethod
+    def _read(path) -> dict:
+        try:
+            with np.load(path) as arrays:
+                ids = arrays['boxscore_ids'].tolist()
+                versions = arrays['versions'].tolist()
+                sides = arrays['sides'].tolist()
+                teams = arrays['teams'].tolist()
+                names = arrays['features'].tolist()
+                values = arrays['values']
+                kinds = arrays['kinds']
+        except (OSError, ValueError, KeyError) as e:
+            # a cache that can't be read is started over (the next save replaces it)
+            print(f'Could not read the PBP feature cache {path} ({e}), starting an empty one')
+            return {}
+
+        entries = {}
+        for i, boxscore in enumerate(ids):
+            version, side, features = entries.setdefault(boxscore, (versions[i], sides[i], {}))
+            row = features.setdefault(teams[i], {})
+            for j in np.flatnonzero(kinds[i]):
+                if kinds[i, j] == NONE:
+                    row[names[j]] = None
+                else:
+                    row[names[j]] = int(values[i, j]) if kinds[i, j] == INT else float(values[i, j])
+        return entries
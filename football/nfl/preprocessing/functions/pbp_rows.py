@@ -0,0 +1,127 @@
+import re
+from html import unescape
+
+# Pro-Football-Reference ships the play-by-play table inside an HTML comment
+PBP_MARKERS = ('id="pbp"', 'id="div_pbp"')
+COMMENT_START = '<!--'
+COMMENT_END = '-->'
+# a comment, or a tag: (closing slash, name, attributes), with quoted attribute values allowed to hold '>'
+_TAG = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.S)
+_ATTRIBUTE = re.compile(r'([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>"\']+)))?')
+
+def find_pbp_comment(html):
+    """
+    Slices the first HTML comment holding the play-by-play table out of a boxscore page with plain substring
+    searches, instead of parsing the whole page to walk its comments
+    html: str or bytes --> boxscore page (bytes are searched as bytes and only the slice is decoded, as UTF-8)
+    Returns the comment's text, or None when the page has no play-by-play comment
+    """
+    is_bytes = isinstance(html, bytes)
+    markers = [marker.encode() for marker in PBP_MARKERS] if is_bytes else PBP_MARKERS
+    comment_start = COMMENT_START.encode() if is_bytes else COMMENT_START
+    comment_end = COMMENT_END.encode() if is_bytes else COMMENT_END
+
+    pos = 0
+    while True:
+        found = [at for at in (html.find(marker, pos) for marker in markers) if at != -1]
+        if not found:
+            return None
+        at = min(found)
+
+        # the marker is in a comment when the last comment opened before it isn't closed before it
+        start = html.rfind(comment_start, 0, at)
+        if start != -1 and html.find(comment_end, start + len(comment_start), at) == -1:
+            end = html.find(comment_end, at)
+            if end == -1:
+                return None
+            comment = html[start + len(comment_start):end]
+            return comment.decode('utf-8', errors='replace') if is_bytes else comment
+        pos = at + 1
+
+class PbpCell:
+    """A <td> of a play-by-play row, with the bits of the BeautifulSoup Tag API extract_game_data reads"""
+    __slots__ = ('attrs', 'parts')
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+        self.parts = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    def get_text(self, strip: bool = False) -> str:
+        if strip:
+            return ''.join(part.strip() for part in self.parts if part.strip())
+        return self.text
+
+    def get(self, name: str, default=None):
+        return self.attrs.get(name, default)
+
+class PbpRow:
+    """A <tr> of the play-by-play table: its attributes and its <td> cells, in page order"""
+    __slots__ = ('attrs', 'cells')
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+        self.cells = []
+
+    def get(self, name: str, default=None):
+        # class is a list of class names, like BeautifulSoup's multi-valued attribute
+        value = self.attrs.get(name)
+        if value is None:
+            return default
+        return value.split() if name == 'class' else value
+
+    def find(self, tag: str, attrs: dict = None):
+        """First cell whose attributes match attrs (only <td> cells are kept, like find('td', ...) on the Tag)"""
+        if tag != 'td':
+            raise ValueError('Only td cells are kept')
+        for cell in self.cells:
+            if not attrs or all(cell.attrs.get(name) == value for name, value in attrs.items()):
+                return cell
+        return None
+
+def read_pbp_rows(pbp_html: str) -> list:
+    """
+    Every <tr> of the play-by-play table (header rows included), like find_all('tr') on its soup
+    A single pass over the tags: only <tr> and <td> open and close rows and cells, the text between tags goes
+    to every open cell, comments are skipped and no document tree is built
+    """
+    rows = []
+    open_rows = []
+    open_cells = []
+    pos = 0
+    for token in _TAG.finditer(pbp_html):
+        if open_cells and token.start() > pos:
+            text = unescape(pbp_html[pos:token.start()])
+            for cell in open_cells:
+                cell.parts.append(text)
+        pos = token.end()
+
+        tag = token.group(2)
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if token.group(1):
+            if tag == 'tr' and open_rows:
+                open_rows.pop()
+            elif tag == 'td' and open_cells:
+                open_cells.pop()
+        elif tag == 'tr':
+            row = PbpRow(_attributes(token.group(3)))
+            rows.append(row)
+            open_rows.append(row)
+        elif tag == 'td':
+            cell = PbpCell(_attributes(token.group(3)))
+            # a cell belongs to (and its text to) every row and cell it's nested in, like a Tag's descendants
+            for row in open_rows:
+                row.cells.append(cell)
+            open_cells.append(cell)
+    return rows
+
+def _attributes(text: str) -> dict:
+    attrs = {}
+    for name, double_quoted, single_quoted, bare in _ATTRIBUTE.findall(text):
+        attrs.setdefault(name.lower(), unescape(double_quoted or single_quoted or bare))
+    return attrs
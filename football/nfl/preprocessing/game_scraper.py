@@ -4,24 +4,59 @@ import pandas as pd
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 from functions.general import get_team_from_name
-from functions.extract_game_data import extract_game_data
+from functions.extract_game_data import timed_extract_game_data, PARSER_VERSION
+from functions.http_cache import HttpCache, IMMUTABLE
+from functions.pbp_feature_cache import PbpFeatureCache, boxscore_id
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from crawlbase import CrawlingAPI
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# fetched pages are kept in the cache directory: completed seasons and boxscores (only fetched once the game
+# is final) never change, pages of the current season go stale after CURRENT_SEASON_TTL seconds
+CACHE_DIR = 'data/http_cache'
+CURRENT_SEASON_TTL = 6 * 3600
+# PBP features of every parsed boxscore, stamped with the parser version, so re-scraping a finished game
+# neither fetches nor parses its boxscore again
+FEATURE_CACHE_PATH = 'data/pbp_features.npz'
+# boxscores are parsed by a pool of worker processes while the next ones are fetched; at most
+# QUEUED_PER_WORKER fetched pages per worker wait for a parser before the fetching pauses
+PARSE_WORKERS = os.cpu_count() or 1
+QUEUED_PER_WORKER = 2
+
+def current_season():
+    """The season being played (or the last one, before August), by the year it started"""
+    if datetime.now().month >= 8:
+        return datetime.now().year
+    return datetime.now().year - 1
+
 class Scraper:
-    def __init__(self, use_crawlbase=True):
-        # Initialize Crawlbase Smart AI Proxy
-        crawlbase_token = os.getenv('CRAWLBASE_TOKEN')
-        if not crawlbase_token:
-            raise ValueError("CRAWLBASE_TOKEN environment variable is required")
-        self.crawlbase_api = CrawlingAPI({'token': crawlbase_token})
+    def __init__(self, use_crawlbase=True, crawlbase_api=None, cache_dir=CACHE_DIR, parse_workers=PARSE_WORKERS, feature_cache=FEATURE_CACHE_PATH):
+        """
+        use_crawlbase: bool --> fetch the pages through Crawlbase instead of the plain session
+        crawlbase_api: CrawlingAPI --> client to fetch through (anything with get(url) returning status_code, headers
+        and body), built from CRAWLBASE_TOKEN when not given
+        cache_dir: str --> where fetched pages are cached, None to always fetch
+        parse_workers: int --> processes parsing the boxscores (1 parses them inline)
+        feature_cache: str --> npz of the PBP features of parsed boxscores, None to always parse
+        """
+        if crawlbase_api is None:
+            # Initialize Crawlbase Smart AI Proxy
+            crawlbase_token = os.getenv('CRAWLBASE_TOKEN')
+            if not crawlbase_token:
+                raise ValueError("CRAWLBASE_TOKEN environment variable is required")
+            crawlbase_api = CrawlingAPI({'token': crawlbase_token})
+        self.crawlbase_api = crawlbase_api
 
         self.use_crawlbase = use_crawlbase
         self.session = self.get_session()
+        self.cache = HttpCache(cache_dir)
+        self.feature_cache = PbpFeatureCache(feature_cache, PARSER_VERSION)
+        # 1 parses every boxscore inline, right after it's fetched
+        self.parse_workers = max(parse_workers, 1)
         self.nflTeams = [
             'crd', 'atl', 'rav', 'buf', 'car', 'chi', 'cin', 'cle', 'dal', 'den',
             'det', 'gnb', 'htx', 'clt', 'jax', 'kan', 'rai', 'sdg', 'ram', 'mia',
@@ -49,6 +84,38 @@ class Scraper:
             'Connection': 'keep-alive',
         })
         return session
+
+    def cache_ttl(self, url):
+        """How long a cached copy of url stays fresh (IMMUTABLE for boxscores and completed seasons)"""
+        if '/boxscores/' in url:
+            return IMMUTABLE
+        season = re.search(r'/teams/\w+/(\d{4})\.htm', url)
+        if season and int(season.group(1)) < current_season():
+            return IMMUTABLE
+        return CURRENT_SEASON_TTL
+
+    def fetch(self, url):
+        """
+        Fetches url through Crawlbase (or the plain session), or answers from the page cache when it has a fresh copy
+        Only network requests are spaced out, so re-scraping cached pages costs no requests and no waiting
+        Returns (status_code, headers, body), only 200 responses are cached
+        """
+        body = self.cache.get(url, self.cache_ttl(url))
+        if body is not None:
+            return 200, {}, body
+
+        # Sleep to reduce rate limiting risk
+        time.sleep(random.uniform(3, 4))
+        if self.use_crawlbase:
+            response = self.crawlbase_api.get(url)
+            status, headers, body = response['status_code'], response.get('headers', {}), response['body']
+        else:
+            response = self.session.get(url)
+            status, headers, body = response.status_code, response.headers, response.content
+
+        if status == 200:
+            self.cache.put(url, body)
+        return status, headers, body
     
     def get_current_week(self, soup: BeautifulSoup):
         """
@@ -78,28 +145,24 @@ class Scraper:
         
         return int(current_week) if current_week else None
 
-    def get_game_data(self, team, year, look_back_weeks=None):
+    def get_game_data(self, team, year, look_back_weeks=None, pending=None):
+        """
+        Reads the season page of a team: one row per game, with the PBP features of the completed games
+        pending: list --> when given, the (game_row, boxscore_link) of the completed games are appended to it and
+        their PBP features are left for add_pbp_features, so a range of teams fetches each boxscore only once
+        """
         print(f"Scraping {team} {year}")
         url = f"https://www.pro-football-reference.com/teams/{team}/{year}.htm"
 
         try:
             print(f"Requesting URL: {url} via Crawlbase Smart AI Proxy")
 
-            response = None
-            html_content = None
-            if self.use_crawlbase:
-                # Use Crawlbase Smart AI Proxy to bypass Cloudflare
-                response = self.crawlbase_api.get(url)
-                if response['status_code'] != 200:
-                    print(f"Error scraping {team} {year}: {response['status_code']}")
-                    print(f"Response headers: {response.get('headers', {})}")
-                    return []
-                
-                # Get the HTML content from Crawlbase response
-                html_content = response['body']
-            else:
-                response = self.session.get(url)
-                html_content = response.content
+            # Use Crawlbase Smart AI Proxy to bypass Cloudflare
+            status, headers, html_content = self.fetch(url)
+            if self.use_crawlbase and status != 200:
+                print(f"Error scraping {team} {year}: {status}")
+                print(f"Response headers: {headers}")
+                return []
 
         except Exception as e:
             print(f"Crawlbase request failed for {team} {year}: {e}")
@@ -121,6 +184,7 @@ class Scraper:
         # Find all game rows - they should be in tbody and have week_num data
         game_rows = game_table.find("tbody").find_all("tr")
         games = []
+        boxscores = pending if pending is not None else []
 
         # get the current week
         current_week = None
@@ -227,63 +291,9 @@ class Scraper:
                     "turnovers_def": to_def_elem.text.strip() if to_def_elem else "",
                 }
 
-                # If completed game and we have a boxscore link, fetch PBP and compute strong drives
-                try:
-                    # Treat ties as completed as well
-                    if boxscore_link and outcome_text in ("W", "L", "T"):
-                        # Print before sleeping to verify entry; force flush to avoid buffering
-                        print(
-                            f" --> Scraping PBP for {team} vs {game_row['opponent']} {game_row['date']}",
-                            flush=True,
-                        )
-                        # Sleep to reduce rate limiting risk
-                        time.sleep(random.uniform(3, 4))
-
-                        pbp_url = f"https://www.pro-football-reference.com{boxscore_link}"
-                        print(f"Requesting PBP URL: {pbp_url} via Crawlbase Smart AI Proxy")
-                        
-                        pbp_response = None
-                        pbp_html_content = None
-                        if self.use_crawlbase:
-                            # Use Crawlbase for PBP requests as well
-                            pbp_response = self.crawlbase_api.get(pbp_url)
-                            if pbp_response is None or pbp_response['status_code'] != 200:
-                                print(f"PBP request failed with status: {pbp_response['status_code']}")
-                                continue
-                            
-                            # Get the HTML content from Crawlbase response
-                            pbp_html_content = pbp_response['body']
-                        else:
-                            pbp_response = self.session.get(pbp_url)
-                            pbp_html_content = pbp_response.content
-
-                        # Use uppercase codes internally
-                        team_upper = team.upper()
-                        opp_upper = game_row['opponent'].upper()
-
-                        # extract more granular game data
-                        features = extract_game_data(pbp_html_content, team_upper, opp_upper)
-
-                        # add team/opp prefixed features onto your game_row
-                        game_row.update({f"team_{k}": v for k, v in features.get(team_upper, {}).items()})
-                        game_row.update({f"opp_{k}": v for k, v in features.get(opp_upper, {}).items()})
-
-                        # summery of the game
-                        print(f" --> Summary of the game: {team} vs {game_row['opponent']} on {game_row['date']}")
-                        print(f" --> {team} {game_row['points']} - {game_row['opponent_points']} {game_row['opponent']}")
-
-                except requests.exceptions.RequestException as e:
-                    # Network/PBP missing - leave as 0 but surface minimal context
-                    print(
-                        f" --> PBP request failed for {team} vs {game_row['opponent']} on {game_row['date']}: {e}",
-                        flush=True,
-                    )
-                except Exception as e:
-                    # Unexpected structure - leave as 0 but surface minimal context
-                    print(
-                        f" --> PBP parse failed for {team} vs {game_row['opponent']} on {game_row['date']}: {e}",
-                        flush=True,
-                    )
+                # completed games (ties included) get their PBP features from the boxscore once every row is read
+                if boxscore_link and outcome_text in ("W", "L", "T"):
+                    boxscores.append((game_row, boxscore_link))
 
                 games.append(game_row)
 
@@ -293,8 +303,136 @@ class Scraper:
 
         # remove any games where the opponent is a bye week
         games = [game for game in games if game['opponent'] != 'bye week']
+
+        if pending is None:
+            dropped = {id(game) for game in self.add_pbp_features(boxscores)}
+            games = [game for game in games if id(game) not in dropped]
         return games
 
+    def add_pbp_features(self, pending):
+        """
+        Fetches and parses every boxscore once and adds its PBP features to all the game rows that link to it,
+        so a game scraped from both teams' pages costs one request and one extract_game_data
+        The boxscores are fetched one after the other here while a pool of parse_workers processes parses them,
+        with at most QUEUED_PER_WORKER fetched pages per worker waiting (the fetching pauses until a parser is free)
+        A boxscore whose features are in the feature cache (for the current PARSER_VERSION) is neither fetched nor parsed
+        pending: list --> (game_row, boxscore_link) of the completed games
+        Returns the game rows whose boxscore request failed (they are left out, like the per-row fetch did)
+        """
+        rows_by_link = {}
+        for game_row, boxscore_link in pending:
+            rows_by_link.setdefault(boxscore_link, []).append(game_row)
+
+        start_time = time.time()
+        dropped = []
+        timings = []
+        queued = {}
+        executor = ProcessPoolExecutor(max_workers=self.parse_workers) if self.parse_workers > 1 else None
+        try:
+            for boxscore_link, rows in rows_by_link.items():
+                # extract from the home team's side, the one extract_game_data's score tracking assumes for team
+                main_row = next((row for row in rows if row['home']), rows[0])
+                # with only the away team's page read, main_row is the away row and the features differ, so the
+                # cache only answers for the side its entry was extracted for
+                features = self.feature_cache.get(boxscore_id(boxscore_link), main_row['team'].upper())
+                if features is not None:
+                    print(f" --> {boxscore_link}: PBP features from the feature cache")
+                    self.add_features_to_rows(rows, features)
+                    continue
+
+                team_upper = main_row['team'].upper()
+                opp_upper = main_row['opponent'].upper()
+                print(
+                    f" --> Scraping PBP for {main_row['team']} vs {main_row['opponent']} {main_row['date']}",
+                    flush=True,
+                )
+
+                fetch_start = time.time()
+                try:
+                    pbp_url = f"https://www.pro-football-reference.com{boxscore_link}"
+                    print(f"Requesting PBP URL: {pbp_url} via Crawlbase Smart AI Proxy")
+
+                    # Use Crawlbase for PBP requests as well
+                    pbp_status, _, pbp_html_content = self.fetch(pbp_url)
+                except Exception as e:
+                    # Network/PBP missing - leave as 0 but surface minimal context
+                    print(
+                        f" --> PBP request failed for {main_row['team']} vs {main_row['opponent']} on {main_row['date']}: {e}",
+                        flush=True,
+                    )
+                    continue
+                if self.use_crawlbase and pbp_status != 200:
+                    print(f"PBP request failed with status: {pbp_status}")
+                    dropped.extend(rows)
+                    continue
+                game = (boxscore_link, rows, main_row, time.time() - fetch_start)
+
+                if executor is None:
+                    self.apply_pbp_features(game, lambda: timed_extract_game_data(pbp_html_content, team_upper, opp_upper), timings)
+                    continue
+
+                # back-pressure: wait for a parser before holding more fetched pages
+                while len(queued) >= self.parse_workers * QUEUED_PER_WORKER:
+                    done, _ = wait(queued, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.apply_pbp_features(queued.pop(future), future.result, timings)
+                queued[executor.submit(timed_extract_game_data, pbp_html_content, team_upper, opp_upper)] = game
+
+            for future in list(queued):
+                self.apply_pbp_features(queued.pop(future), future.result, timings)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            # keep what was parsed even when the run stops halfway
+            self.feature_cache.save()
+
+        elapsed = time.time() - start_time
+        fetch_seconds = sum(timing[0] for timing in timings)
+        parse_seconds = sum(timing[1] for timing in timings)
+        print(f'Fetched {len(rows_by_link)} boxscores for {len(pending)} completed game rows in {elapsed:.2f} seconds')
+        if timings:
+            print(
+                f'PBP timing: {fetch_seconds:.2f}s fetching, {parse_seconds:.2f}s parsing '
+                f'({parse_seconds / len(timings):.2f}s per game, {self.parse_workers} parse workers)'
+            )
+        return dropped
+
+    def apply_pbp_features(self, game, result, timings):
+        """
+        Caches the features of a parsed boxscore and adds them to its game rows (add_features_to_rows)
+        game: tuple --> (boxscore_link, game rows, row the features were extracted for, seconds spent fetching)
+        result: function --> returns (features, seconds spent parsing), raises if the parse failed
+        timings: list --> (fetch seconds, parse seconds) of every parsed boxscore, appended to
+        """
+        boxscore_link, rows, main_row, fetch_seconds = game
+        try:
+            features, parse_seconds = result()
+        except Exception as e:
+            # Unexpected structure - leave as 0 but surface minimal context
+            print(
+                f" --> PBP parse failed for {main_row['team']} vs {main_row['opponent']} on {main_row['date']}: {e}",
+                flush=True,
+            )
+            return
+        timings.append((fetch_seconds, parse_seconds))
+        print(f" --> {boxscore_link}: fetched in {fetch_seconds:.2f}s, parsed in {parse_seconds:.2f}s")
+        self.feature_cache.put(boxscore_id(boxscore_link), main_row['team'].upper(), features)
+        self.add_features_to_rows(rows, features)
+
+    def add_features_to_rows(self, rows, features):
+        """
+        Adds the PBP features of a game to its rows, each row taking its own side as team and the other as opp
+        features: dict --> {team code: {feature: value}}, as extract_game_data returns them
+        """
+        for game_row in rows:
+            # Use uppercase codes internally
+            game_row.update({f"team_{k}": v for k, v in features.get(game_row['team'].upper(), {}).items()})
+            game_row.update({f"opp_{k}": v for k, v in features.get(game_row['opponent'].upper(), {}).items()})
+
+            # summery of the game
+            print(f" --> Summary of the game: {game_row['team']} vs {game_row['opponent']} on {game_row['date']}")
+            print(f" --> {game_row['team']} {game_row['points']} - {game_row['opponent_points']} {game_row['opponent']}")
+
     def extract_game_data(self, res, team, opp):
         """
         Extract strong drive counts from the PBP page. team/opp are uppercase codes (e.g., 'BUF').
@@ -396,11 +534,9 @@ class Scraper:
 
     def scrape_nfl_data(self, start_year, end_year, look_back_weeks=None):
         all_games = []
+        pending = []
         for team in self.nflTeams:
             for year in range(start_year, end_year + 1):
-                # Add a random delay between requests
-                time.sleep(random.uniform(3, 4))
-
                 # handling NFL team relocations and name changes
                 # Most NFL teams have been stable, but handle a few cases
                 if team == 'rai':
@@ -423,14 +559,20 @@ class Scraper:
                     else:
                         team = 'sdg'  # Los Angeles Chargers (keeping same abbreviation for consistency)
 
-                stats = self.get_game_data(team, year, look_back_weeks)
+                stats = self.get_game_data(team, year, look_back_weeks, pending)
                 if not stats:
                     print(f"No stats for {team} {year}")
                     continue
 
                 all_games.extend(stats)
+
+        # each completed game's boxscore is fetched and parsed once, for both teams' rows
+        dropped = {id(game) for game in self.add_pbp_features(pending)}
+        all_games = [game for game in all_games if id(game) not in dropped]
         
         print(f'Scraped {len(all_games)} games')
+        print(f'Page cache: {self.cache.hits} hits, {self.cache.misses} misses')
+        print(f'PBP feature cache: {self.feature_cache.hits} hits, {self.feature_cache.misses} misses')
 
         # read the old scraped data
         try:
@@ -466,11 +608,7 @@ if __name__ == "__main__":
     start_time = time.time()
 
     # get the current year
-    current_year = None
-    if datetime.now().month >= 8:
-        current_year = datetime.now().year
-    else:
-        current_year = datetime.now().year - 1
+    current_year = current_season()
 
     scraper = Scraper(use_crawlbase=True)
     scraper.scrape_nfl_data(current_year, current_year, look_back_weeks=2)
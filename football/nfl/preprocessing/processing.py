@@ -1,9 +1,13 @@
 import pandas as pd
+import numpy as np
 import time
 from datetime import timedelta
 from typing import Dict, Any
 from pathlib import Path
 from functions.general import *
+from functions.date_normalization import date_normalizer, format_date
+from functions.history_store import HistoryStore
+from functions.odds_store import read_latest_odds
 import pytz
 et_tz = pytz.timezone('US/Eastern')
 utc_tz = pytz.UTC
@@ -15,9 +19,9 @@ class Preprocessor:
         self.processed_data = None
         # Process and convert dates to timezone-aware UTC format
         self._process_dates()
-        self.json_data = self.convert_to_json()
         # Pre-compute stat keys for faster lookups
         self._init_stat_keys()
+        self.history = self.build_history()
         
         self.team_dict = {
             'crd': ['Arizona Cardinals'],
@@ -96,35 +100,11 @@ class Preprocessor:
         Dates after August 1, 2025 are converted from ET to UTC,
         while earlier dates are directly localized to UTC.
         """
-        # Pre-compute date conversions and convert ET to UTC
-        self.game_data['formatted_date'] = pd.to_datetime(self.game_data.apply(
-            lambda row: self.formatDate(row['date'], row['time']), axis=1
-        ))
-
-        # Convert from ET to UTC only for dates after August 1, 2025
-        cutoff_date = pd.Timestamp('2025-08-01')  # Keep timezone-naive for comparison
-
-        # Create a new Series to hold timezone-aware datetimes
-        timezone_aware_dates = pd.Series(index=self.game_data.index, dtype='datetime64[ns, UTC]')
-        
-        # First, identify dates that need ET->UTC conversion (after cutoff)
-        et_conversion_mask = self.game_data['formatted_date'] > cutoff_date
-        
-        # Convert dates after cutoff from ET to UTC
-        timezone_aware_dates.loc[et_conversion_mask] = (
-            self.game_data.loc[et_conversion_mask, 'formatted_date']
-            .dt.tz_localize(et_tz)
-            .dt.tz_convert(utc_tz)
-        )
-        
-        # Convert dates before/equal to cutoff directly to UTC
-        pre_cutoff_mask = ~et_conversion_mask
-        timezone_aware_dates.loc[pre_cutoff_mask] = (
-            self.game_data.loc[pre_cutoff_mask, 'formatted_date'].dt.tz_localize(utc_tz)
-        )
-        
-        # Replace the original column with the timezone-aware version
-        self.game_data['formatted_date'] = timezone_aware_dates
+        # Parse each distinct date/time once and convert ET to UTC after the cutoff
+        # (the normalizer is shared, so its counters are reset to report this processor's rows only)
+        date_normalizer.reset_timings()
+        self.game_data['formatted_date'] = date_normalizer.normalize(self.game_data['date'], self.game_data['time'])
+        date_normalizer.report()
     
     def _init_stat_keys(self):
         """Pre-compute stat keys used in processing - mapped to actual NFL CSV columns"""
@@ -164,26 +144,40 @@ class Preprocessor:
         date: str in the format 1995-09-03
         time: str in the format 4:00PM ET
         """
-        try:
-            # Handle date format from CSV (YYYY-MM-DD)
-            if '-' in date and len(date.split('-')) == 3:
-                # Extract time info
-                if time and time.strip():
-                    time_part = time.split(' ')[0]
-                    if len(time_part) > 2:
-                        clock_time = time_part[:-2]
-                        ampm = time_part[-2:]
-                        return pd.to_datetime(f'{date} {clock_time} {ampm}')
-                    else:
-                        return pd.to_datetime(f'{date} 12:00 PM')
-                else:
-                    return pd.to_datetime(date)
-        except Exception as e:
-            print(f"Error parsing date {date} {time}: {e}")
-            return pd.to_datetime('1995-01-01')  # Fallback date
+        return format_date(date, time)
+
+    def _safe_float_column(self, values: pd.Series) -> pd.Series:
+        """Column-wise _safe_float: numeric columns are cast directly, anything else goes through _safe_float"""
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype(float)
+        return values.map(self._safe_float).astype(float)
+
+    def build_history(self) -> HistoryStore:
+        """
+        Packs every team's games into date-sorted NumPy arrays for getLastXGameStats:
+        one float column per base_stats key, same values _process_game_stats reads
+        """
+        print('building team history...')
+        history = self.game_data[self.game_data['formatted_date'].notna()]
+        history = history.sort_values(['team', 'formatted_date'], kind='mergesort')
+
+        stats = {'team': history['team'].to_numpy(), 'formatted_date': history['formatted_date'].reset_index(drop=True)}
+        for key in self.base_stats.keys():
+            if key in ('wins', 'losses'):
+                result = history['win'] if 'win' in history.columns else pd.Series(np.nan, index=history.index)
+                stats[key] = (result == (1 if key == 'wins' else 0)).astype(float).to_numpy()
+            elif key in history.columns:
+                stats[key] = self._safe_float_column(history[key]).to_numpy()
+            else:
+                stats[key] = np.zeros(len(history))
+
+        return HistoryStore.from_frame(pd.DataFrame(stats), list(self.base_stats.keys()))
 
     def convert_to_json(self):
-        """Convert game data to JSON format for efficient lookups - NBA style"""
+        """
+        Convert game data to JSON format - NBA style
+        No longer used for lookups (see build_history), kept for comparing against the history store
+        """
         print('converting to json...')
         json_conversion_start_time = time.time()
         
@@ -218,22 +212,16 @@ class Preprocessor:
         """
         full_stats = {f'{prefix}{k}': v for k, v in self.base_stats.items()}
 
-        if team not in self.json_data:
+        history = self.history.get(team)
+        if history is None:
             return full_stats
 
-        team_data = self.json_data[team]
-        counter = 0
-        
-        for game in team_data:
-            game_date = pd.to_datetime(game['formatted_date'])
-            if game_date >= date:
-                continue
-                
-            if counter >= x:
-                break
-                
-            self._process_game_stats(game, full_stats, prefix)
-            counter += 1
+        # the last x games strictly before the date
+        stop = history.before(date)
+        start = max(stop - x, 0)
+        counter = stop - start
+        for key, total in zip(history.keys, history.window_sums(start, stop).tolist()):
+            full_stats[f'{prefix}{key}'] += total
 
         # Average stats by number of games found
         divisor = counter if counter > 0 else 1
@@ -326,9 +314,11 @@ class Preprocessor:
         
         self.processed_data = data
 
-    def balance(self):
+    def balance(self, engine: str = 'vectorized'):
         """
         Balances the data by removing games until there is an equal number of wins and losses
+        engine: str --> 'vectorized' (group positions and NumPy arrays) or 'loop' (concat per group, then iterrows),
+        both keep the same rows
         """
         if self.processed_data is None:
             print("No processed data to balance")
@@ -337,6 +327,26 @@ class Preprocessor:
         # Create a copy of the processed data
         grouped_data = self.processed_data.copy()
 
+        if engine == 'loop':
+            balanced_data = self._balance_loop(grouped_data)
+        elif engine == 'vectorized':
+            balanced_data = self._balance_vectorized(grouped_data)
+        else:
+            raise ValueError(f"Unknown balance engine: {engine}")
+
+        # printing the number of wins and losses in the balanced data
+        print(balanced_data['result'].value_counts())
+
+        # resort the data by date in descending order
+        balanced_data = balanced_data.sort_values(by='date', ascending=False)
+        # drop all rows where the last_1_team_points or the last_1_opp_points is nan
+        balanced_data = balanced_data[balanced_data['last_1_team_points'].notna()]
+        balanced_data = balanced_data[balanced_data['last_1_opp_points'].notna()]
+
+        self.processed_data = balanced_data
+
+    def _balance_loop(self, grouped_data: pd.DataFrame) -> pd.DataFrame:
+        """Greedy balancing over rows, growing both perspective frames one groupby group at a time"""
         # Create a team_pair column where team and opp are alphabetically sorted
         grouped_data['team_pair'] = grouped_data.apply(
             lambda row: '-'.join(sorted([row['team'], row['opp']])), axis=1
@@ -384,22 +394,70 @@ class Preprocessor:
                 balanced_data.append(row)
         
         balanced_data = pd.DataFrame(balanced_data)
-        balanced_data = balanced_data.drop(columns=['team_pair'])
+        return balanced_data.drop(columns=['team_pair'])
 
-        # printing the number of wins and losses in the balanced data
-        print(balanced_data['result'].value_counts())
+    def _balance_vectorized(self, grouped_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Same selection as _balance_loop: the rows of both perspective frames are collected as positions in one
+        pass over the group numbers, the win/loss alternation runs on arrays and the rows are taken at once
+        """
+        # Create a team_pair column where team and opp are alphabetically sorted
+        grouped_data['team_pair'] = self._pair_key(grouped_data['team'], grouped_data['opp'])
 
-        # resort the data by date in descending order
-        balanced_data = balanced_data.sort_values(by='date', ascending=False)
-        # drop all rows where the last_1_team_points or the last_1_opp_points is nan
-        balanced_data = balanced_data[balanced_data['last_1_team_points'].notna()]
-        balanced_data = balanced_data[balanced_data['last_1_opp_points'].notna()]
+        # Sort by team_pair and date to group matching games together
+        grouped_data = grouped_data.sort_values(by=['team_pair', 'date'], ascending=False)
 
-        self.processed_data = balanced_data
+        # number the games in the order groupby(['team_pair', 'date']) visits them (-1 for a missing key,
+        # which groupby leaves out), then list the rows game by game, keeping their order inside each game
+        game = grouped_data.groupby(['team_pair', 'date'], sort=True).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        positions = np.flatnonzero(game >= 0)
+        positions = positions[np.argsort(game[positions], kind='stable')]
+        game = game[positions]
+
+        # the second row of a two-row game goes to the second frame, every other row to the first
+        first_of_game = np.ones(len(game), dtype=bool)
+        first_of_game[1:] = game[1:] != game[:-1]
+        second = (np.bincount(game)[game] == 2) & ~first_of_game if len(game) else first_of_game
+        dataframe_one = positions[~second]
+        dataframe_two = positions[second]
+
+        # a row counted as a win or a loss adds to wins while wins <= losses and to losses otherwise, whichever
+        # side it picks, so the counts alternate: the k-th counted row is picked toward a win when k is even
+        results = grouped_data['result'].to_numpy()[dataframe_one]
+        win = results == 1
+        loss = results == 0
+        counted = win | loss
+        want_win = (np.cumsum(counted) - counted) % 2 == 0
+
+        # the row at the same position of the second frame stands in for a row on the wrong side (and nothing
+        # does when the second frame is shorter); rows that aren't a win or a loss are kept as they are
+        partner = np.full(len(dataframe_one), -1, dtype=np.int64)
+        partner[:len(dataframe_two)] = dataframe_two
+        selected = np.where(counted & (win != want_win), partner, dataframe_one)
+        kept = selected >= 0
+
+        balanced_data = grouped_data.take(selected[kept])
+        # rows are labelled by their position in the first frame, like the rows iterrows hands out
+        balanced_data.index = np.flatnonzero(kept)
+        return balanced_data.drop(columns=['team_pair'])
+
+    def _pair_key(self, first: pd.Series, second: pd.Series, sep: str = '-') -> pd.Series:
+        """
+        Order-independent key for two team columns, e.g. 'buf-mia' for both (buf, mia) and (mia, buf).
+        Rows where either team is missing get NaN
+        """
+        valid = first.notna() & second.notna()
+        first = first[valid].astype(str)
+        second = second[valid].astype(str)
+        in_order = first <= second
+
+        key = pd.Series(np.nan, index=valid.index, dtype=object)
+        key[valid] = first.where(in_order, second) + sep + second.where(in_order, first)
+        return key
     
     def add_moneyline_odds(self):
         # adding the odds to the processed data
-        odds_data = pd.read_csv('data/nfl_odds.csv')
+        odds_data = read_latest_odds('data', 'nfl_odds')
 
         # remove any rows where the market_name is not Moneyline
         odds_data = odds_data[odds_data['market_name'] == 'Moneyline']
@@ -459,7 +517,7 @@ class Preprocessor:
         processed_data = self.add_moneyline_odds()
 
         # adding the odds to the processed data
-        odds_data = pd.read_csv('data/nfl_odds.csv')
+        odds_data = read_latest_odds('data', 'nfl_odds')
 
         # remove any rows where the market_name is not Spread
         odds_data = odds_data[odds_data['market_name'] == 'Spread']
@@ -537,7 +595,7 @@ class Preprocessor:
         processed_data = self.add_moneyline_odds()
 
         # adding the odds to the processed data
-        odds_data = pd.read_csv('data/nfl_odds.csv')
+        odds_data = read_latest_odds('data', 'nfl_odds')
 
         # remove any rows where the market_name is not Spread
         odds_data = odds_data[odds_data['market_name'] == 'Total']
@@ -0,0 +1,65 @@
+import numpy as np
+from functions.pbp_feature_cache import PbpFeatureCache
+from test_nfl_pbp_features import BOXSCORE_LINK, FakeCrawlingAPI, game_rows, no_waiting
+from game_scraper import Scraper
+
+FEATURES = {'BUF': {'total_plays': 7, 'epa_sum': -0.89}, 'KAN': {'total_plays': 3, 'epa_sum': 6.1}}
+
+def test_entries_round_trip_through_the_npz(tmp_path):
+    cache = PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=1)
+    features = {
+        'BUF': {'total_plays': np.int64(7), 'epa_sum': np.float64(-0.89), 'led': np.bool_(True), 'avg_start_pos': None},
+        'KAN': {'total_plays': 3, 'epa_sum': 6.1, 'led': False},
+    }
+    assert cache.put('202411170buf', 'BUF', features)
+    cache.save()
+
+    cached = PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=1).get('202411170buf', 'BUF')
+    assert cached == {
+        'BUF': {'total_plays': 7, 'epa_sum': -0.89, 'led': 1, 'avg_start_pos': None},
+        'KAN': {'total_plays': 3, 'epa_sum': 6.1, 'led': 0},
+    }
+    assert type(cached['BUF']['total_plays']) is int and type(cached['BUF']['epa_sum']) is float
+
+def test_entries_only_answer_for_their_side_and_parser_version(tmp_path):
+    cache = PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=1)
+    cache.put('202411170buf', 'BUF', FEATURES)
+    cache.save()
+
+    reread = PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=1)
+    assert reread.get('202411170buf', 'KAN') is None
+    assert reread.get('202411170buf', 'BUF') == FEATURES
+    assert PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=2).get('202411170buf', 'BUF') is None
+
+def test_values_that_cant_be_stored_are_reported_and_not_cached(tmp_path, capsys):
+    cache = PbpFeatureCache(tmp_path / 'pbp_features.npz', parser_version=1)
+
+    assert not cache.put('202411170buf', 'BUF', {'BUF': {'drives': [1, 2]}, 'KAN': {}})
+    assert 'Not caching the PBP features of 202411170buf: list value' in capsys.readouterr().out
+    assert len(cache) == 0
+
+def test_a_cache_without_sides_is_started_over(tmp_path):
+    path = tmp_path / 'pbp_features.npz'
+    np.savez_compressed(path, boxscore_ids=np.array(['202411170buf']), versions=np.array([1]), teams=np.array(['BUF']),
+                        features=np.array(['total_plays']), values=np.array([[7.0]]), kinds=np.array([[2]], dtype=np.int8))
+    assert len(PbpFeatureCache(path, parser_version=1)) == 0
+
+def test_boxscore_first_parsed_from_the_away_page_is_parsed_again_for_the_home_side(tmp_path, no_waiting):
+    path = tmp_path / 'pbp_features.npz'
+    api = FakeCrawlingAPI([200, 200])
+    scraper = lambda: Scraper(crawlbase_api=api, cache_dir=None, parse_workers=1, feature_cache=path)
+
+    # only Kansas City's page was read: the away row is the one parsed for
+    away_only, _ = game_rows()
+    scraper().add_pbp_features([(away_only, BOXSCORE_LINK)])
+    assert len(api.calls) == 1
+
+    away, home = game_rows()
+    scraper().add_pbp_features([(away, BOXSCORE_LINK), (home, BOXSCORE_LINK)])
+    assert len(api.calls) == 2
+
+    # the home side is cached now, the same rows come out without a request
+    cached_away, cached_home = game_rows()
+    scraper().add_pbp_features([(cached_away, BOXSCORE_LINK), (cached_home, BOXSCORE_LINK)])
+    assert len(api.calls) == 2
+    assert cached_home == home and cached_away == away
@@ -0,0 +1,93 @@
+from pathlib import Path
+import pytest
+import game_scraper
+from game_scraper import Scraper
+from functions.extract_game_data import extract_game_data
+
+BOXSCORE_LINK = '/boxscores/202411170buf.htm'
+# a Kansas City at Buffalo boxscore page in Pro-Football-Reference's layout, cut down to a dozen plays
+BOXSCORE = (Path(__file__).parent / 'data' / '202411170buf.htm').read_bytes()
+
+class FakeCrawlingAPI:
+    """
+    Stands in for crawlbase.CrawlingAPI: answers every get(url) with the next outcome of a script
+    outcomes: list --> statuses (200 answers with the saved boxscore) or exceptions to raise
+    """
+    def __init__(self, outcomes: list):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def get(self, url):
+        self.calls.append(url)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {'status_code': outcome, 'headers': {}, 'body': BOXSCORE if outcome == 200 else b''}
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    # fetch sleeps 3-4 seconds before every request
+    monkeypatch.setattr(game_scraper.time, 'sleep', lambda seconds: None)
+
+def game_rows() -> list:
+    """Both teams' rows of the game, as get_game_data builds them from each team's season page"""
+    home = {'team': 'buf', 'opponent': 'kan', 'home': True, 'date': '2024-11-17', 'points': 30, 'opponent_points': 21}
+    away = {'team': 'kan', 'opponent': 'buf', 'home': False, 'date': '2024-11-17', 'points': 21, 'opponent_points': 30}
+    return [away, home]
+
+def scraper(api: FakeCrawlingAPI, parse_workers: int = 1) -> Scraper:
+    return Scraper(crawlbase_api=api, cache_dir=None, parse_workers=parse_workers, feature_cache=None)
+
+@pytest.mark.parametrize('parse_workers', [1, 2])
+def test_one_boxscore_fetch_fans_out_to_both_rows(parse_workers):
+    api = FakeCrawlingAPI([200])
+    away, home = game_rows()
+
+    dropped = scraper(api, parse_workers).add_pbp_features([(away, BOXSCORE_LINK), (home, BOXSCORE_LINK)])
+
+    assert dropped == []
+    assert api.calls == [f'https://www.pro-football-reference.com{BOXSCORE_LINK}']
+    # parsed once, from the home team's side, each row taking its own side as team
+    features = extract_game_data(BOXSCORE, 'BUF', 'KAN')
+    assert home['team_total_plays'] == features['BUF']['total_plays'] == away['opp_total_plays']
+    assert away['team_total_plays'] == features['KAN']['total_plays'] == home['opp_total_plays']
+    assert home['team_epa_sum'] == features['BUF']['epa_sum']
+
+def test_rows_of_a_boxscore_that_answers_with_an_error_status_are_dropped():
+    api = FakeCrawlingAPI([503])
+    away, home = game_rows()
+
+    dropped = scraper(api).add_pbp_features([(away, BOXSCORE_LINK), (home, BOXSCORE_LINK)])
+
+    assert dropped == [away, home]
+    assert len(api.calls) == 1
+
+def test_rows_of_a_boxscore_whose_request_raises_are_kept_without_features():
+    api = FakeCrawlingAPI([ConnectionError('proxy unreachable')])
+    away, home = game_rows()
+
+    dropped = scraper(api).add_pbp_features([(away, BOXSCORE_LINK), (home, BOXSCORE_LINK)])
+
+    assert dropped == []
+    assert not any(key.startswith(('team_', 'opp_')) for row in (away, home) for key in row)
+
+def test_every_boxscore_is_fetched_once():
+    api = FakeCrawlingAPI([200, 503])
+    away, home = game_rows()
+    other = {**home, 'date': '2024-12-01'}
+
+    dropped = scraper(api).add_pbp_features([
+        (away, BOXSCORE_LINK), (home, BOXSCORE_LINK), (other, '/boxscores/202412010buf.htm'),
+    ])
+
+    assert len(api.calls) == 2
+    assert dropped == [other]
+
+@pytest.mark.parametrize('team, opp', [('BUF', 'KAN'), ('KAN', 'BUF')])
+def test_sliced_engine_matches_the_soup_engine(team, opp):
+    sliced = extract_game_data(BOXSCORE, team, opp, engine='sliced')
+
+    assert sliced[team] and sliced[opp]
+    assert sliced == extract_game_data(BOXSCORE, team, opp, engine='soup')
+    # the page as text reads the same as its bytes
+    assert extract_game_data(BOXSCORE.decode(), team, opp, engine='sliced') == sliced
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from processing import Preprocessor
+
+TEAMS = ['buf', 'kan', 'mia', 'nyj', 'phi', 'dal']
+STATS = ['first_downs_off', 'total_yards_off', 'pass_yards_off', 'rush_yards_off', 'turnovers_off']
+
+def synthetic_games(seed: int = 7) -> pd.DataFrame:
+    """A small nfl_games.csv: every week the six teams play three games, both perspectives, over two seasons"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in (2022, 2023):
+        for week in range(1, 11):
+            date = (pd.Timestamp(f'{season}-09-11') + pd.Timedelta(weeks=week - 1)).strftime('%Y-%m-%d')
+            order = rng.permutation(TEAMS)
+            for team, opponent in zip(order[::2], order[1::2]):
+                points, opponent_points = (int(value) for value in rng.integers(3, 42, 2))
+                stats = {stat: float(rng.integers(0, 400)) for stat in STATS}
+                opponent_stats = {stat: float(rng.integers(0, 400)) for stat in STATS}
+                for row_team, row_opponent, home, pts, opp_pts, own, other in (
+                    (team, opponent, 1, points, opponent_points, stats, opponent_stats),
+                    (opponent, team, 0, opponent_points, points, opponent_stats, stats),
+                ):
+                    rows.append({
+                        'team': row_team,
+                        'date': date,
+                        'time': '1:00PM ET',
+                        'week': week,
+                        'opponent': row_opponent,
+                        'home': home,
+                        'win': int(pts > opp_pts),
+                        'points': pts,
+                        'opponent_points': opp_pts,
+                        **own,
+                        **{stat.replace('_off', '_def'): value for stat, value in other.items()},
+                    })
+    return pd.DataFrame(rows)
+
+def processed() -> pd.DataFrame:
+    preprocessor = Preprocessor(synthetic_games())
+    preprocessor.preprocess()
+    return preprocessor.processed_data
+
+def unevenly_paired(data: pd.DataFrame) -> pd.DataFrame:
+    """The processed rows with a game left with one perspective, a game with a third row and a few missing results"""
+    data = data.reset_index(drop=True)
+    first_game = data[(data['date'] == data['date'].iloc[0]) & data['opp'].eq(data['team'].iloc[0])].index
+    data = data.drop(index=first_game)
+    # a repeated row, so its game has three
+    data = pd.concat([data, data.iloc[[10]]], ignore_index=True)
+    data.loc[data.index[::7], 'result'] = np.nan
+    return data
+
+def balanced(data: pd.DataFrame, engine: str) -> pd.DataFrame:
+    preprocessor = Preprocessor(synthetic_games())
+    preprocessor.processed_data = data.copy()
+    preprocessor.balance(engine=engine)
+    return preprocessor.processed_data
+
+@pytest.mark.parametrize('uneven', [False, True])
+def test_vectorized_balance_matches_loop_balance(uneven):
+    data = processed()
+    if uneven:
+        data = unevenly_paired(data)
+
+    loop_data = balanced(data, 'loop')
+    assert len(loop_data) > 0
+    pd.testing.assert_frame_equal(balanced(data, 'vectorized'), loop_data, check_exact=True)
@@ -2,11 +2,15 @@ import requests
 import time
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import json
 import csv
-from datetime import datetime, timezone
 import pandas as pd
 import os
+from functions.initial_state import read_initial_state
+from functions.two_way_markets import pivot_two_way_markets
+from functions.odds_store import open_odds_store
+
+# eventSubcategory of the moneyline, spread, and total markets in the markets API
+SUBCATEGORY_ID = '13025'
 
 def create_session():
     """Create a session with retry strategy and browser-like headers"""
@@ -121,10 +125,8 @@ def fetch_fight_links(session):
     # Get the current event group ids for tennis
     response = session.get('https://sportsbook.draftkings.com/leagues/mma/ufc', timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    fights = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    fights += '"helpPage": {"content": ""}}'
-    fights = json.loads(fights)
+    # Extract the UFC events from the variable window.__INITIAL_STATE__
+    fights = read_initial_state(response.text, [('eventGroups', '9034', 'events')])
 
     # Extract the event links
     fight_links = []
@@ -145,22 +147,26 @@ def fetch_fight_links(session):
     
     return fight_links
 
-def fetch_fight_data(session, fight_link):
-    """Fetch UFC fight data"""
-    
-    # Get the current event group ids for tennis
+def fetch_fight_data_page(session, fight_link):
+    """Fetch UFC fight data from the event page's window.__INITIAL_STATE__"""
     url = f"https://sportsbook.draftkings.com/event/{fight_link['urlName']}/{fight_link['eventId']}"
     response = session.get(url, timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    fights = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    fights += '"helpPage": {"content": ""}}'
-    fights = json.loads(fights)
+    # Extract only the markets and selections from the variable window.__INITIAL_STATE__
+    events = read_initial_state(response.text, [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')])
+
+    return extract_fight_data(fight_link, events['stadiumEventData']['markets'], events['stadiumEventData']['selections'])
+
+def fetch_fight_data_api(session, fight_link):
+    """Fetch UFC fight data from the eventSubcategory markets API (moneyline, spread, and total markets only)"""
+    url = f"https://sportsbook-nash.draftkings.com/sites/US-NY-SB/api/sportscontent/controldata/event/eventSubcategory/v1/markets?isBatchable=false&templateVars={fight_link.get('eventId')}&marketsQuery=%24filter%3DeventId%20eq%20%27{fight_link.get('eventId')}%27%20AND%20clientMetadata%2FsubCategoryId%20eq%20%27{SUBCATEGORY_ID}%27%20AND%20tags%2Fall%28t%3A%20t%20ne%20%27SportcastBetBuilder%27%29&include=MarketSplits&entity=markets"
+    response = session.get(url, timeout=30)
+    events = response.json()
 
-    # Cross reference the marketIds from the markets data with the marketIds from the selections data
-    markets = fights['stadiumEventData']['markets']
-    selections = fights['stadiumEventData']['selections']
+    return extract_fight_data(fight_link, events['markets'], events['selections'])
 
+def extract_fight_data(fight_link, markets, selections):
+    """Builds one data point per selection, cross referencing the marketIds from the markets data with the marketIds from the selections data"""
     # Create a lookup for markets by ID
     markets_by_id = {market['id']: market for market in markets}
 
@@ -200,14 +206,32 @@ def fetch_fight_data(session, fight_link):
                 **participant_data
             }
             extracted_data.append(data_point)
-    
+
     return extracted_data
 
-def convert_odds_to_american(odds):
-    if odds >= 2:
-        return int((odds - 1) * 100)
-    else:
-        return int(-100 / (odds - 1))
+# sources of fight data in priority order: the event page has every market, the markets API is only
+# tried for the fights the page failed on
+FIGHT_DATA_STRATEGIES = [
+    ('event page', fetch_fight_data_page),
+    ('markets api', fetch_fight_data_api),
+]
+
+def fetch_fight_data(session, fight_link, strategies=FIGHT_DATA_STRATEGIES):
+    """
+    Fetch UFC fight data, trying each strategy in order until one returns data points
+    strategies: list --> (name, fetch(session, fight_link)) pairs
+    """
+    for name, fetch in strategies:
+        try:
+            extracted_data = fetch(session, fight_link)
+        except Exception as e:
+            print(f"Error fetching fight data for {fight_link['name']} from the {name}: {str(e)}")
+            continue
+        if extracted_data:
+            return extracted_data
+        print(f"No fight data found for {fight_link['name']} from the {name}")
+
+    return []
 
 def format_and_save_data(all_event_data):
     """Format and save the data to a CSV file"""
@@ -224,75 +248,25 @@ def format_and_save_data(all_event_data):
     # Create a DataFrame from the newly scraped data
     df_new = pd.DataFrame(flat_data)
     
-    # Identify markets with exactly two outcomes
-    market_counts = df_new['market_id'].value_counts()
-    two_outcome_markets = market_counts[market_counts == 2].index
-    two_way_df = df_new[df_new['market_id'].isin(two_outcome_markets)].copy()
-
-    processed_data = []
-    if not two_way_df.empty:
-        # Group by market_id and pivot the player data
-        for market_id, group in two_way_df.groupby('market_id'):
-            p1 = group.iloc[0]
-            p2 = group.iloc[1]
-            
-            processed_data.append({
-                'scraped_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
-                'market_id': market_id,
-                'tournament_name': p1['tournament_name'],
-                'event_name': p1['event_name'],
-                'start_date': p1['start_date'],
-                'market_name': p1['market_name'],
-                'player1_name': p1['label'],
-                'player1_odds': p1['true_odds'],
-                'player1_american_odds': convert_odds_to_american(p1['true_odds']),
-                'player1_points': p1['points'],
-                'player1_outcome_type': p1['outcome_type'],
-                'player1_label': p1['label'],
-                'player2_name': p2['label'],
-                'player2_odds': p2['true_odds'],
-                'player2_american_odds': convert_odds_to_american(p2['true_odds']),
-                'player2_points': p2['points'],
-                'player2_outcome_type': p2['outcome_type'],
-                'player2_label': p2['label']
-            })
-        
-        df_new_processed = pd.DataFrame(processed_data)
-    else:
+    # Pair up the two outcomes of every market with exactly two outcomes
+    df_new_processed = pivot_two_way_markets(df_new, american_columns=True, scraped_at_first=True)
+    if df_new_processed.empty:
+        # the pivot has no columns then, and the upcoming odds and the odds history are left as they are
         print("No new two-way markets found to process.")
-        df_new_processed = pd.DataFrame()
+        return
 
-    # Define the path to the data directory and the CSV file
+    # Define the path to the data directory
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-    csv_path = os.path.join(data_dir, 'ufc_odds.csv')
 
     # write the df_new_processed to the upcoming_ufc_odds.csv file
     df_new_processed.to_csv('data/upcoming_ufc_odds.csv', index=False)
 
-    # Load existing data
-    if os.path.exists(csv_path):
-        try:
-            df_existing = pd.read_csv(csv_path)
-        except pd.errors.EmptyDataError:
-            df_existing = pd.DataFrame()
-    else:
-        df_existing = pd.DataFrame()
-
-    # Merge new data with existing data
-    if not df_new_processed.empty:
-        df_combined = pd.concat([df_existing, df_new_processed], ignore_index=True)
-        df_combined.drop_duplicates(subset=['market_id'], keep='last', inplace=True)
-    else:
-        df_combined = df_existing
-
-    # order the dataframe by start_date
-    df_combined = df_combined.sort_values(by='start_date', ascending=False)
-
-    # Save the combined data
-    df_combined.to_csv(csv_path, index=False)
-    print(f"Successfully saved and merged data to {csv_path}")
+    # Append the new markets and the moved lines to the odds history (data/ufc_odds/)
+    store = open_odds_store(data_dir, 'ufc_odds')
+    appended = store.append(df_new_processed)
+    print(f"Successfully saved {appended} new or moved lines to {store.directory}")
 
 def main():
     """Main function to run the script"""
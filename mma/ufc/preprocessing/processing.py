@@ -1,6 +1,7 @@
 import pandas as pd
 import json
 from functions.general import condense_features
+from functions.odds_store import read_latest_odds
 from datetime import timedelta
 
 class Preprocessor:
@@ -988,7 +989,7 @@ class Preprocessor:
 
     def add_moneyline_odds_to_training_data(self, training_data):
         # open the ufc_odds file
-        ufc_odds = pd.read_csv('data/ufc_odds.csv')
+        ufc_odds = read_latest_odds('data', 'ufc_odds')
 
         for index, row in training_data.iterrows():
             # find the row in odds_data where the player and opponent are the same as the row in processed_data
@@ -2,11 +2,15 @@ import requests
 import time
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import json
 import csv
-from datetime import datetime, timezone
 import pandas as pd
 import os
+from functions.initial_state import read_initial_state
+from functions.two_way_markets import pivot_two_way_markets
+from functions.odds_store import open_odds_store
+
+# eventSubcategory of the moneyline, spread, and total markets in the markets API
+SUBCATEGORY_ID = '6364'
 
 def create_session():
     """Create a session with retry strategy and browser-like headers"""
@@ -65,10 +69,8 @@ def fetch_tournament_links(session):
     # Get the current event group ids for tennis
     response = session.get('https://sportsbook.draftkings.com/sports/tennis', timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    tournaments = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    tournaments += '"helpPage": {"content": ""}}'
-    tournaments = json.loads(tournaments)
+    # Extract the sports list from the variable window.__INITIAL_STATE__
+    tournaments = read_initial_state(response.text, [('sports', 'data')])
     
     # Extract the tournament links
     tournament_links = []
@@ -119,10 +121,8 @@ def fetch_event_links(session, tournament_link):
     # Get the current event group ids for tennis
     response = session.get(tournament_url, timeout=30)
 
-    # Extract the variable window.__INITIAL_STATE__
-    events = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-    events += '"helpPage": {"content": ""}}'
-    events = json.loads(events)
+    # Extract the tournament's events from the variable window.__INITIAL_STATE__
+    events = read_initial_state(response.text, [('eventGroups', str(tournament_link['eventGroupId']), 'events')])
 
     # Extract the event links
     event_links = []
@@ -143,67 +143,91 @@ def fetch_event_links(session, tournament_link):
     
     return event_links
 
-def fetch_event_data(session, event_link):
-    """Fetch tennis ATP event data"""
+def fetch_event_data_page(session, event_link):
+    """Fetch tennis ATP event data from the event page's window.__INITIAL_STATE__"""
+    url = f"https://sportsbook.draftkings.com/event/{event_link['urlName']}/{event_link['eventId']}"
+    response = session.get(url, timeout=30)
 
-    try:
-        # Get the current event group ids for tennis
-        url = f"https://sportsbook.draftkings.com/event/{event_link['urlName']}/{event_link['eventId']}"
-        response = session.get(url, timeout=30)
-
-        # Extract the variable window.__INITIAL_STATE__
-        events = response.text.split('window.__INITIAL_STATE__ = ')[1].split('"helpPage":')[0]
-        events += '"helpPage": {"content": ""}}'
-        events = json.loads(events)
-        
-        # Cross reference the marketIds from the markets data with the marketIds from the selections data
-        markets = events['stadiumEventData']['markets']
-        selections = events['stadiumEventData']['selections']
-
-        # Create a lookup for markets by ID
-        markets_by_id = {market['id']: market for market in markets}
-
-        extracted_data = []
-        for selection in selections:
-            market_id = selection.get('marketId')
-            market = markets_by_id.get(market_id)
-
-            participant_data = {}
-            if selection.get('participants'):
-                for i in range(len(selection.get('participants'))):
-                    try:
-                        participant_data[f'participants-name-{i}'] = selection.get('participants')[i]['name']
-                    except:
-                        print(f"No participant names found for market {market_id}")
-                    try:
-                        participant_data[f'participants-type-{i}'] = selection.get('participants')[i]['type']
-                    except:
-                        print(f"No participant types found for market {market_id}")
-                    try:
-                        participant_data[f'participants-venueRole-{i}'] = selection.get('participants')[i]['venueRole']
-                    except:
-                        print(f"No participant venue roles found for market {market_id}")
-
-            if market:
-                data_point = {
-                    'market_id': market.get('id'),
-                    'tournament_name': event_link.get('eventGroupName'),
-                    'event_name': event_link.get('name'),
-                    'start_date': event_link.get('startDate'),
-                    'event_year': event_link.get('startDate').split('-')[0],
-                    'market_name': market.get('name'),
-                    'true_odds': selection.get('trueOdds'),
-                    'label': selection.get('label'),
-                    'outcome_type': selection.get('outcomeType'),
-                    'points': selection.get('points'),
-                    **participant_data
-                }
-                extracted_data.append(data_point)
-        
-        return extracted_data
-    except Exception as e:
-        print(f"Error fetching event data for {event_link['name']}: {str(e)}")
-        return []
+    # Extract only the markets and selections from the variable window.__INITIAL_STATE__
+    events = read_initial_state(response.text, [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')])
+
+    return extract_event_data(event_link, events['stadiumEventData']['markets'], events['stadiumEventData']['selections'])
+
+def fetch_event_data_api(session, event_link):
+    """Fetch tennis ATP event data from the eventSubcategory markets API (moneyline, spread, and total markets only)"""
+    url = f"https://sportsbook-nash.draftkings.com/sites/US-NY-SB/api/sportscontent/controldata/event/eventSubcategory/v1/markets?isBatchable=false&templateVars={event_link.get('eventId')}&marketsQuery=%24filter%3DeventId%20eq%20%27{event_link.get('eventId')}%27%20AND%20clientMetadata%2FsubCategoryId%20eq%20%27{SUBCATEGORY_ID}%27%20AND%20tags%2Fall%28t%3A%20t%20ne%20%27SportcastBetBuilder%27%29&include=MarketSplits&entity=markets"
+    response = session.get(url, timeout=30)
+    events = response.json()
+
+    return extract_event_data(event_link, events['markets'], events['selections'])
+
+def extract_event_data(event_link, markets, selections):
+    """Builds one data point per selection, cross referencing the marketIds from the markets data with the marketIds from the selections data"""
+    # Create a lookup for markets by ID
+    markets_by_id = {market['id']: market for market in markets}
+
+    extracted_data = []
+    for selection in selections:
+        market_id = selection.get('marketId')
+        market = markets_by_id.get(market_id)
+
+        participant_data = {}
+        if selection.get('participants'):
+            for i in range(len(selection.get('participants'))):
+                try:
+                    participant_data[f'participants-name-{i}'] = selection.get('participants')[i]['name']
+                except:
+                    print(f"No participant names found for market {market_id}")
+                try:
+                    participant_data[f'participants-type-{i}'] = selection.get('participants')[i]['type']
+                except:
+                    print(f"No participant types found for market {market_id}")
+                try:
+                    participant_data[f'participants-venueRole-{i}'] = selection.get('participants')[i]['venueRole']
+                except:
+                    print(f"No participant venue roles found for market {market_id}")
+
+        if market:
+            data_point = {
+                'market_id': market.get('id'),
+                'tournament_name': event_link.get('eventGroupName'),
+                'event_name': event_link.get('name'),
+                'start_date': event_link.get('startDate'),
+                'event_year': event_link.get('startDate').split('-')[0],
+                'market_name': market.get('name'),
+                'true_odds': selection.get('trueOdds'),
+                'label': selection.get('label'),
+                'outcome_type': selection.get('outcomeType'),
+                'points': selection.get('points'),
+                **participant_data
+            }
+            extracted_data.append(data_point)
+
+    return extracted_data
+
+# sources of event data in priority order: the event page has every market, the markets API is only
+# tried for the events the page failed on
+EVENT_DATA_STRATEGIES = [
+    ('event page', fetch_event_data_page),
+    ('markets api', fetch_event_data_api),
+]
+
+def fetch_event_data(session, event_link, strategies=EVENT_DATA_STRATEGIES):
+    """
+    Fetch tennis ATP event data, trying each strategy in order until one returns data points
+    strategies: list --> (name, fetch(session, event_link)) pairs
+    """
+    for name, fetch in strategies:
+        try:
+            extracted_data = fetch(session, event_link)
+        except Exception as e:
+            print(f"Error fetching event data for {event_link['name']} from the {name}: {str(e)}")
+            continue
+        if extracted_data:
+            return extracted_data
+        print(f"No event data found for {event_link['name']} from the {name}")
+
+    return []
 
 def format_and_save_data(all_event_data):
     """Format and save the data to a CSV file"""
@@ -220,71 +244,25 @@ def format_and_save_data(all_event_data):
     # Create a DataFrame from the newly scraped data
     df_new = pd.DataFrame(flat_data)
     
-    # Identify markets with exactly two outcomes
-    market_counts = df_new['market_id'].value_counts()
-    two_outcome_markets = market_counts[market_counts == 2].index
-    two_way_df = df_new[df_new['market_id'].isin(two_outcome_markets)].copy()
-
-    processed_data = []
-    if not two_way_df.empty:
-        # Group by market_id and pivot the player data
-        for market_id, group in two_way_df.groupby('market_id'):
-            p1 = group.iloc[0]
-            p2 = group.iloc[1]
-            
-            processed_data.append({
-                # add the scraped_at timestamp to the data and ensure its in UTC
-                'scraped_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
-                'market_id': market_id,
-                'tournament_name': p1['tournament_name'],
-                'event_name': p1['event_name'],
-                'start_date': p1['start_date'],
-                'market_name': p1['market_name'],
-                'player1_name': p1['label'],
-                'player1_odds': p1['true_odds'],
-                'player1_points': p1['points'],
-                'player1_outcome_type': p1['outcome_type'],
-                'player1_label': p1['label'],
-                'player2_name': p2['label'],
-                'player2_odds': p2['true_odds'],
-                'player2_points': p2['points'],
-                'player2_outcome_type': p2['outcome_type'],
-                'player2_label': p2['label']
-            })
-        
-        df_new_processed = pd.DataFrame(processed_data)
-    else:
+    # Pair up the two outcomes of every market with exactly two outcomes
+    df_new_processed = pivot_two_way_markets(df_new, scraped_at_first=True)
+    if df_new_processed.empty:
+        # the pivot has no columns then, and the upcoming odds and the odds history are left as they are
         print("No new two-way markets found to process.")
-        df_new_processed = pd.DataFrame()
+        return
 
-    # Define the path to the data directory and the CSV file
+    # Define the path to the data directory
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-    csv_path = os.path.join(data_dir, 'tennis_odds.csv')
 
     # write the df_new_processed to the upcoming_tennis_odds.csv file
     df_new_processed.to_csv('data/upcoming_tennis_odds.csv', index=False)
 
-    # Load existing data
-    if os.path.exists(csv_path):
-        try:
-            df_existing = pd.read_csv(csv_path)
-        except pd.errors.EmptyDataError:
-            df_existing = pd.DataFrame()
-    else:
-        df_existing = pd.DataFrame()
-
-    # Merge new data with existing data
-    if not df_new_processed.empty:
-        df_combined = pd.concat([df_existing, df_new_processed], ignore_index=True)
-        df_combined.drop_duplicates(subset=['market_id'], keep='last', inplace=True)
-    else:
-        df_combined = df_existing
-
-    # Save the combined data
-    df_combined.to_csv(csv_path, index=False)
-    print(f"Successfully saved and merged data to {csv_path}")
+    # Append the new markets and the moved lines to the odds history (data/tennis_odds/)
+    store = open_odds_store(data_dir, 'tennis_odds')
+    appended = store.append(df_new_processed)
+    print(f"Successfully saved {appended} new or moved lines to {store.directory}")
 
 def main():
     """Main function to run the script"""
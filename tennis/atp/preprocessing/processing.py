@@ -2,6 +2,7 @@ import pandas as pd
 import sys
 import time
 import math
+from functions.odds_store import read_latest_odds
 
 class Processor:
     def __init__(self, data):
@@ -564,7 +565,7 @@ def add_moneyline_odds_to_processed_data(processed_data, upcoming=True):
     if upcoming:
         odds_data = pd.read_csv('data/upcoming_tennis_odds.csv')
     else:
-        odds_data = pd.read_csv('data/tennis_odds.csv')
+        odds_data = read_latest_odds('data', 'tennis_odds')
     
     # remove any rows where the market_name is not Moneyline
     odds_data = odds_data[odds_data['market_name'] == 'Moneyline']
@@ -661,7 +662,7 @@ def add_total_games_odds_to_processed_data(processed_data, upcoming=True):
     if upcoming:
         tennis_odds = pd.read_csv('data/upcoming_tennis_odds.csv')
     else:
-        tennis_odds = pd.read_csv('data/tennis_odds.csv')
+        tennis_odds = read_latest_odds('data', 'tennis_odds')
 
     # remove any rows where the market_name is not Total Games
     tennis_odds = tennis_odds[tennis_odds['market_name'].str.contains('Player Total Games Won', na=False)]
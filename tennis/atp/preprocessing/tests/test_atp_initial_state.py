@@ -0,0 +1,59 @@
+import json
+import pytest
+from functions import initial_state
+from functions.initial_state import read_full_initial_state, read_initial_state
+
+PATHS = [('stadiumEventData', 'markets'), ('stadiumEventData', 'selections')]
+STATE = {
+    # siblings full of brackets and quotes inside strings, nested arrays and every kind of scalar
+    'config': {'title': 'odds "}{][" \\ {', 'nested': [1, [2, {'x': ']'}], [], {}], 'empty': ''},
+    'flag': True,
+    'rate': -1.5e3,
+    'nothing': None,
+    'stadiumEventData': {
+        'event': {'name': 'Jannik Sinner vs Carlos Alcaraz', 'tags': ['[live]', '{']},
+        'markets': [{'id': 'ML-1', 'name': 'Moneyline'}],
+        'count': 2,
+        'selections': [{'id': 's1', 'label': 'Jannik Sinner', 'trueOdds': 1.67}],
+        'after': 'not needed',
+    },
+    'news': ['unicode é中', 'escaped \\" quote'],
+    'helpPage': {'content': 'never read'},
+}
+
+def page(state: dict = STATE) -> str:
+    return f'<html><script>window.__INITIAL_STATE__ = {json.dumps(state)};</script></html>'
+
+def test_wanted_paths_match_the_full_parse():
+    state = read_initial_state(page(), PATHS)
+
+    full = read_full_initial_state(page())['stadiumEventData']
+    assert state == {'stadiumEventData': {'markets': full['markets'], 'selections': full['selections']}}
+
+def test_only_the_wanted_values_are_decoded(monkeypatch):
+    decoded = []
+    decoder = initial_state._decoder
+
+    class RecordingDecoder:
+        def raw_decode(self, text, pos):
+            value, end = decoder.raw_decode(text, pos)
+            decoded.append(value)
+            return value, end
+
+    monkeypatch.setattr(initial_state, '_decoder', RecordingDecoder())
+    read_initial_state(page(), PATHS)
+    assert decoded == [STATE['stadiumEventData']['markets'], STATE['stadiumEventData']['selections']]
+
+@pytest.mark.parametrize('value', [
+    STATE['config'], STATE['news'], STATE['stadiumEventData'], 'a "quoted" ] string', '\\', 0, -1.5e3, True, None, [], {},
+])
+def test_skipped_values_end_where_the_decoder_ends(value):
+    text = json.dumps({'value': value, 'next': 1})
+    start = text.index(':') + 2
+    assert initial_state._skip_value(text, start) == initial_state._decoder.raw_decode(text, start)[1]
+
+def test_missing_paths_are_left_out():
+    state = read_initial_state(page(), [('stadiumEventData', 'markets'), ('stadiumEventData', 'missing')])
+    assert list(state['stadiumEventData']) == ['markets']
+    with pytest.raises(KeyError):
+        state['stadiumEventData']['missing']